@@ -0,0 +1,126 @@
+const AuthSession = (function() {
+    'use strict';
+
+    const API_BASE = 'http://localhost:8000/api/v1';
+    const ACCESS_TOKEN_STORAGE = 'access_token';
+    const REFRESH_TOKEN_STORAGE = 'refresh_token';
+    const TOKEN_TYPE_STORAGE = 'token_type';
+
+    // Refresh this long before the access token expires.
+    const REFRESH_MARGIN_MS = 60 * 1000;
+    // Held by the one tab that is refreshing; refresh tokens are single use,
+    // so two tabs presenting the same one would end the session everywhere.
+    const REFRESH_LOCK = 'cychat-token-refresh';
+
+    let refreshTimer = null;
+    let pendingRefresh = null;
+
+
+    function store(data) {
+        localStorage.setItem(ACCESS_TOKEN_STORAGE, data.access_token);
+        localStorage.setItem(TOKEN_TYPE_STORAGE, data.token_type || 'bearer');
+        if (data.refresh_token) {
+            localStorage.setItem(REFRESH_TOKEN_STORAGE, data.refresh_token);
+        }
+        scheduleRefresh();
+    }
+
+    function clear() {
+        if (refreshTimer) clearTimeout(refreshTimer);
+        refreshTimer = null;
+        localStorage.removeItem(ACCESS_TOKEN_STORAGE);
+        localStorage.removeItem(REFRESH_TOKEN_STORAGE);
+        localStorage.removeItem(TOKEN_TYPE_STORAGE);
+    }
+
+    function expiresAt(token) {
+        try {
+            const payload = token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/');
+            return JSON.parse(atob(payload)).exp * 1000;
+        } catch (error) {
+            return 0;
+        }
+    }
+
+    function hasFreshToken() {
+        const token = localStorage.getItem(ACCESS_TOKEN_STORAGE);
+        return Boolean(token) && expiresAt(token) - Date.now() > REFRESH_MARGIN_MS;
+    }
+
+    async function refreshNow() {
+        // Another tab may have rotated the pair while this one waited for the lock.
+        if (hasFreshToken()) {
+            scheduleRefresh();
+            return true;
+        }
+        const refreshToken = localStorage.getItem(REFRESH_TOKEN_STORAGE);
+        if (!refreshToken) return false;
+        try {
+            const response = await fetch(`${API_BASE}/auth/refresh`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ refresh_token: refreshToken })
+            });
+            const data = await response.json();
+            if (data.access_token) {
+                store(data);
+                return true;
+            }
+        } catch (error) {
+            // Fall through: another tab may still have stored a new pair.
+        }
+        return hasFreshToken();
+    }
+
+    function refresh() {
+        if (!pendingRefresh) {
+            const run = navigator.locks
+                ? navigator.locks.request(REFRESH_LOCK, refreshNow)
+                : refreshNow();
+            pendingRefresh = run
+                .catch(() => false)
+                .finally(() => { pendingRefresh = null; });
+        }
+        return pendingRefresh;
+    }
+
+    function scheduleRefresh() {
+        if (refreshTimer) clearTimeout(refreshTimer);
+        const token = localStorage.getItem(ACCESS_TOKEN_STORAGE);
+        if (!token) return;
+        const delay = Math.max(expiresAt(token) - Date.now() - REFRESH_MARGIN_MS, 0);
+        refreshTimer = setTimeout(refresh, delay);
+    }
+
+    /**
+     * Make sure a usable access token is stored, refreshing it first if it
+     * has expired. Resolves to false when the user has to log in again.
+     */
+    async function ensureFresh() {
+        if (hasFreshToken()) {
+            scheduleRefresh();
+            return true;
+        }
+        return refresh();
+    }
+
+    // Pick up a pair another tab stored, so this tab's timer follows it.
+    window.addEventListener('storage', event => {
+        if (event.key === ACCESS_TOKEN_STORAGE) {
+            if (event.newValue) {
+                scheduleRefresh();
+            } else if (refreshTimer) {
+                clearTimeout(refreshTimer);
+                refreshTimer = null;
+            }
+        }
+    });
+
+
+    return {
+        store,
+        clear,
+        refresh,
+        ensureFresh
+    };
+})();
@@ -14,13 +14,27 @@ import shutil
 import time
 import uvicorn
 
+from app.auth.revocation import revoked_tokens
 from app.auth.router import router as auth_router
+from app.auth.user_cache import user_cache
+from app.chats.archive import message_archiver
+from app.chats.media_gc import media_collector
+from app.chats.purge import message_purger
+from app.chats.resumable import resumable_uploads
 from app.chats.router import router as chats_router
+from app.chats.thumbnails import thumbnails
 from app.config import settings
 from app.contacts.router import router as contacts_router
 from app.rooms.router import router as rooms_router
+from app.search.index import search_index
+from app.search.router import router as search_router
+from app.users.avatars import avatars
+from app.users.public_keys import public_keys
 from app.users.router import router as users_router
 from app.utils.engine import init_engine_app
+from app.utils.read_receipts import read_markers
+from app.utils.read_replica import primary_pins
+from app.utils.storage import storage
 from app.web_sockets.router import router as web_sockets_router
 
 
@@ -111,11 +125,36 @@ setup_prometheus(chat_app)
 @chat_app.on_event("startup")
 async def startup():
     await init_engine_app(chat_app)
+    await storage.start()
+    search_index.start()
+    revoked_tokens.start()
+    user_cache.start()
+    message_archiver.start()
+    message_purger.start()
+    thumbnails.start()
+    avatars.start()
+    resumable_uploads.start()
+    media_collector.start()
 
 
 @chat_app.on_event("shutdown")
 async def shutdown():
+    await search_index.stop()
+    await revoked_tokens.stop()
+    await user_cache.stop()
+    await message_archiver.stop()
+    await message_purger.stop()
+    await thumbnails.stop()
+    await avatars.stop()
+    await resumable_uploads.stop()
+    await media_collector.stop()
+    await public_keys.stop()
+    await primary_pins.stop()
+    await read_markers.flush_all()
+    await storage.stop()
     await chat_app.state.db_engine.dispose()
+    if chat_app.state.db_read_engine is not None:
+        await chat_app.state.db_read_engine.dispose()
 
 
 @chat_app.get("/api")
@@ -128,6 +167,7 @@ chat_app.include_router(users_router, tags=["User"])
 chat_app.include_router(contacts_router, tags=["Contact"])
 chat_app.include_router(chats_router, tags=["Chat"])
 chat_app.include_router(rooms_router, tags=["Room"])
+chat_app.include_router(search_router, tags=["Search"])
 chat_app.include_router(web_sockets_router, tags=["Socket"])
 
 
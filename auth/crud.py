@@ -1,10 +1,15 @@
 import datetime
+import time
 from fastapi.encoders import (
     jsonable_encoder,
 )
 from fastapi.security import (
     OAuth2PasswordRequestForm,
 )
+from functools import (
+    partial,
+)
+from jose.exceptions import JWTError
 from pydantic import (
     EmailStr,
 )
@@ -14,54 +19,49 @@ from sqlalchemy.engine import (
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
-from sqlalchemy.sql import (
-    text,
-)
 from typing import (
     Any,
 )
 
+from app.auth import (
+    queries,
+    revocation,
+)
 from app.auth.schemas import (
     UserCreate,
     UserLoginSchema,
 )
+from app.auth.user_cache import (
+    user_cache,
+)
+from app.search.index import (
+    search_index,
+)
 from app.users.schemas import (
     UserObjectSchema,
 )
+from app.utils import (
+    query_registry as db,
+)
 from app.utils.constants import (
-    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
 )
 from app.utils.crypt_util import (
     get_password_hash,
     verify_password,
 )
+from app.utils.dependencies import (
+    after_commit,
+)
 from app.utils.jwt_util import (
-    create_access_token,
-    timedelta,
+    REFRESH_TOKEN,
+    decode_token,
+    epoch_matches,
+    issue_tokens,
 )
 
 
 async def create_user(user: UserCreate, session: AsyncSession) -> Result:
-    query = """
-        INSERT INTO chat.users (
-          nickname,
-          email,
-          password,
-          phone_number,
-          user_role,
-          creation_date,
-          modified_date
-        )
-        VALUES (
-          :nickname,
-          :email,
-          :password,
-          :phone_number,
-          'user',
-          :creation_date,
-          :modified_date
-        )
-    """
     now = datetime.datetime.utcnow()
     values = {
         "nickname": user.nickname,
@@ -71,50 +71,45 @@ async def create_user(user: UserCreate, session: AsyncSession) -> Result:
         "creation_date": now,
         "modified_date": now,
     }
-    return await session.execute(text(query), values)
+    return await db.execute(queries.CREATE_USER, values, session)
 
 
 async def find_existed_user(
     email: EmailStr, session: AsyncSession
 ):
-    query = "SELECT * FROM chat.users WHERE email = :email"
+    user = await user_cache.get_by_email(email)
+    if user is not None:
+        return user
+
     values = {"email": email}
-    result = await session.execute(text(query), values)
-    user = result.fetchone()
+    user = await db.fetch_one(queries.FIND_USER_BY_EMAIL, values, session)
     if user:
-        return user._asdict()
+        user = user._asdict()
+        await user_cache.put(user)
+        return user
     return None
 
 
 async def find_existed_user_id(
     id_: int, session: AsyncSession
 ) -> dict[str, Any]:
-    query = "SELECT * FROM chat.users WHERE id = :id"
+    user = await user_cache.get_by_id(id_)
+    if user is not None:
+        return user
+
     values = {"id": id_}
-    result = await session.execute(text(query), values)
-    user = result.fetchone()
+    user = await db.fetch_one(queries.FIND_USER_BY_ID, values, session)
     if user:
-        return user._asdict()
+        user = user._asdict()
+        await user_cache.put(user)
+        return user
     return None
 
 
-async def get_users_with_black_listed_token(
-    token: str, session: AsyncSession
-) -> dict[str, Any]:
-    query = """
-        SELECT
-          *
-        FROM
-          chat.access_tokens
-        WHERE
-          token = :token
-        AND
-          token_status = 0
-    """
-    values = {"token": token}
-    result = await session.execute(text(query), values)
-    token_row = result.fetchone()
-    return token_row
+async def find_password_hash(user_id: int, session: AsyncSession) -> str:
+
+    values = {"id": user_id}
+    return await db.scalar(queries.GET_PASSWORD_HASH, values, session)
 
 
 async def login_user(
@@ -123,44 +118,55 @@ async def login_user(
     user_obj = await find_existed_user(form_data.username, session)
     if not user_obj:
         return {"status_code": 400, "message": "User not found!"}
-    user = UserLoginSchema(email=user_obj["email"], password=user_obj["password"])
-    is_valid = verify_password(form_data.password, user.password)
+    password = await find_password_hash(user_obj["id"], session)
+    if password is None:
+        return {"status_code": 400, "message": "User not found!"}
+    user = UserLoginSchema(email=user_obj["email"], password=password)
+    is_valid = await verify_password(form_data.password, user.password)
     if not is_valid:
         return {"status_code": 401, "message": "Invalid Credentials!"}
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = await create_access_token(
-        data={"sub": form_data.username},
-        expires_delta=access_token_expires,
-    )
-    query = """
-        INSERT INTO
-            chat.access_tokens (
-                [user],
-                token,
-                creation_date,
-                modified_date,
-                token_status
-            )
-        VALUES
-            (
-                :user_id,
-                :token,
-                :creation_date,
-                :modified_date,
-                1
-            )
+    return issue_tokens(user_obj)
+
+
+async def refresh_user_tokens(
+    refresh_token: str, session: AsyncSession
+) -> dict[str, Any]:
     """
-    now = datetime.datetime.utcnow()
-    values = {
-        "user_id": user_obj["id"],
-        "token": access_token["access_token"],
-        "creation_date": now,
-        "modified_date": now,
-    }
-    await session.execute(text(query), values)
+    Swap a refresh token for a new token pair in the same login session.
+    Each refresh token is single use; presenting a spent one again ends
+    the whole session, since only a copied token can be replayed.
+    """
+
+    invalid = {"status_code": 401, "message": "Invalid refresh token!"}
+    try:
+        payload = decode_token(refresh_token, REFRESH_TOKEN)
+    except JWTError:
+        return invalid
+    revoked_tokens = revocation.revoked_tokens
+    if await revoked_tokens.is_revoked(payload["sid"]):
+        return invalid
+    if await revoked_tokens.is_revoked(payload["jti"]):
+        await revoke_session(payload)
+        return invalid
+
+    user_obj = await find_existed_user_id(payload["uid"], session)
+    if (
+        user_obj is None
+        or user_obj["user_role"] == "disabled"
+        or not epoch_matches(payload, user_obj)
+    ):
+        return invalid
+
+    await revoked_tokens.revoke(payload["jti"], payload["exp"])
+    return issue_tokens(user_obj, payload["sid"])
+
+
+async def revoke_session(payload: dict[str, Any]) -> None:
 
-    return access_token
+    # Outlive every refresh token the session could still have issued.
+    expires_at = time.time() + REFRESH_TOKEN_EXPIRE_MINUTES * 60
+    await revocation.revoked_tokens.revoke(payload["sid"], expires_at)
 
 
 async def register_user(
@@ -172,18 +178,14 @@ async def register_user(
         return {"status_code": 400, "message": "User already signed up!"}
 
 
-    user.password = get_password_hash(user.password)
+    user.password = await get_password_hash(user.password)
     await create_user(user, session)
     user_row = await find_existed_user(user.email, session)
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = await create_access_token(
-        data={"sub": user_row["email"]},
-        expires_delta=access_token_expires,
-    )
+    await after_commit(session, partial(search_index.index_user, user_row))
 
     results = {
         "user": UserObjectSchema(**user_row),
-        "token": access_token,
+        "token": issue_tokens(user_row),
         "status_code": 201,
         "message": "Welcome! Proceed to the login page...",
     }
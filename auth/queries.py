@@ -0,0 +1,69 @@
+from app.utils.query_registry import (
+    DATETIME,
+    ID,
+    STRING,
+    register,
+)
+
+
+CREATE_USER = register(
+    "auth.create_user",
+    """
+        INSERT INTO chat.users (
+          nickname,
+          email,
+          password,
+          phone_number,
+          user_role,
+          creation_date,
+          modified_date
+        )
+        VALUES (
+          :nickname,
+          :email,
+          :password,
+          :phone_number,
+          'user',
+          :creation_date,
+          :modified_date
+        )
+    """,
+    nickname=STRING,
+    email=STRING,
+    password=STRING,
+    phone_number=STRING,
+    creation_date=DATETIME,
+    modified_date=DATETIME,
+)
+
+# Everything but the password hash, which is never cached; login and
+# password changes read it with GET_PASSWORD_HASH.
+USER_COLUMNS = """
+          id,
+          nickname,
+          email,
+          phone_number,
+          user_role,
+          creation_date,
+          modified_date,
+          public_key,
+          token_epoch
+"""
+
+FIND_USER_BY_EMAIL = register(
+    "auth.find_user_by_email",
+    f"SELECT {USER_COLUMNS} FROM chat.users WHERE email = :email",
+    email=STRING,
+)
+
+FIND_USER_BY_ID = register(
+    "auth.find_user_by_id",
+    f"SELECT {USER_COLUMNS} FROM chat.users WHERE id = :id",
+    id=ID,
+)
+
+GET_PASSWORD_HASH = register(
+    "auth.get_password_hash",
+    "SELECT password FROM chat.users WHERE id = :id",
+    id=ID,
+)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import time
+from collections import (
+    OrderedDict,
+)
+from prometheus_client import (
+    Counter,
+)
+from typing import (
+    Optional,
+)
+
+from app.config import (
+    settings,
+)
+from app.utils.pubsub_listener import (
+    listen,
+)
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "auth:revocations"
+REVOKED_KEY = "auth:revoked:{}"
+
+TOKEN_LOOKUPS = Counter(
+    "cychat_token_revocation_lookups_total",
+    "Revocation checks by the layer that answered them.",
+    ["source", "revoked"],
+)
+
+
+class RevokedTokenCache:
+    """
+    Denylist of revoked login sessions and refresh token ids. Ids live in
+    Redis until the tokens that carry them expire and are pushed to every
+    worker over pub/sub; ids seen not to be revoked are kept in a small
+    local LRU for a short TTL, so most checks never leave the process.
+    """
+
+    def __init__(self) -> None:
+        self._valid: OrderedDict[str, float] = OrderedDict()
+        self._revoked: dict[str, float] = {}
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _remember_valid(self, token_id: str) -> None:
+        self._valid[token_id] = time.monotonic() + settings.TOKEN_CACHE_TTL_SECONDS
+        self._valid.move_to_end(token_id)
+        while len(self._valid) > settings.TOKEN_CACHE_SIZE:
+            self._valid.popitem(last=False)
+
+    def _remember_revoked(self, token_id: str, expires_at: float) -> None:
+        self._valid.pop(token_id, None)
+        self._revoked[token_id] = expires_at
+        if len(self._revoked) > settings.TOKEN_CACHE_SIZE:
+            now = time.time()
+            for key, until in list(self._revoked.items()):
+                if until <= now:
+                    del self._revoked[key]
+
+    async def _conn(self):
+        if self._redis is None:
+            self._redis = await settings.redis_conn()
+        return self._redis
+
+    async def _check(self, token_id: str) -> bool:
+
+        if token_id in self._revoked:
+            if self._revoked[token_id] > time.time():
+                TOKEN_LOOKUPS.labels("local", "true").inc()
+                return True
+            del self._revoked[token_id]
+
+        deadline = self._valid.get(token_id)
+        if deadline is not None and deadline > time.monotonic():
+            self._valid.move_to_end(token_id)
+            TOKEN_LOOKUPS.labels("local", "false").inc()
+            return False
+
+        try:
+            conn = await self._conn()
+            ttl = await conn.ttl(REVOKED_KEY.format(token_id))
+        except Exception as e:
+            # Fail open: without Redis only revocations this worker has
+            # seen are enforced, and access tokens are short-lived.
+            logger.warning(f"Revoked token lookup in Redis failed: {e}")
+            self._redis = None
+            return False
+        if ttl is not None and ttl > 0:
+            self._remember_revoked(token_id, time.time() + ttl)
+            TOKEN_LOOKUPS.labels("redis", "true").inc()
+            return True
+        self._remember_valid(token_id)
+        TOKEN_LOOKUPS.labels("redis", "false").inc()
+        return False
+
+    async def is_revoked(self, *token_ids: str) -> bool:
+
+        for token_id in token_ids:
+            if await self._check(token_id):
+                return True
+        return False
+
+    async def revoke(self, token_id: str, expires_at: float) -> None:
+
+        self._remember_revoked(token_id, expires_at)
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return
+        try:
+            conn = await self._conn()
+            await conn.set(REVOKED_KEY.format(token_id), 1, ex=ttl)
+            await conn.publish(
+                REVOCATION_CHANNEL,
+                json.dumps({"id": token_id, "expires_at": expires_at}),
+            )
+        except Exception as e:
+            logger.warning(f"Token revocation not shared through Redis: {e}")
+            self._redis = None
+
+    def _on_message(self, data: dict) -> None:
+        self._remember_revoked(data["id"], data["expires_at"])
+
+    def _on_disconnect(self) -> None:
+        # Revocations published while disconnected are never delivered,
+        # so stop trusting tokens that were checked before the gap.
+        self._valid.clear()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(
+                listen(REVOCATION_CHANNEL, self._on_message, self._on_disconnect)
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+revoked_tokens = RevokedTokenCache()
@@ -15,17 +15,18 @@ from typing import (
 
 from app.auth.crud import (
     login_user,
+    refresh_user_tokens,
     register_user,
 )
 from app.auth.schemas import (
+    RefreshRequest,
     ResponseSchema,
     Token,
     UserCreate,
     UserSchema,
 )
 from app.utils.dependencies import (
-    get_db_autocommit_session,
-    get_db_transactional_session,
+    get_db_session,
 )
 
 router = APIRouter(prefix="/api/v1")
@@ -40,7 +41,8 @@ router = APIRouter(prefix="/api/v1")
         201: {
             "model": Token,
             "description": "A response object contains a token object for a user"
-            " e.g. Token value: {access_token: 'abcdefg12345token', token_type: 'Bearer'}",
+            " e.g. Token value: {access_token: 'abcdefg12345token',"
+            " refresh_token: 'hijklm67890token', token_type: 'Bearer', expires_in: 900}",
         },
         400: {
             "model": ResponseSchema,
@@ -56,13 +58,40 @@ router = APIRouter(prefix="/api/v1")
 )
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     access_token = await login_user(form_data, session)
     return access_token
 
 
+@router.post(
+    "/auth/refresh",
+    response_model=Union[Token, ResponseSchema],
+    status_code=200,
+    name="auth:refresh",
+    responses={
+        200: {
+            "model": Token,
+            "description": "A response object contains a new token pair;"
+            " the refresh token that was sent can't be used again",
+        },
+        401: {
+            "model": ResponseSchema,
+            "description": "A response object indicates that the refresh"
+            " token is invalid, expired or revoked!",
+        },
+    },
+)
+async def refresh(
+    request: RefreshRequest,
+    session: AsyncSession = Depends(get_db_session),
+):
+
+    tokens = await refresh_user_tokens(request.refresh_token, session)
+    return tokens
+
+
 @router.post(
     "/auth/register",
     name="auth:register",
@@ -82,7 +111,7 @@ async def login(
 )
 async def register(
     user: UserCreate,
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await register_user(user, session)
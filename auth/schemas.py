@@ -4,6 +4,7 @@ from pydantic import (
     Field,
 )
 from typing import (
+    Any,
     Dict,
     Optional,
 )
@@ -24,7 +25,7 @@ class UserSchema(BaseModel):
             user_role="user",
         ),
     )
-    token: Optional[Dict[str, str]] = Field(
+    token: Optional[Dict[str, Any]] = Field(
         ..., example="Token value(e.g. 'eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9')"
     )
     status_code: int = Field(
@@ -55,10 +56,17 @@ class Token(BaseModel):
     access_token: str = Field(
         ..., example="Token value(e.g. 'eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9')"
     )
+    refresh_token: str = Field(
+        ..., example="A longer-lived token to exchange at /auth/refresh."
+    )
+    token_type: str = Field("bearer", example="bearer")
+    expires_in: int = Field(..., example=900)
 
 
-class TokenData(BaseModel):
-    email: Optional[str] = Field(..., example="Your email address.")
+class RefreshRequest(BaseModel):
+    refresh_token: str = Field(
+        ..., example="The refresh token returned by /auth/login."
+    )
 
 
 class ResponseSchema(BaseModel):
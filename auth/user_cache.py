@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import json
+import logging
+import time
+from collections import (
+    OrderedDict,
+)
+from prometheus_client import (
+    Counter,
+)
+from typing import (
+    Any,
+    Optional,
+)
+
+from app.config import (
+    settings,
+)
+from app.utils.pubsub_listener import (
+    listen,
+)
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "users:invalidations"
+USER_KEY = "users:id:{}"
+EMAIL_KEY = "users:email:{}"
+DATETIME_FIELDS = ("creation_date", "modified_date")
+
+USER_CACHE_LOOKUPS = Counter(
+    "cychat_user_cache_lookups_total",
+    "User lookups by the layer that answered them (local, redis or db).",
+    ["level"],
+)
+
+
+def _encode(user: dict[str, Any]) -> str:
+    return json.dumps(user, default=str)
+
+
+def _decode(raw: str) -> dict[str, Any]:
+    user = json.loads(raw)
+    for field in DATETIME_FIELDS:
+        if user.get(field):
+            user[field] = datetime.datetime.fromisoformat(user[field])
+    return user
+
+
+class UserCache:
+    """
+    Two-level cache of chat.users rows keyed by id, with an email index.
+    Each worker keeps an LRU with a short TTL in front of shared Redis
+    entries; writers invalidate both levels on every worker over pub/sub.
+    """
+
+    def __init__(self) -> None:
+        self._users: OrderedDict[int, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._emails: dict[str, int] = {}
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _conn(self):
+        if self._redis is None:
+            self._redis = await settings.redis_conn()
+        return self._redis
+
+    def _local(self, user_id: Optional[int]) -> Optional[dict[str, Any]]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        deadline, user = entry
+        if deadline <= time.monotonic():
+            self._drop(user_id)
+            return None
+        self._users.move_to_end(user_id)
+        return dict(user)
+
+    def _store_local(self, user: dict[str, Any]) -> None:
+        self._users[user["id"]] = (
+            time.monotonic() + settings.USER_CACHE_TTL_SECONDS,
+            dict(user),
+        )
+        self._users.move_to_end(user["id"])
+        self._emails[user["email"].lower()] = user["id"]
+        while len(self._users) > settings.USER_CACHE_SIZE:
+            _, (_, evicted) = self._users.popitem(last=False)
+            self._emails.pop(evicted["email"].lower(), None)
+
+    def _drop(self, user_id: int) -> None:
+        entry = self._users.pop(user_id, None)
+        if entry is not None:
+            self._emails.pop(entry[1]["email"].lower(), None)
+
+    async def get_by_id(self, user_id: int) -> Optional[dict[str, Any]]:
+
+        user = self._local(user_id)
+        if user is not None:
+            USER_CACHE_LOOKUPS.labels("local").inc()
+            return user
+        try:
+            conn = await self._conn()
+            raw = await conn.get(USER_KEY.format(user_id))
+        except Exception as e:
+            logger.warning(f"User cache read from Redis failed: {e}")
+            self._redis = None
+            return None
+        if raw is None:
+            return None
+        user = _decode(raw)
+        self._store_local(user)
+        USER_CACHE_LOOKUPS.labels("redis").inc()
+        return user
+
+    async def get_by_email(self, email: str) -> Optional[dict[str, Any]]:
+
+        email = email.lower()
+        user = self._local(self._emails.get(email))
+        if user is not None:
+            USER_CACHE_LOOKUPS.labels("local").inc()
+            return user
+        try:
+            conn = await self._conn()
+            user_id = await conn.get(EMAIL_KEY.format(email))
+        except Exception as e:
+            logger.warning(f"User cache read from Redis failed: {e}")
+            self._redis = None
+            return None
+        if user_id is None:
+            return None
+        return await self.get_by_id(int(user_id))
+
+    async def put(self, user: dict[str, Any]) -> None:
+
+        USER_CACHE_LOOKUPS.labels("db").inc()
+        self._store_local(user)
+        ttl = settings.USER_CACHE_REDIS_TTL_SECONDS
+        try:
+            conn = await self._conn()
+            await conn.set(USER_KEY.format(user["id"]), _encode(user), ex=ttl)
+            await conn.set(EMAIL_KEY.format(user["email"].lower()), user["id"], ex=ttl)
+        except Exception as e:
+            logger.warning(f"User cache write to Redis failed: {e}")
+            self._redis = None
+
+    async def invalidate(self, user_id: int, email: Optional[str] = None) -> None:
+
+        self._drop(user_id)
+        try:
+            conn = await self._conn()
+            keys = [USER_KEY.format(user_id)]
+            if email:
+                keys.append(EMAIL_KEY.format(email.lower()))
+            await conn.delete(*keys)
+            await conn.publish(INVALIDATION_CHANNEL, json.dumps({"id": user_id}))
+        except Exception as e:
+            logger.warning(f"User cache invalidation not shared through Redis: {e}")
+            self._redis = None
+
+    def _on_message(self, data: dict) -> None:
+        self._drop(data["id"])
+
+    def _on_disconnect(self) -> None:
+        self._users.clear()
+        self._emails.clear()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(
+                listen(INVALIDATION_CHANNEL, self._on_message, self._on_disconnect)
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+user_cache = UserCache()
@@ -0,0 +1,90 @@
+"""
+Compare response encoding for history-sized payloads.
+
+    python -m app.benchmarks.response_encoding [--repeat 20]
+
+Each case encodes one GetAllMessageResults-shaped body of 1k and 10k rows:
+the default FastAPI path (response_model validation, jsonable_encoder and
+JSONResponse), FastJSONResponse with row dicts, and FastJSONResponse with
+?format=columns.
+"""
+import argparse
+import datetime
+import time
+from fastapi.encoders import (
+    jsonable_encoder,
+)
+from starlette.responses import (
+    JSONResponse,
+)
+
+from app.chats.schemas import (
+    GetAllMessageResults,
+)
+from app.utils.responses import (
+    FastJSONResponse,
+    orjson,
+    rows_response,
+)
+
+
+def make_rows(count: int) -> list[dict]:
+    now = datetime.datetime(2024, 1, 1)
+    return [
+        {
+            "msg_id": i,
+            "content": f"message number {i} with a little bit of text",
+            "type": "sent" if i % 2 else "received",
+            "message_type": "text",
+            "media": "",
+            "creation_date": now + datetime.timedelta(seconds=i),
+            "id": 1 + i % 2,
+            "nickname": "alice" if i % 2 else "bob",
+            "email": "alice@example.com" if i % 2 else "bob@example.com",
+            "phone_number": None,
+        }
+        for i in range(count)
+    ]
+
+
+def default_path(results: dict) -> bytes:
+    validated = GetAllMessageResults.model_validate(results)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_rows(results: dict) -> bytes:
+    return FastJSONResponse(results).body
+
+
+def fast_columns(results: dict) -> bytes:
+    return rows_response(results, "columns").body
+
+
+def measure(fn, results: dict, repeat: int) -> tuple[float, int]:
+    size = len(fn(results))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(results)
+    return (time.perf_counter() - start) / repeat * 1000, size
+
+
+def main() -> None:  # pragma: no cover
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson missing)'}")
+    print(f"{'rows':>6}  {'case':<14} {'ms/response':>12} {'bytes':>10}")
+    for count in (1_000, 10_000):
+        results = {"status_code": 200, "result": make_rows(count), "next_cursor": None}
+        for name, fn in (
+            ("default", default_path),
+            ("fast rows", fast_rows),
+            ("fast columns", fast_columns),
+        ):
+            ms, size = measure(fn, results, args.repeat)
+            print(f"{count:>6}  {name:<14} {ms:>12.2f} {size:>10}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import logging
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Any,
+    Optional,
+)
+
+from app.chats import (
+    queries,
+)
+from app.chats.media import (
+    release_references,
+)
+from app.config import (
+    settings,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.engine import (
+    get_autocommit_session_factory,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(value: datetime.datetime, months_back: int = 0) -> datetime.datetime:
+    month = value.year * 12 + value.month - 1 - months_back
+    return datetime.datetime(month // 12, month % 12 + 1, 1)
+
+
+def month_range(month: str) -> tuple[datetime.datetime, datetime.datetime]:
+    start = datetime.datetime.strptime(month, "%Y-%m")
+    return start, month_start(start, -1)
+
+
+def hot_window_start(now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    return month_start(now or datetime.datetime.utcnow(), settings.MESSAGES_HOT_MONTHS)
+
+
+async def get_oldest_hot_message_date(
+    session: AsyncSession,
+) -> Optional[datetime.datetime]:
+
+    return await db.scalar(queries.GET_OLDEST_HOT_MESSAGE_DATE, None, session)
+
+
+async def archive_messages_batch(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    batch_size: int,
+    session: AsyncSession,
+) -> int:
+
+    values = {"batch_size": batch_size, "start": start, "end": end}
+    result = await db.execute(queries.ARCHIVE_MESSAGES_BATCH, values, session)
+    return result.rowcount
+
+
+async def archive_old_messages(session: AsyncSession) -> dict[str, Any]:
+
+    cutoff = hot_window_start()
+    oldest = await get_oldest_hot_message_date(session)
+    moved = {}
+
+    month = month_start(oldest) if oldest else cutoff
+    while month < cutoff:
+        end = month_start(month, -1)
+        total = 0
+        while True:
+            rows = await archive_messages_batch(
+                month, end, settings.MESSAGES_ARCHIVE_BATCH_SIZE, session
+            )
+            total += rows
+            if rows < settings.MESSAGES_ARCHIVE_BATCH_SIZE:
+                break
+            await asyncio.sleep(0.1)
+        if total:
+            moved[month.strftime("%Y-%m")] = total
+            logger.info(f"Archived {total} messages from {month:%Y-%m}.")
+        month = end
+
+    return {"status_code": 200, "hot_window_start": cutoff, "archived": moved}
+
+
+async def export_archive_month(
+    month: str, session: AsyncSession, purge: bool = False
+) -> dict[str, Any]:
+
+    start, end = month_range(month)
+    archive_dir = settings.ARCHIVE_DIR / "messages"
+    await asyncio.to_thread(archive_dir.mkdir, parents=True, exist_ok=True)
+    path = archive_dir / f"{month}.ndjson.gz"
+    partial = path.with_suffix(".gz.part")
+
+    exported = 0
+    after = 0
+    handle = await asyncio.to_thread(gzip.open, partial, "wt", encoding="utf-8")
+    try:
+        while True:
+            values = {
+                "batch_size": settings.MESSAGES_ARCHIVE_BATCH_SIZE,
+                "start": start,
+                "end": end,
+                "after": after,
+            }
+            rows = await db.fetch_all(queries.EXPORT_ARCHIVE_BATCH, values, session)
+            rows = [row._asdict() for row in rows]
+            if not rows:
+                break
+            lines = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+            await asyncio.to_thread(handle.write, lines)
+            exported += len(rows)
+            after = rows[-1]["id"]
+    finally:
+        await asyncio.to_thread(handle.close)
+    await asyncio.to_thread(partial.replace, path)
+
+    purged = 0
+    if purge:
+        values = {
+            "batch_size": settings.MESSAGES_ARCHIVE_BATCH_SIZE,
+            "start": start,
+            "end": end,
+        }
+        while True:
+            deleted = await db.fetch_all(
+                queries.PURGE_ARCHIVE_BATCH, values, session
+            )
+            await release_references([row.media for row in deleted], session)
+            purged += len(deleted)
+            if len(deleted) < settings.MESSAGES_ARCHIVE_BATCH_SIZE:
+                break
+
+    logger.info(f"Exported {exported} archived messages of {month} to {path}.")
+    return {
+        "status_code": 200,
+        "month": month,
+        "path": str(path),
+        "exported": exported,
+        "purged": purged,
+    }
+
+
+class MessageArchiver:
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            session_factory = get_autocommit_session_factory()
+            if session_factory is not None:
+                session = session_factory()
+                try:
+                    await archive_old_messages(session)
+                except Exception as e:
+                    logger.warning(f"Message archiving failed: {e}")
+                finally:
+                    await session_factory.remove()
+            await asyncio.sleep(settings.MESSAGES_ARCHIVE_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None and settings.MESSAGES_HOT_MONTHS > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+message_archiver = MessageArchiver()
+
+
+async def _export(month: str, purge: bool) -> None:  # pragma: no cover
+    from sqlalchemy.ext.asyncio import (
+        create_async_engine,
+    )
+
+    engine = create_async_engine(
+        settings.db_url, isolation_level="AUTOCOMMIT"
+    )
+    try:
+        async with AsyncSession(engine) as session:
+            print(await export_archive_month(month, session, purge))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        description="Export one month of chat.messages_archive to NDJSON."
+    )
+    parser.add_argument("month", help="The month to export, e.g. 2024-01.")
+    parser.add_argument(
+        "--purge",
+        action="store_true",
+        help="Delete the exported rows from the archive table.",
+    )
+    args = parser.parse_args()
+    asyncio.run(_export(args.month, args.purge))
@@ -1,35 +1,63 @@
 import datetime
+import json
 import logging
-import os
-import uuid
 from pathlib import Path
 from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
-from sqlalchemy.sql import (
-    text,
-)
 from typing import (
     Any,
+    AsyncIterator,
+    Optional,
     Union,
 )
 
 from app.auth.crud import (
     find_existed_user,
 )
+from app.chats import (
+    queries,
+)
+from app.chats.media import (
+    add_references,
+    media_url,
+    parse_media_url,
+    store_bytes,
+)
+from app.chats.purge import (
+    create_tombstone,
+)
 from app.chats.schemas import (
     MessageCreate,
     MessageCreateRoom,
 )
+from app.chats.thumbnails import (
+    thumbnails,
+)
+from app.search.crud import (
+    rank_rows,
+)
+from app.search.index import (
+    search_index,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.engine import (
+    get_read_session_factory,
+)
+from app.utils.read_replica import (
+    primary_pins,
+)
+from app.utils.read_receipts import (
+    publish_read_receipt,
+    read_markers,
+)
 
 logger = logging.getLogger(__name__)
 
-UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
-SENT_FILES_DIR = UPLOAD_DIR / "sent-files"
-
-
-SENT_FILES_DIR.mkdir(parents=True, exist_ok=True)
+EXPORT_CHUNK_ROWS = 500
 
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.svg'}
 DOCUMENT_EXTENSIONS = {'.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt', '.rtf', '.odt'}
@@ -62,37 +90,33 @@ def get_file_category(extension: str) -> str:
         return "file"
 
 
-def save_chat_file(user_id: int, file_content: bytes, original_filename: str = None) -> dict:
+def chat_file_info(
+    digest: str, extension: str, filename: Optional[str], size: int
+) -> dict[str, Any]:
+
+    return {
+        "url": media_url(digest, extension),
+        "filename": filename or f"{digest}{extension}",
+        "extension": extension,
+        "category": get_file_category(extension),
+        "size": size,
+    }
+
+
+async def save_chat_file(
+    file_content: bytes, original_filename: Optional[str], session: AsyncSession
+) -> dict[str, Any]:
+
     if original_filename:
         ext = Path(original_filename).suffix.lower()
         if not ext:
             ext = '.bin'
     else:
-        ext = '.png'  
-    
+        ext = '.png'
 
-    uuid_val = f"{uuid.uuid4()}{ext}"
-    
-    user_dir = SENT_FILES_DIR / "chat" / "files" / "user" / str(user_id)
-    user_dir.mkdir(parents=True, exist_ok=True)
-    
-
-    file_path = user_dir / uuid_val
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    
-
-    file_size = len(file_content)
-    category = get_file_category(ext)
-    
-
-    return {
-        "url": f"/api/v1/chat/files/user/{user_id}/{uuid_val}",
-        "filename": original_filename or uuid_val,
-        "extension": ext,
-        "category": category,
-        "size": file_size
-    }
+    digest = await store_bytes(file_content, session)
+    thumbnails.schedule(digest, ext, len(file_content))
+    return chat_file_info(digest, ext, original_filename, len(file_content))
 
 
 async def send_new_message(
@@ -103,7 +127,7 @@ async def send_new_message(
     session: AsyncSession,
 ) -> Union[dict[str, Any], str]:
 
-    if not request.content and not bin_photo:
+    if not request.content and not bin_photo and not getattr(request, "media", None):
         return {
             "status_code": 400,
             "message": "You can't send an empty message!",
@@ -119,10 +143,15 @@ async def send_new_message(
             }
         receiver_id = receiver["id"]
         room_value = None
-    else:
+    elif room_id:
 
         receiver_id = sender_id
-        room_value = request.room if hasattr(request, 'room') else None
+        room_value = int(room_id)
+    else:
+        return {
+            "status_code": 400,
+            "message": "Room not found!",
+        }
 
 
     media_url = ""
@@ -134,7 +163,7 @@ async def send_new_message(
             if hasattr(request, 'filename') and request.filename:
                 original_filename = request.filename
             
-            file_info = save_chat_file(sender_id, bin_photo, original_filename)
+            file_info = await save_chat_file(bin_photo, original_filename, session)
             media_url = file_info["url"]
             logger.info(f"File saved: {media_url} (category: {file_info['category']}, size: {file_info['size']})")
         except Exception as e:
@@ -146,30 +175,6 @@ async def send_new_message(
     elif hasattr(request, 'media') and request.media:
         media_url = request.media
 
-    query = """
-        INSERT INTO chat.messages (
-            sender,
-            receiver,
-            content,
-            message_type,
-            status,
-            room,
-            media,
-            creation_date,
-            modified_date
-        )
-        VALUES (
-            :sender,
-            :receiver,
-            :content,
-            :message_type,
-            0,
-            :room,
-            :media,
-            :creation_date,
-            :modified_date
-        )
-    """
     now = datetime.datetime.utcnow()
     values = {
         "sender": sender_id,
@@ -182,7 +187,11 @@ async def send_new_message(
         "modified_date": now,
     }
 
-    await session.execute(text(query), values)
+    await db.execute(queries.SEND_NEW_MESSAGE, values, session)
+    blob = parse_media_url(media_url)
+    if blob is not None:
+        await add_references(blob[0], 1, session)
+    await primary_pins.mark(sender_id)
     logger.info(f"Message sent from {sender_id} to {receiver_id}")
 
     if file_info:
@@ -194,8 +203,48 @@ async def send_new_message(
     }
 
 
+async def get_history_page(
+    kind: str,
+    values: dict[str, Any],
+    before: Optional[int],
+    limit: Optional[int],
+    session: AsyncSession,
+) -> dict[str, Any]:
+
+    if not limit:
+        rows = await db.fetch_all(queries.GET_HISTORY[kind], values, session)
+        return {
+            "status_code": 200,
+            "result": [dict(row._mapping) for row in rows],
+        }
+
+    messages = []
+    for tier in queries.MESSAGE_TABLES:
+        remaining = limit - len(messages)
+        if remaining <= 0:
+            break
+        cursor = messages[-1]["msg_id"] if messages else before
+        query = queries.GET_HISTORY_PAGE[kind, tier, bool(cursor)]
+        page_values = {**values, "limit": remaining}
+        if cursor:
+            page_values["before"] = cursor
+        rows = await db.fetch_all(query, page_values, session)
+        messages.extend(dict(row._mapping) for row in rows)
+
+    messages.reverse()
+    return {
+        "status_code": 200,
+        "result": messages,
+        "next_cursor": messages[0]["msg_id"] if len(messages) == limit else None,
+    }
+
+
 async def get_sender_receiver_messages(
-    currentUser: Any, receiver_email: EmailStr, session: AsyncSession
+    currentUser: Any,
+    receiver_email: EmailStr,
+    session: AsyncSession,
+    before: Optional[int] = None,
+    limit: Optional[int] = None,
 ) -> dict[str, Any]:
 
     receiver = await find_existed_user(receiver_email, session)
@@ -205,45 +254,53 @@ async def get_sender_receiver_messages(
             "message": "User not found!",
         }
 
-
-    query = """
-        SELECT
-            m.id AS msg_id,
-            m.content,
-            IIF(m.sender = :sender_id, 'sent', 'received') AS type,
-            m.message_type,
-            m.media,
-            m.creation_date,
-            u.id,
-            u.nickname,
-            u.email,
-            u.phone_number
-        FROM
-            chat.messages m
-        LEFT JOIN
-            chat.users u
-        ON
-            m.sender = u.id
-        WHERE
-            (m.sender = :sender_id AND m.receiver = :receiver_id)
-            OR
-            (m.sender = :receiver_id AND m.receiver = :sender_id)
-        ORDER BY
-            m.creation_date ASC
-    """
-
     sender_id = currentUser["id"] if isinstance(currentUser, dict) else currentUser.id
     values = {
         "sender_id": sender_id,
         "receiver_id": receiver["id"],
     }
 
-    result = await session.execute(text(query), values)
-    messages = result.fetchall()
+    return await get_history_page("direct", values, before, limit, session)
 
+
+async def stream_history(
+    kind: str, values: dict[str, Any]
+) -> AsyncIterator[str]:
+    """
+    Yield a conversation as NDJSON, oldest message first. The export owns
+    its session because the response body outlives the request dependencies.
+    """
+
+    session_factory = get_read_session_factory().session_factory
+    async with session_factory() as session:
+        lines = []
+        for tier in reversed(queries.MESSAGE_TABLES):
+            query = queries.EXPORT_HISTORY[kind, tier]
+            async for row in db.stream(query, values, session, EXPORT_CHUNK_ROWS):
+                lines.append(json.dumps(row._asdict(), default=str))
+                if len(lines) >= EXPORT_CHUNK_ROWS:
+                    yield "\n".join(lines) + "\n"
+                    lines.clear()
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+
+async def export_sender_receiver_messages(
+    currentUser: Any, receiver_email: EmailStr, session: AsyncSession
+) -> dict[str, Any]:
+
+    receiver = await find_existed_user(receiver_email, session)
+    if not receiver:
+        return {
+            "status_code": 400,
+            "message": "User not found!",
+        }
+
+    values = {"sender_id": currentUser.id, "receiver_id": receiver["id"]}
     return {
         "status_code": 200,
-        "result": [dict(row._mapping) for row in messages],
+        "filename": f"conversation-{receiver['id']}.ndjson",
+        "stream": stream_history("direct", values),
     }
 
 
@@ -251,51 +308,12 @@ async def get_chats_user(
     user_id: int, search: str, session: AsyncSession
 ) -> dict[str, Any]:
 
-    if not search or len(search) == 0:
-
-        query = """
-            SELECT DISTINCT
-                u.id,
-                u.nickname,
-                u.email,
-                u.phone_number,
-                u.user_role
-            FROM
-                chat.users u
-            WHERE
-                u.id IN (
-                    SELECT DISTINCT receiver FROM chat.messages WHERE sender = :user_id
-                    UNION
-                    SELECT DISTINCT sender FROM chat.messages WHERE receiver = :user_id
-                )
-        """
-        values = {"user_id": user_id}
-    else:
-        
-        query = """
-            SELECT DISTINCT
-                u.id,
-                u.nickname,
-                u.email,
-                u.phone_number,
-                u.user_role
-            FROM
-                chat.users u
-            WHERE
-                u.id IN (
-                    SELECT DISTINCT receiver FROM chat.messages WHERE sender = :user_id
-                    UNION
-                    SELECT DISTINCT sender FROM chat.messages WHERE receiver = :user_id
-                )
-                AND (
-                    u.nickname LIKE :search
-                    OR u.email LIKE :search
-                )
-        """
-        values = {"user_id": user_id, "search": f"%{search}%"}
-
-    result = await session.execute(text(query), values)
-    contacts = result.fetchall()
+    values = {"user_id": user_id}
+    contacts = await db.fetch_all(queries.GET_CHATS_USER, values, session)
+    if search:
+        contacts = await rank_rows(
+            search_index.users, search, contacts, "id", session
+        )
 
     return {
         "status_code": 200,
@@ -315,12 +333,8 @@ async def delete_chat_messages(
         }
 
 
-    query = """
-        DELETE FROM chat.messages
-        WHERE sender = :user_id AND receiver = :contact_id
-    """
-    values = {"user_id": user_id, "contact_id": contact["id"]}
-    await session.execute(text(query), values)
+    await create_tombstone(user_id, contact["id"], None, session)
+    await primary_pins.mark(user_id)
 
     logger.info(f"Deleted messages from user {user_id} to contact {contact['id']}")
 
@@ -334,12 +348,8 @@ async def delete_room_messages(
     user_id: int, room_id: int, session: AsyncSession
 ) -> dict[str, Any]:
 
-    query = """
-        DELETE FROM chat.messages
-        WHERE sender = :user_id AND room = :room_id
-    """
-    values = {"user_id": user_id, "room_id": str(room_id)}
-    await session.execute(text(query), values)
+    await create_tombstone(user_id, None, int(room_id), session)
+    await primary_pins.mark(user_id)
 
     logger.info(f"Deleted messages from user {user_id} in room {room_id}")
 
@@ -349,18 +359,92 @@ async def delete_room_messages(
     }
 
 
-async def mark_messages_as_read(
-    sender_id: int, receiver_id: int, session: AsyncSession
+async def update_read_marker(
+    user_id: int,
+    peer_id: Union[int, None],
+    room_id: Union[int, None],
+    message_id: int,
+    session: AsyncSession,
 ) -> None:
 
-    query = """
-        UPDATE chat.messages
-        SET status = 1, modified_date = :modified_date
-        WHERE sender = :sender_id AND receiver = :receiver_id AND status = 0
-    """
+    if room_id:
+        query = queries.UPDATE_ROOM_READ_MARKER
+        peer_id = None
+    else:
+        query = queries.UPDATE_PEER_READ_MARKER
+        room_id = None
+
     values = {
-        "sender_id": sender_id,
-        "receiver_id": receiver_id,
+        "user_id": user_id,
+        "peer_id": peer_id,
+        "room_id": room_id,
+        "message_id": message_id,
         "modified_date": datetime.datetime.utcnow(),
     }
-    await session.execute(text(query), values)
\ No newline at end of file
+    await db.execute(query, values, session)
+
+
+async def clamp_read_marker(
+    user_id: int,
+    peer_id: Union[int, None],
+    room_id: Union[int, None],
+    message_id: int,
+    session: AsyncSession,
+) -> int:
+    """
+    The message id a read marker may move to: the one the client sent,
+    capped at the newest message in that conversation, or 0 when the
+    conversation has none.
+    """
+
+    if room_id:
+        query, values = queries.LAST_ROOM_MESSAGE_ID, {"room_id": room_id}
+    else:
+        query = queries.LAST_PEER_MESSAGE_ID
+        values = {"user_id": user_id, "peer_id": peer_id}
+    last = await db.scalar(query, values, session)
+    return min(message_id, last or 0)
+
+
+async def mark_conversation_read(
+    user_id: int,
+    receiver_email: EmailStr,
+    message_id: int,
+    session: AsyncSession,
+) -> dict[str, Any]:
+
+    receiver = await find_existed_user(receiver_email, session)
+    if not receiver:
+        return {
+            "status_code": 400,
+            "message": "User not found!",
+        }
+
+    message_id = await clamp_read_marker(
+        user_id, receiver["id"], None, message_id, session
+    )
+    if message_id > 0 and read_markers.advance(
+        user_id, receiver["id"], None, message_id
+    ):
+        topic = "_".join(map(str, sorted([user_id, receiver["id"]])))
+        await publish_read_receipt(topic, user_id, message_id)
+
+    return {
+        "status_code": 200,
+        "message": "Conversation has been marked as read!",
+    }
+
+
+async def get_unread_counts(
+    user_id: int, session: AsyncSession
+) -> dict[str, Any]:
+
+    values = {"user_id": user_id}
+    contacts = await db.fetch_all(queries.GET_UNREAD_CONTACTS, values, session)
+    rooms = await db.fetch_all(queries.GET_UNREAD_ROOMS, values, session)
+
+    return {
+        "status_code": 200,
+        "contacts": [dict(row._mapping) for row in contacts],
+        "rooms": [dict(row._mapping) for row in rooms],
+    }
@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import collections
+import datetime
+import hashlib
+import logging
+import re
+from pathlib import Path
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+from app.chats import (
+    queries,
+)
+from app.config import (
+    settings,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.storage import (
+    staging_path,
+    storage,
+)
+
+logger = logging.getLogger(__name__)
+
+MEDIA_PREFIX = "media"
+MEDIA_URL_PREFIX = "/api/v1/chat/media/"
+LEGACY_FILES_PREFIX = "sent-files/chat/files/user"
+LEGACY_URL_PREFIX = "/api/v1/chat/files/user/"
+# Set by the media collector on files it has seen unreferenced.
+ORPHAN_KEY = "media_gc:orphan:{}"
+MEDIA_NAME = re.compile(r"^([0-9a-f]{64})(\.[0-9a-z]{1,10})?$")
+DEDUPE_BATCH_SIZE = 500
+
+
+def media_key(digest: str) -> str:
+    """Blobs are sharded two levels deep so no directory grows too large."""
+
+    return f"{MEDIA_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def media_url(digest: str, extension: str) -> str:
+    return f"{MEDIA_URL_PREFIX}{digest}{extension}"
+
+
+def parse_media_name(name: str) -> Optional[tuple[str, str]]:
+
+    match = MEDIA_NAME.match(name)
+    if match is None:
+        return None
+    return match.group(1), match.group(2) or ""
+
+
+def parse_media_url(url: str) -> Optional[tuple[str, str]]:
+
+    if not url.startswith(MEDIA_URL_PREFIX):
+        return None
+    return parse_media_name(url[len(MEDIA_URL_PREFIX):])
+
+
+async def record_blob(digest: str, size: int, session: AsyncSession) -> None:
+
+    values = {
+        "sha256": digest,
+        "size": size,
+        "modified_date": datetime.datetime.utcnow(),
+    }
+    await db.execute(queries.RECORD_MEDIA_BLOB, values, session)
+
+
+async def store_file(
+    path: Path, digest: str, size: int, session: AsyncSession
+) -> bool:
+    """
+    Record the blob and move a fully written staging file into the store
+    under its digest. If the content is already stored the file is dropped
+    instead. Returns whether the file was written.
+
+    The row is recorded before the file is looked at. The collector deletes
+    a blob's row and file in one transaction, so recording either waits
+    for that to finish and then finds the file gone, or bumps the row so
+    the collector leaves the blob alone.
+    """
+
+    await record_blob(digest, size, session)
+    key = media_key(digest)
+    if await storage.exists(key):
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+        await clear_orphan_mark(key)
+        return False
+    await storage.put_file(key, path)
+    return True
+
+
+async def store_bytes(content: bytes, session: AsyncSession) -> str:
+    """store_file for content held in memory. Returns the digest."""
+
+    digest = (await asyncio.to_thread(hashlib.sha256, content)).hexdigest()
+    await record_blob(digest, len(content), session)
+    key = media_key(digest)
+    if await storage.exists(key):
+        await clear_orphan_mark(key)
+    else:
+        await storage.put(key, content)
+    return digest
+
+
+async def clear_orphan_mark(key: str) -> None:
+    """A reused blob starts its grace period over with the collector."""
+
+    conn = await settings.redis_conn()
+    try:
+        await conn.delete(ORPHAN_KEY.format(key))
+    except Exception as e:
+        logger.warning(f"Orphan mark for {key} not cleared: {e}")
+    finally:
+        await conn.close()
+
+
+async def copy_into_store(key: str, session: AsyncSession) -> tuple[str, int]:
+
+    hasher = hashlib.sha256()
+    partial = staging_path()
+    size = 0
+    f = await asyncio.to_thread(open, partial, "wb")
+    try:
+        async for chunk in storage.stream(key):
+            hasher.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+            size += len(chunk)
+    finally:
+        await asyncio.to_thread(f.close)
+    digest = hasher.hexdigest()
+    await store_file(partial, digest, size, session)
+    return digest, size
+
+
+async def add_references(digest: str, refs: int, session: AsyncSession) -> None:
+    """Count messages linking to a blob; a negative refs releases them."""
+
+    values = {"sha256": digest, "refs": refs}
+    await db.execute(queries.ADD_MEDIA_REFERENCES, values, session)
+
+
+async def release_references(
+    urls: Iterable[Optional[str]], session: AsyncSession
+) -> None:
+    """Uncount the blobs linked by messages that were just deleted."""
+
+    refs: collections.Counter = collections.Counter()
+    for url in urls:
+        parsed = parse_media_url(url) if url else None
+        if parsed is not None:
+            refs[parsed[0]] += 1
+    for digest, count in refs.items():
+        await add_references(digest, -count, session)
+
+
+def _legacy_key(url: str) -> Optional[str]:
+
+    user_id, _, name = url[len(LEGACY_URL_PREFIX):].partition("/")
+    if not user_id.isdigit() or not name or "/" in name or name.startswith("."):
+        return None
+    return f"{LEGACY_FILES_PREFIX}/{user_id}/{name}"
+
+
+async def dedupe_legacy_files(
+    session: AsyncSession, delete: bool = False
+) -> dict[str, Any]:
+    """
+    Copy every per-user upload still referenced by a message into the
+    content-addressed store, count the references and point the messages
+    at the new URL. Safe to rerun; with delete=True the migrated originals
+    are removed once all messages have been rewritten.
+    """
+
+    migrated: dict[str, Optional[tuple[str, int]]] = {}
+    messages = 0
+    for tier in queries.MESSAGE_TABLES:
+        after = 0
+        while True:
+            values = {"batch_size": DEDUPE_BATCH_SIZE, "after": after}
+            rows = await db.fetch_all(
+                queries.GET_LEGACY_MEDIA_BATCH[tier], values, session
+            )
+            if not rows:
+                break
+            refs: collections.Counter = collections.Counter()
+            for row in rows:
+                if row.media not in migrated:
+                    key = _legacy_key(row.media)
+                    if key is None or not await storage.exists(key):
+                        migrated[row.media] = None
+                    else:
+                        migrated[row.media] = await copy_into_store(key, session)
+                blob = migrated[row.media]
+                if blob is None:
+                    continue
+                digest, _ = blob
+                new_url = media_url(digest, Path(row.media).suffix.lower())
+                await db.execute(
+                    queries.UPDATE_MESSAGE_MEDIA[tier],
+                    {"id": row.id, "media": new_url},
+                    session,
+                )
+                refs[blob] += 1
+                messages += 1
+            for (digest, _), count in refs.items():
+                await add_references(digest, count, session)
+            after = rows[-1].id
+
+    blobs = {blob for blob in migrated.values() if blob is not None}
+    if delete:
+        for url, blob in migrated.items():
+            if blob is not None:
+                await storage.delete(_legacy_key(url))
+    logger.info(
+        f"Moved {messages} messages onto {len(blobs)} stored blobs"
+        f" from {len(migrated)} legacy files."
+    )
+    return {
+        "status_code": 200,
+        "messages": messages,
+        "legacy_files": len(migrated),
+        "missing_files": sum(blob is None for blob in migrated.values()),
+        "blobs": len(blobs),
+    }
+
+
+async def _dedupe(delete: bool) -> None:  # pragma: no cover
+    from sqlalchemy.ext.asyncio import (
+        create_async_engine,
+    )
+
+    engine = create_async_engine(
+        settings.db_url, isolation_level="AUTOCOMMIT"
+    )
+    await storage.start()
+    try:
+        async with AsyncSession(engine) as session:
+            print(await dedupe_legacy_files(session, delete))
+    finally:
+        await storage.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        description="Move per-user chat uploads into the content-addressed"
+        " media store and rewrite the messages that reference them."
+    )
+    parser.add_argument(
+        "--delete",
+        action="store_true",
+        help="Remove the original files once their messages are rewritten.",
+    )
+    args = parser.parse_args()
+    asyncio.run(_dedupe(args.delete))
@@ -0,0 +1,328 @@
+import asyncio
+import datetime
+import json
+import logging
+import time
+from prometheus_client import (
+    Counter,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Optional,
+)
+
+from app.chats import (
+    queries,
+)
+from app.chats.media import (
+    MEDIA_PREFIX,
+    MEDIA_URL_PREFIX,
+    ORPHAN_KEY,
+    media_key,
+)
+from app.chats.thumbnails import (
+    THUMBNAIL_PREFIX,
+    THUMBNAIL_SIZES,
+    thumbnail_key,
+)
+from app.config import (
+    settings,
+)
+from app.users import (
+    queries as user_queries,
+)
+from app.users.avatars import (
+    PROFILE_IMAGES_PREFIX,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.engine import (
+    get_autocommit_session_factory,
+    get_transactional_session_factory,
+)
+from app.utils.storage import (
+    StoredObject,
+    storage,
+)
+
+logger = logging.getLogger(__name__)
+
+# Walked in this order; the cursor records the prefix and the last key done.
+GC_PREFIXES = (
+    MEDIA_PREFIX,
+    "sent-files",
+    "sent-images",
+    THUMBNAIL_PREFIX,
+    PROFILE_IMAGES_PREFIX,
+)
+CURSOR_KEY = "media_gc:cursor"
+
+MEDIA_GC_FILES = Counter(
+    "cychat_media_gc_files_total",
+    "Stored files checked by the media garbage collector, by outcome.",
+    ["prefix", "result"],
+)
+
+
+def _like_prefix(url: str) -> str:
+    """A LIKE pattern matching url and anything that starts with it."""
+
+    return url.replace("[", "[[]").replace("%", "[%]").replace("_", "[_]")
+
+
+def _message_urls(key: str) -> list[str]:
+    """
+    The URLs a message may use for a stored file. Legacy uploads were
+    linked with and without the /api/v1 prefix, and images were sometimes
+    served from the files directory, so every spelling is checked.
+    """
+
+    prefix, _, rest = key.partition("/")
+    if prefix == MEDIA_PREFIX:
+        return [f"{MEDIA_URL_PREFIX}{key.rsplit('/', 1)[-1]}"]
+    paths = {rest}
+    if rest.startswith("chat/files/user/"):
+        paths.add(rest.replace("chat/files/", "chat/images/", 1))
+    elif rest.startswith("chat/images/user/"):
+        paths.add(rest.replace("chat/images/", "chat/files/", 1))
+    return [
+        url for path in sorted(paths) for url in (f"/api/v1/{path}", f"/{path}")
+    ]
+
+
+async def _referenced_by_messages(
+    objects: list[StoredObject], session: AsyncSession
+) -> set[str]:
+
+    patterns = {
+        obj.key: [_like_prefix(url) for url in _message_urls(obj.key)]
+        for obj in objects
+    }
+    prefixes = sorted({p for ps in patterns.values() for p in ps})
+    values = {"prefixes": json.dumps(prefixes)}
+    rows = await db.fetch_all(queries.FIND_REFERENCED_MEDIA, values, session)
+    used = {row.prefix for row in rows}
+    return {key for key, ps in patterns.items() if used.intersection(ps)}
+
+
+async def _referenced_thumbnails(objects: list[StoredObject]) -> set[str]:
+
+    live = set()
+    for obj in objects:
+        digest = obj.key.rsplit("/", 1)[-1].split(".", 1)[0]
+        if await storage.exists(media_key(digest)):
+            live.add(obj.key)
+    return live
+
+
+async def _referenced_avatars(
+    objects: list[StoredObject], session: AsyncSession
+) -> set[str]:
+
+    owners = {obj.key: obj.key.split("/")[2] for obj in objects}
+    user_ids = sorted({int(owner) for owner in owners.values() if owner.isdigit()})
+    rows = await db.fetch_all(
+        user_queries.FIND_INACTIVE_USER_IDS,
+        {"user_ids": json.dumps(user_ids)},
+        session,
+    )
+    inactive = {str(row.id) for row in rows}
+    return {
+        key
+        for key, owner in owners.items()
+        if owner.isdigit() and owner not in inactive
+    }
+
+
+def _digest(key: str) -> str:
+    return key.rsplit("/", 1)[-1]
+
+
+async def _blob_dates(
+    digests: list[str], session: AsyncSession
+) -> dict[str, datetime.datetime]:
+
+    rows = await db.fetch_all(
+        queries.GET_MEDIA_BLOB_DATES, {"digests": json.dumps(digests)}, session
+    )
+    return {row.sha256: row.modified_date for row in rows}
+
+
+async def settled_objects(
+    prefix: str,
+    objects: list[StoredObject],
+    settled_before: datetime.datetime,
+    session: AsyncSession,
+) -> list[StoredObject]:
+    """
+    Files stored before the grace period. A blob is as old as the last
+    upload of its content, which chat.media_blobs records; the file's own
+    time only says when the first copy arrived.
+    """
+
+    if prefix != MEDIA_PREFIX or not objects:
+        return [obj for obj in objects if obj.modified < settled_before]
+    dates = await _blob_dates([_digest(obj.key) for obj in objects], session)
+    return [
+        obj for obj in objects
+        if dates.get(_digest(obj.key), obj.modified) < settled_before
+    ]
+
+
+async def referenced_keys(
+    prefix: str, objects: list[StoredObject], session: AsyncSession
+) -> set[str]:
+
+    if not objects:
+        return set()
+    if prefix == THUMBNAIL_PREFIX:
+        return await _referenced_thumbnails(objects)
+    if prefix == PROFILE_IMAGES_PREFIX:
+        return await _referenced_avatars(objects, session)
+    return await _referenced_by_messages(objects, session)
+
+
+class MediaCollector:
+    """
+    Deletes stored files nothing points at any more: attachments no
+    message links to, thumbnails of deleted blobs, and avatars of
+    deactivated or deleted accounts. It walks the store a small batch at a
+    time, keeping its position in Redis so a restart carries on where it
+    stopped. A file is only deleted once it has been seen unreferenced
+    for MEDIA_GC_GRACE_SECONDS, which also protects uploads whose message
+    has not been sent yet.
+    """
+
+    def __init__(self) -> None:
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _conn(self):
+        if self._redis is None:
+            self._redis = await settings.redis_conn()
+        return self._redis
+
+    async def _cursor(self) -> tuple[int, str]:
+
+        raw = await (await self._conn()).get(CURSOR_KEY)
+        if raw is None:
+            return 0, ""
+        cursor = json.loads(raw)
+        return cursor["prefix"], cursor["after"]
+
+    async def _save_cursor(self, prefix_index: int, after: str) -> None:
+        await (await self._conn()).set(
+            CURSOR_KEY, json.dumps({"prefix": prefix_index, "after": after})
+        )
+
+    async def _delete(
+        self, prefix: str, key: str, settled_before: datetime.datetime
+    ) -> bool:
+        """
+        Delete a file, unless its blob was uploaded again meanwhile or a
+        message still counts as referencing it. A blob's row and files are
+        deleted in one transaction: its lock on the row holds back uploads
+        of the same content, which record the row before they check for
+        the file, until the files are gone.
+        """
+
+        if prefix != MEDIA_PREFIX:
+            await storage.delete(key)
+            return True
+        digest = _digest(key)
+        session_factory = get_transactional_session_factory()
+        session = session_factory()
+        try:
+            values = {"sha256": digest, "settled_before": settled_before}
+            result = await db.execute(queries.DELETE_MEDIA_BLOB, values, session)
+            if result.rowcount == 0 and await _blob_dates([digest], session):
+                return False
+            for size in THUMBNAIL_SIZES:
+                await storage.delete(thumbnail_key(digest, size))
+            await storage.delete(key)
+            await session.commit()
+        finally:
+            await session_factory.remove()
+        return True
+
+    async def collect_batch(self, session: AsyncSession) -> bool:
+        """
+        Check the next batch of stored files. Returns True when a full pass
+        over the store has just finished.
+        """
+
+        conn = await self._conn()
+        prefix_index, after = await self._cursor()
+        if prefix_index >= len(GC_PREFIXES):
+            prefix_index, after = 0, ""
+        prefix = GC_PREFIXES[prefix_index]
+        objects = await storage.list(
+            prefix, after=after, limit=settings.MEDIA_GC_BATCH_SIZE
+        )
+
+        grace = settings.MEDIA_GC_GRACE_SECONDS
+        settled_before = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=grace
+        )
+        settled = await settled_objects(prefix, objects, settled_before, session)
+        referenced = await referenced_keys(prefix, settled, session)
+        for obj in settled:
+            mark = ORPHAN_KEY.format(obj.key)
+            if obj.key in referenced:
+                await conn.delete(mark)
+                MEDIA_GC_FILES.labels(prefix, "referenced").inc()
+                continue
+            first_seen = await conn.get(mark)
+            if first_seen is None:
+                await conn.set(mark, time.time(), ex=grace * 4)
+                MEDIA_GC_FILES.labels(prefix, "marked").inc()
+            elif time.time() - float(first_seen) >= grace:
+                await conn.delete(mark)
+                if not await self._delete(prefix, obj.key, settled_before):
+                    MEDIA_GC_FILES.labels(prefix, "reused").inc()
+                    continue
+                MEDIA_GC_FILES.labels(prefix, "deleted").inc()
+                logger.info(f"Deleted orphaned media {obj.key}.")
+
+        if len(objects) < settings.MEDIA_GC_BATCH_SIZE:
+            await self._save_cursor(prefix_index + 1, "")
+            return prefix_index + 1 >= len(GC_PREFIXES)
+        await self._save_cursor(prefix_index, objects[-1].key)
+        return False
+
+    async def _run(self) -> None:
+        while True:
+            finished = False
+            session_factory = get_autocommit_session_factory()
+            if session_factory is not None:
+                session = session_factory()
+                try:
+                    finished = await self.collect_batch(session)
+                except Exception as e:
+                    logger.warning(f"Media garbage collection failed: {e}")
+                    self._redis = None
+                finally:
+                    await session_factory.remove()
+            await asyncio.sleep(
+                settings.MEDIA_GC_INTERVAL_SECONDS
+                if finished
+                else settings.MEDIA_GC_PAUSE_SECONDS
+            )
+
+    def start(self) -> None:
+        if self._task is None and settings.MEDIA_GC_INTERVAL_SECONDS > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+media_collector = MediaCollector()
@@ -1,7 +1,12 @@
+import datetime
 from enum import Enum
 from sqlalchemy import (
+    BIGINT,
+    DateTime,
     ForeignKey,
+    Index,
     Integer,
+    PrimaryKeyConstraint,
     String,
 )
 from sqlalchemy.orm import (
@@ -36,5 +41,65 @@ class Messages(Base, CommonMixin, TimestampMixin):
     content: Mapped[str] = mapped_column(String(1024), nullable=False)
     message_type: Mapped[str] = mapped_column(String(10), nullable=False, default="text")
     status: Mapped[int] = mapped_column(Integer, nullable=False, default=MessageStatus.NOT_READ.value)
-    room: Mapped[Optional[str]] = mapped_column(String(50), index=True, nullable=True)
-    media: Mapped[Optional[str]] = mapped_column(String(220), nullable=True)
\ No newline at end of file
+    room: Mapped[Optional[int]] = mapped_column(ForeignKey("chat.rooms.id"), index=True, nullable=True)
+    media: Mapped[Optional[str]] = mapped_column(String(220), nullable=True)
+
+
+class MessagesArchive(Base):
+
+    __tablename__ = "messages_archive"
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "creation_date", "id", name="PK_messages_archive", mssql_clustered=True
+        ),
+        Index("UX_messages_archive_id", "id", unique=True),
+        Index("IX_messages_archive_sender", "sender", "receiver", "id"),
+        Index("IX_messages_archive_receiver", "receiver"),
+        Index("IX_messages_archive_room", "room", "id"),
+        {"schema": "chat"},
+    )
+
+    id: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    sender: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    receiver: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    content: Mapped[str] = mapped_column(String(1024), nullable=False)
+    message_type: Mapped[str] = mapped_column(String(10), nullable=False, default="text")
+    status: Mapped[int] = mapped_column(Integer, nullable=False, default=MessageStatus.NOT_READ.value)
+    room: Mapped[Optional[int]] = mapped_column(BIGINT, nullable=True)
+    media: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    creation_date: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    modified_date: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+
+
+class ReadMarkers(Base, CommonMixin, TimestampMixin):
+
+    __tablename__ = "read_markers"
+    __table_args__ = {"schema": "chat"}
+
+    user_id: Mapped[int] = mapped_column("user", ForeignKey("chat.users.id"), index=True, nullable=False)
+    peer_id: Mapped[Optional[int]] = mapped_column("peer", ForeignKey("chat.users.id"), nullable=True)
+    room_id: Mapped[Optional[int]] = mapped_column("room", ForeignKey("chat.rooms.id"), nullable=True)
+    last_read_message: Mapped[int] = mapped_column(BIGINT, nullable=False, default=0)
+
+
+class MessageTombstones(Base, CommonMixin, TimestampMixin):
+
+    __tablename__ = "message_tombstones"
+    __table_args__ = {"schema": "chat"}
+
+    sender: Mapped[int] = mapped_column(ForeignKey("chat.users.id"), index=True, nullable=False)
+    receiver: Mapped[Optional[int]] = mapped_column(ForeignKey("chat.users.id"), nullable=True)
+    room: Mapped[Optional[int]] = mapped_column(ForeignKey("chat.rooms.id"), nullable=True)
+    up_to_message: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    purged_count: Mapped[int] = mapped_column(BIGINT, nullable=False, default=0)
+    purged_date: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class MediaBlobs(Base, CommonMixin, TimestampMixin):
+
+    __tablename__ = "media_blobs"
+    __table_args__ = {"schema": "chat"}
+
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    size: Mapped[int] = mapped_column(BIGINT, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,148 @@
+import asyncio
+import datetime
+import logging
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Any,
+    Optional,
+)
+
+from app.chats import (
+    queries,
+)
+from app.chats.media import (
+    release_references,
+)
+from app.config import (
+    settings,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.dependencies import (
+    after_commit,
+)
+from app.utils.engine import (
+    get_autocommit_session_factory,
+)
+
+logger = logging.getLogger(__name__)
+
+PENDING_TOMBSTONES_LIMIT = 20
+
+
+async def create_tombstone(
+    sender_id: int,
+    receiver_id: Optional[int],
+    room_id: Optional[int],
+    session: AsyncSession,
+) -> int:
+
+    now = datetime.datetime.utcnow()
+    values = {
+        "sender": sender_id,
+        "receiver": receiver_id,
+        "room": room_id,
+        "creation_date": now,
+        "modified_date": now,
+    }
+    tombstone_id = await db.scalar(queries.CREATE_TOMBSTONE, values, session)
+    await after_commit(session, message_purger.wake)
+    return tombstone_id
+
+
+async def purge_tombstone(tombstone: Any, session: AsyncSession) -> int:
+    """
+    Delete the rows hidden by one tombstone, a small batch at a time, and
+    record progress after every batch so a restart resumes where it left.
+    """
+
+    batch_size = settings.MESSAGES_PURGE_BATCH_SIZE
+    if tombstone.room is not None:
+        statements = queries.PURGE_ROOM_MESSAGES
+        values = {"sender": tombstone.sender, "room": tombstone.room}
+    else:
+        statements = queries.PURGE_CHAT_MESSAGES
+        values = {"sender": tombstone.sender, "receiver": tombstone.receiver}
+    values.update(batch_size=batch_size, up_to_message=tombstone.up_to_message)
+
+    purged = 0
+    for query in statements:
+        while True:
+            deleted = await db.fetch_all(query, values, session)
+            rows = len(deleted)
+            if rows:
+                await release_references([row.media for row in deleted], session)
+                purged += rows
+                progress = {
+                    "id": tombstone.id,
+                    "purged": rows,
+                    "modified_date": datetime.datetime.utcnow(),
+                }
+                await db.execute(queries.UPDATE_TOMBSTONE_PROGRESS, progress, session)
+            if rows < batch_size:
+                break
+            await asyncio.sleep(settings.MESSAGES_PURGE_PAUSE_SECONDS)
+
+    values = {"id": tombstone.id, "purged_date": datetime.datetime.utcnow()}
+    await db.execute(queries.COMPLETE_TOMBSTONE, values, session)
+    logger.info(
+        f"Purged tombstone {tombstone.id}:"
+        f" {tombstone.purged_count + purged} messages removed."
+    )
+    return purged
+
+
+async def purge_pending_tombstones(session: AsyncSession) -> dict[str, Any]:
+
+    values = {"limit": PENDING_TOMBSTONES_LIMIT}
+    tombstones = await db.fetch_all(queries.GET_PENDING_TOMBSTONES, values, session)
+    purged = {}
+    for tombstone in tombstones:
+        purged[tombstone.id] = await purge_tombstone(tombstone, session)
+    return {"status_code": 200, "purged": purged}
+
+
+class MessagePurger:
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            session_factory = get_autocommit_session_factory()
+            if session_factory is not None:
+                session = session_factory()
+                try:
+                    result = await purge_pending_tombstones(session)
+                    if len(result["purged"]) == PENDING_TOMBSTONES_LIMIT:
+                        self._wakeup.set()
+                except Exception as e:
+                    logger.warning(f"Message purge failed: {e}")
+                finally:
+                    await session_factory.remove()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), settings.MESSAGES_PURGE_INTERVAL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+message_purger = MessagePurger()
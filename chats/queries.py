@@ -0,0 +1,653 @@
+from app.utils.query_registry import (
+    DATETIME,
+    ID,
+    INT,
+    STRING,
+    register,
+)
+
+MESSAGE_TABLES = {
+    "hot": "chat.messages",
+    "archive": "chat.messages_archive",
+}
+
+MESSAGE_COLUMNS = (
+    "id, sender, receiver, content, message_type, status, room, media,"
+    " creation_date, modified_date"
+)
+
+
+SEND_NEW_MESSAGE = register(
+    "chats.send_new_message",
+    """
+        INSERT INTO chat.messages (
+            sender,
+            receiver,
+            content,
+            message_type,
+            status,
+            room,
+            media,
+            creation_date,
+            modified_date
+        )
+        VALUES (
+            :sender,
+            :receiver,
+            :content,
+            :message_type,
+            0,
+            :room,
+            :media,
+            :creation_date,
+            :modified_date
+        )
+    """,
+    sender=ID,
+    receiver=ID,
+    content=STRING,
+    message_type=STRING,
+    room=ID,
+    media=STRING,
+    creation_date=DATETIME,
+    modified_date=DATETIME,
+)
+
+HISTORY_COLUMNS = """
+    m.id AS msg_id,
+    m.content,
+    IIF(m.sender = :sender_id, 'sent', 'received') AS type,
+    m.message_type,
+    m.media,
+    m.creation_date,
+    u.id,
+    u.nickname,
+    u.email,
+    u.phone_number
+"""
+
+NOT_TOMBSTONED = """
+    NOT EXISTS (
+        SELECT 1
+        FROM chat.message_tombstones t
+        WHERE
+            t.purged_date IS NULL
+            AND t.sender = m.sender
+            AND m.id <= t.up_to_message
+            AND (t.receiver = m.receiver OR t.room = m.room)
+    )
+"""
+
+HISTORY_CONVERSATIONS = {
+    "direct": (
+        """
+            (m.sender = :sender_id AND m.receiver = :receiver_id)
+            OR
+            (m.sender = :receiver_id AND m.receiver = :sender_id)
+        """,
+        {"sender_id": ID, "receiver_id": ID},
+    ),
+    "room": (
+        "m.room = :room_id",
+        {"sender_id": ID, "room_id": ID},
+    ),
+}
+
+# Full history across both tiers, keyed by conversation kind.
+GET_HISTORY = {}
+# One keyset page of a single tier, keyed by (kind, tier, has_cursor).
+GET_HISTORY_PAGE = {}
+
+for kind, (conversation, types) in HISTORY_CONVERSATIONS.items():
+    GET_HISTORY[kind] = register(
+        f"chats.get_history.{kind}",
+        f"""
+            SELECT
+                {HISTORY_COLUMNS}
+            FROM (
+                SELECT id, sender, receiver, content, message_type, media, room, creation_date
+                FROM chat.messages_archive m
+                WHERE {conversation}
+                UNION ALL
+                SELECT id, sender, receiver, content, message_type, media, room, creation_date
+                FROM chat.messages m
+                WHERE {conversation}
+            ) m
+            LEFT JOIN
+                chat.users u
+            ON
+                m.sender = u.id
+            WHERE
+                {NOT_TOMBSTONED}
+            ORDER BY
+                m.creation_date ASC
+        """,
+        **types,
+    )
+    for tier, table in MESSAGE_TABLES.items():
+        for has_cursor in (False, True):
+            suffix = ".before" if has_cursor else ""
+            cursor_types = {"before": ID} if has_cursor else {}
+            GET_HISTORY_PAGE[kind, tier, has_cursor] = register(
+                f"chats.get_history_page.{kind}.{tier}{suffix}",
+                f"""
+                    SELECT TOP (:limit)
+                        {HISTORY_COLUMNS}
+                    FROM
+                        {table} m
+                    LEFT JOIN
+                        chat.users u
+                    ON
+                        m.sender = u.id
+                    WHERE
+                        ({conversation})
+                        AND {NOT_TOMBSTONED}
+                        {"AND m.id < :before" if has_cursor else ""}
+                    ORDER BY
+                        m.id DESC
+                """,
+                limit=INT,
+                **types,
+                **cursor_types,
+            )
+
+# Whole history of one tier in id order, keyed by (kind, tier), for exports.
+EXPORT_HISTORY = {
+    (kind, tier): register(
+        f"chats.export_history.{kind}.{tier}",
+        f"""
+            SELECT
+                {HISTORY_COLUMNS}
+            FROM
+                {table} m
+            LEFT JOIN
+                chat.users u
+            ON
+                m.sender = u.id
+            WHERE
+                ({conversation})
+                AND {NOT_TOMBSTONED}
+            ORDER BY
+                m.id ASC
+        """,
+        **types,
+    )
+    for kind, (conversation, types) in HISTORY_CONVERSATIONS.items()
+    for tier, table in reversed(MESSAGE_TABLES.items())
+}
+
+GET_CHATS_USER = register(
+    "chats.get_chats_user",
+    """
+        SELECT DISTINCT
+            u.id,
+            u.nickname,
+            u.email,
+            u.phone_number,
+            u.user_role
+        FROM
+            chat.users u
+        WHERE
+            u.id IN (
+                SELECT DISTINCT receiver FROM chat.messages WHERE sender = :user_id
+                UNION
+                SELECT DISTINCT sender FROM chat.messages WHERE receiver = :user_id
+            )
+    """,
+    user_id=ID,
+)
+
+CREATE_TOMBSTONE = register(
+    "chats.create_tombstone",
+    """
+        INSERT INTO chat.message_tombstones (
+            sender,
+            receiver,
+            room,
+            up_to_message,
+            purged_count,
+            creation_date,
+            modified_date
+        )
+        OUTPUT
+            inserted.id
+        VALUES (
+            :sender,
+            :receiver,
+            :room,
+            CAST(IDENT_CURRENT('chat.messages') AS BIGINT),
+            0,
+            :creation_date,
+            :modified_date
+        )
+    """,
+    sender=ID,
+    receiver=ID,
+    room=ID,
+    creation_date=DATETIME,
+    modified_date=DATETIME,
+)
+
+GET_PENDING_TOMBSTONES = register(
+    "chats.get_pending_tombstones",
+    """
+        SELECT TOP (:limit)
+            id, sender, receiver, room, up_to_message, purged_count
+        FROM
+            chat.message_tombstones
+        WHERE
+            purged_date IS NULL
+        ORDER BY
+            id ASC
+    """,
+    limit=INT,
+)
+
+# Batched purges of tombstoned rows, one statement per message tier. The
+# deleted rows' media is returned so their blob references can be released.
+PURGE_CHAT_MESSAGES = [
+    register(
+        f"chats.purge_chat_messages.{tier}",
+        f"""
+            DELETE TOP (:batch_size)
+            FROM {table}
+            OUTPUT
+                deleted.media
+            WHERE
+                sender = :sender
+                AND receiver = :receiver
+                AND id <= :up_to_message
+        """,
+        batch_size=INT,
+        sender=ID,
+        receiver=ID,
+        up_to_message=ID,
+    )
+    for tier, table in MESSAGE_TABLES.items()
+]
+
+PURGE_ROOM_MESSAGES = [
+    register(
+        f"chats.purge_room_messages.{tier}",
+        f"""
+            DELETE TOP (:batch_size)
+            FROM {table}
+            OUTPUT
+                deleted.media
+            WHERE
+                sender = :sender
+                AND room = :room
+                AND id <= :up_to_message
+        """,
+        batch_size=INT,
+        sender=ID,
+        room=ID,
+        up_to_message=ID,
+    )
+    for tier, table in MESSAGE_TABLES.items()
+]
+
+UPDATE_TOMBSTONE_PROGRESS = register(
+    "chats.update_tombstone_progress",
+    """
+        UPDATE chat.message_tombstones
+        SET
+            purged_count = purged_count + :purged,
+            modified_date = :modified_date
+        WHERE
+            id = :id
+    """,
+    purged=INT,
+    modified_date=DATETIME,
+    id=ID,
+)
+
+COMPLETE_TOMBSTONE = register(
+    "chats.complete_tombstone",
+    """
+        UPDATE chat.message_tombstones
+        SET
+            purged_date = :purged_date,
+            modified_date = :purged_date
+        WHERE
+            id = :id
+    """,
+    purged_date=DATETIME,
+    id=ID,
+)
+
+
+def _update_read_marker(name: str, conversation: str):
+    return register(
+        name,
+        f"""
+            MERGE chat.read_markers WITH (HOLDLOCK) AS t
+            USING (
+                SELECT
+                    :user_id AS [user],
+                    :peer_id AS peer,
+                    :room_id AS room
+            ) AS s
+            ON
+                t.[user] = s.[user] AND {conversation}
+            WHEN MATCHED AND t.last_read_message < :message_id THEN
+                UPDATE SET
+                    last_read_message = :message_id,
+                    modified_date = :modified_date
+            WHEN NOT MATCHED THEN
+                INSERT (
+                    [user],
+                    peer,
+                    room,
+                    last_read_message,
+                    creation_date,
+                    modified_date
+                )
+                VALUES (
+                    s.[user],
+                    s.peer,
+                    s.room,
+                    :message_id,
+                    :modified_date,
+                    :modified_date
+                );
+        """,
+        user_id=ID,
+        peer_id=ID,
+        room_id=ID,
+        message_id=ID,
+        modified_date=DATETIME,
+    )
+
+
+UPDATE_PEER_READ_MARKER = _update_read_marker(
+    "chats.update_read_marker.peer",
+    "t.peer = s.peer AND t.room IS NULL",
+)
+
+UPDATE_ROOM_READ_MARKER = _update_read_marker(
+    "chats.update_read_marker.room",
+    "t.room = s.room AND t.peer IS NULL",
+)
+
+
+def _last_message_id(name: str, conversation: str, **types):
+    """The newest message id in a conversation, across every tier."""
+
+    tiers = "\n            UNION ALL\n            ".join(
+        f"SELECT MAX(id) AS id FROM {table} WHERE {conversation}"
+        for table in MESSAGE_TABLES.values()
+    )
+    return register(
+        name,
+        f"""
+            SELECT MAX(m.id) FROM (
+            {tiers}
+            ) m
+        """,
+        **types,
+    )
+
+
+LAST_PEER_MESSAGE_ID = _last_message_id(
+    "chats.last_message_id.peer",
+    "room IS NULL AND ("
+    "(sender = :user_id AND receiver = :peer_id)"
+    " OR (sender = :peer_id AND receiver = :user_id))",
+    user_id=ID,
+    peer_id=ID,
+)
+
+LAST_ROOM_MESSAGE_ID = _last_message_id(
+    "chats.last_message_id.room",
+    "room = :room_id",
+    room_id=ID,
+)
+
+GET_UNREAD_CONTACTS = register(
+    "chats.get_unread_contacts",
+    f"""
+        SELECT
+            m.sender AS peer,
+            u.email,
+            COUNT(*) AS unread_count,
+            MAX(m.id) AS last_message_id,
+            ISNULL(rm.last_read_message, 0) AS last_read_message_id
+        FROM
+            chat.messages m
+        INNER JOIN
+            chat.users u ON m.sender = u.id
+        LEFT JOIN
+            chat.read_markers rm
+        ON
+            rm.[user] = :user_id AND rm.peer = m.sender AND rm.room IS NULL
+        WHERE
+            m.receiver = :user_id
+            AND m.sender != :user_id
+            AND m.room IS NULL
+            AND m.id > ISNULL(rm.last_read_message, 0)
+            AND {NOT_TOMBSTONED}
+        GROUP BY
+            m.sender, u.email, rm.last_read_message
+    """,
+    user_id=ID,
+)
+
+GET_UNREAD_ROOMS = register(
+    "chats.get_unread_rooms",
+    f"""
+        SELECT
+            r.id AS room_id,
+            r.room_name,
+            COUNT(*) AS unread_count,
+            MAX(m.id) AS last_message_id,
+            ISNULL(rk.last_read_message, 0) AS last_read_message_id
+        FROM
+            chat.room_members rmb
+        INNER JOIN
+            chat.rooms r ON rmb.room = r.id
+        INNER JOIN
+            chat.messages m ON m.room = rmb.room
+        LEFT JOIN
+            chat.read_markers rk
+        ON
+            rk.[user] = :user_id AND rk.room = rmb.room AND rk.peer IS NULL
+        WHERE
+            rmb.member = :user_id
+            AND m.sender != :user_id
+            AND m.id > ISNULL(rk.last_read_message, 0)
+            AND {NOT_TOMBSTONED}
+        GROUP BY
+            r.id, r.room_name, rk.last_read_message
+    """,
+    user_id=ID,
+)
+
+GET_OLDEST_HOT_MESSAGE_DATE = register(
+    "chats.get_oldest_hot_message_date",
+    "SELECT MIN(creation_date) FROM chat.messages",
+)
+
+ARCHIVE_MESSAGES_BATCH = register(
+    "chats.archive_messages_batch",
+    f"""
+        DELETE TOP (:batch_size)
+        FROM
+            chat.messages WITH (READPAST)
+        OUTPUT
+            deleted.id,
+            deleted.sender,
+            deleted.receiver,
+            deleted.content,
+            deleted.message_type,
+            deleted.status,
+            deleted.room,
+            deleted.media,
+            deleted.creation_date,
+            deleted.modified_date
+        INTO
+            chat.messages_archive ({MESSAGE_COLUMNS})
+        WHERE
+            creation_date >= :start AND creation_date < :end
+    """,
+    batch_size=INT,
+    start=DATETIME,
+    end=DATETIME,
+)
+
+EXPORT_ARCHIVE_BATCH = register(
+    "chats.export_archive_batch",
+    f"""
+        SELECT TOP (:batch_size)
+            {MESSAGE_COLUMNS}
+        FROM
+            chat.messages_archive
+        WHERE
+            creation_date >= :start AND creation_date < :end
+            AND id > :after
+        ORDER BY
+            id ASC
+    """,
+    batch_size=INT,
+    start=DATETIME,
+    end=DATETIME,
+    after=ID,
+)
+
+PURGE_ARCHIVE_BATCH = register(
+    "chats.purge_archive_batch",
+    """
+        DELETE TOP (:batch_size)
+        FROM
+            chat.messages_archive
+        OUTPUT
+            deleted.media
+        WHERE
+            creation_date >= :start AND creation_date < :end
+    """,
+    batch_size=INT,
+    start=DATETIME,
+    end=DATETIME,
+)
+
+RECORD_MEDIA_BLOB = register(
+    "chats.record_media_blob",
+    """
+        MERGE chat.media_blobs WITH (HOLDLOCK) AS t
+        USING (SELECT :sha256 AS sha256) AS s
+        ON t.sha256 = s.sha256
+        WHEN MATCHED THEN
+            UPDATE SET
+                modified_date = :modified_date
+        WHEN NOT MATCHED THEN
+            INSERT (sha256, size, creation_date, modified_date)
+            VALUES (:sha256, :size, :modified_date, :modified_date);
+    """,
+    sha256=STRING,
+    size=ID,
+    modified_date=DATETIME,
+)
+
+ADD_MEDIA_REFERENCES = register(
+    "chats.add_media_references",
+    """
+        UPDATE chat.media_blobs
+        SET
+            ref_count = ref_count + :refs
+        WHERE
+            sha256 = :sha256
+    """,
+    sha256=STRING,
+    refs=INT,
+)
+
+# Messages still pointing at per-user upload URLs, keyed by tier.
+GET_LEGACY_MEDIA_BATCH = {
+    tier: register(
+        f"chats.get_legacy_media_batch.{tier}",
+        f"""
+            SELECT TOP (:batch_size)
+                id,
+                media
+            FROM
+                {table}
+            WHERE
+                id > :after
+                AND media LIKE '/api/v1/chat/files/user/%'
+            ORDER BY
+                id ASC
+        """,
+        batch_size=INT,
+        after=ID,
+    )
+    for tier, table in MESSAGE_TABLES.items()
+}
+
+UPDATE_MESSAGE_MEDIA = {
+    tier: register(
+        f"chats.update_message_media.{tier}",
+        f"""
+            UPDATE
+                {table}
+            SET
+                media = :media
+            WHERE
+                id = :id
+        """,
+        id=ID,
+        media=STRING,
+    )
+    for tier, table in MESSAGE_TABLES.items()
+}
+
+# Which of a batch of URL prefixes (a JSON array of LIKE patterns) are still
+# used by a message in any tier. The statement is the same for any batch.
+MEDIA_REFERENCED = "\n            OR ".join(
+    f"EXISTS (SELECT 1 FROM {table} m WHERE m.media LIKE j.prefix + '%')"
+    for table in MESSAGE_TABLES.values()
+)
+
+FIND_REFERENCED_MEDIA = register(
+    "chats.find_referenced_media",
+    f"""
+        SELECT
+            j.prefix
+        FROM
+            OPENJSON(:prefixes) WITH (prefix VARCHAR(250) '$') j
+        WHERE
+            {MEDIA_REFERENCED}
+    """,
+    prefixes=STRING,
+)
+
+# When each of a batch of blobs (a JSON array of digests) was last stored.
+GET_MEDIA_BLOB_DATES = register(
+    "chats.get_media_blob_dates",
+    """
+        SELECT
+            b.sha256,
+            b.modified_date
+        FROM
+            OPENJSON(:digests) WITH (sha256 CHAR(64) '$') j
+        INNER JOIN
+            chat.media_blobs b
+        ON
+            b.sha256 = j.sha256
+    """,
+    digests=STRING,
+)
+
+# HOLDLOCK also keeps an upload from recording the digest while the
+# collector's transaction is deleting its files, even if no row exists.
+DELETE_MEDIA_BLOB = register(
+    "chats.delete_media_blob",
+    """
+        DELETE FROM chat.media_blobs WITH (HOLDLOCK)
+        WHERE
+            sha256 = :sha256
+            AND ref_count <= 0
+            AND modified_date < :settled_before
+    """,
+    sha256=STRING,
+    settled_before=DATETIME,
+)
@@ -0,0 +1,411 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import (
+    asynccontextmanager,
+)
+from pathlib import Path
+from prometheus_client import (
+    Counter,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from starlette.requests import (
+    ClientDisconnect,
+    Request,
+)
+from typing import (
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    Optional,
+)
+
+from app.chats.crud import (
+    chat_file_info,
+    get_file_category,
+)
+from app.chats.media import (
+    store_file,
+)
+from app.chats.thumbnails import (
+    thumbnails,
+)
+from app.chats.uploads import (
+    MAX_UPLOAD_BYTES,
+    MB,
+    WRITE_BUFFER_BYTES,
+)
+from app.config import (
+    settings,
+)
+from app.utils.storage import (
+    STAGING_DIR,
+)
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+DATA_SUFFIX = ".upload"
+META_SUFFIX = ".upload.json"
+HASH_CHUNK_BYTES = 1024 * 1024
+# Windows locks byte ranges and refuses other handles' reads inside them,
+# so the lock covers one byte past any upload instead of the data.
+WINDOWS_LOCK_OFFSET = 1 << 40
+
+UPLOAD_BYTES = Counter(
+    "cychat_resumable_upload_bytes_total",
+    "Bytes received through resumable upload chunks.",
+)
+UPLOADS_SWEPT = Counter(
+    "cychat_resumable_uploads_expired_total",
+    "Unfinished uploads removed from the staging directory after expiring.",
+)
+
+
+class UploadBusy(Exception):
+    pass
+
+
+def _data_path(upload_id: str) -> Path:
+    return STAGING_DIR / f"{upload_id}{DATA_SUFFIX}"
+
+
+def _meta_path(upload_id: str) -> Path:
+    return STAGING_DIR / f"{upload_id}{META_SUFFIX}"
+
+
+def _create(upload_id: str, meta: dict[str, Any]) -> None:
+
+    _data_path(upload_id).touch()
+    _meta_path(upload_id).write_text(json.dumps(meta))
+
+
+def _read(upload_id: str) -> Optional[dict[str, Any]]:
+    """The upload's metadata; its offset is how many bytes are on disk."""
+
+    try:
+        meta = json.loads(_meta_path(upload_id).read_text())
+        meta["offset"] = os.stat(_data_path(upload_id)).st_size
+    except (FileNotFoundError, ValueError):
+        return None
+    return meta
+
+
+def _lock(f: BinaryIO) -> None:
+    """Take an exclusive lock on an open file, or raise UploadBusy."""
+
+    if os.name == "nt":
+        f.seek(WINDOWS_LOCK_OFFSET)
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise UploadBusy()
+        finally:
+            f.seek(0)
+    else:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadBusy()
+
+
+def _open_locked(upload_id: str) -> Optional[BinaryIO]:
+    """
+    Open the upload's staging file with an exclusive lock, which every
+    worker sharing UPLOAD_DIR honours. Returns None once the upload is
+    gone, including when it was completed between the open and the lock.
+    """
+
+    path = _data_path(upload_id)
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return None
+    try:
+        _lock(f)
+    except UploadBusy:
+        f.close()
+        raise
+    try:
+        current = os.stat(path).st_ino == os.fstat(f.fileno()).st_ino
+    except FileNotFoundError:
+        current = False
+    if not current:
+        f.close()
+        return None
+    return f
+
+
+def _hash_file(path: Path) -> str:
+
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _remove(upload_id: str) -> None:
+    _data_path(upload_id).unlink(missing_ok=True)
+    _meta_path(upload_id).unlink(missing_ok=True)
+
+
+class ResumableUploads:
+    """
+    Upload sessions for large attachments, sent as a series of PATCHes at
+    byte offsets. Chunks are written straight into a staging file whose
+    size is the session's offset, so whatever arrived before a dropped
+    connection is kept and the client resumes from there. Sessions live
+    next to the staging file, so every worker sharing UPLOAD_DIR can
+    continue them, and a lock on that file keeps requests for the same
+    upload from interleaving across workers.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    async def _session(self, upload_id: str, user_id: int) -> Optional[dict[str, Any]]:
+
+        if not UPLOAD_ID.match(upload_id):
+            return None
+        meta = await asyncio.to_thread(_read, upload_id)
+        if meta is None or meta["user_id"] != user_id:
+            return None
+        return meta
+
+    @asynccontextmanager
+    async def _claim(
+        self, upload_id: str, user_id: int
+    ) -> AsyncIterator[Optional[tuple[BinaryIO, dict[str, Any]]]]:
+        """
+        Hold the upload's file lock for the block, yielding the open
+        staging file and its metadata, or None if there is no such upload.
+        Raises UploadBusy while another request has it.
+        """
+
+        if not UPLOAD_ID.match(upload_id):
+            yield None
+            return
+        f = await asyncio.to_thread(_open_locked, upload_id)
+        if f is None:
+            yield None
+            return
+        try:
+            meta = await asyncio.to_thread(_read, upload_id)
+            if meta is None or meta["user_id"] != user_id:
+                yield None
+            else:
+                yield f, meta
+        finally:
+            await asyncio.to_thread(f.close)
+
+    async def create(self, user_id: int, filename: str, size: int) -> dict[str, Any]:
+
+        filename = Path(filename).name or "upload"
+        extension = Path(filename).suffix.lower() or ".bin"
+        limit = MAX_UPLOAD_BYTES[get_file_category(extension)]
+        if size > limit:
+            return {
+                "status_code": 413,
+                "message": f"File is larger than {limit // MB} MB!",
+            }
+        upload_id = uuid.uuid4().hex
+        meta = {
+            "user_id": user_id,
+            "filename": filename,
+            "extension": extension,
+            "size": size,
+        }
+        await asyncio.to_thread(_create, upload_id, meta)
+        return {
+            "status_code": 201,
+            "upload_id": upload_id,
+            "offset": 0,
+            "size": size,
+            "chunk_size": settings.UPLOAD_CHUNK_BYTES,
+            "expires_in": settings.UPLOAD_SESSION_TTL_SECONDS,
+        }
+
+    async def status(self, upload_id: str, user_id: int) -> dict[str, Any]:
+
+        meta = await self._session(upload_id, user_id)
+        if meta is None:
+            return {"status_code": 404, "message": "Upload not found!"}
+        return {
+            "status_code": 200,
+            "upload_id": upload_id,
+            "offset": meta["offset"],
+            "size": meta["size"],
+        }
+
+    async def append(
+        self, request: Request, upload_id: str, user_id: int, offset: int
+    ) -> dict[str, Any]:
+        """
+        Write the request body at offset, which must be the current end of
+        the upload. Bytes past the declared size are refused and the chunk
+        is rolled back; bytes received before a disconnect are kept.
+        """
+
+        try:
+            async with self._claim(upload_id, user_id) as claimed:
+                if claimed is None:
+                    return {"status_code": 404, "message": "Upload not found!"}
+                f, meta = claimed
+                if offset != meta["offset"]:
+                    return {
+                        "status_code": 409,
+                        "message": "Offset does not match the upload!",
+                        "offset": meta["offset"],
+                    }
+                received = await self._write(
+                    request, f, upload_id, offset, meta["size"]
+                )
+        except UploadBusy:
+            return {"status_code": 409, "message": "Upload is busy, try again!"}
+
+        if received is None:
+            return {
+                "status_code": 413,
+                "message": "Chunk goes past the end of the upload!",
+                "offset": offset,
+            }
+        UPLOAD_BYTES.inc(received)
+        return {"status_code": 200, "offset": offset + received, "size": meta["size"]}
+
+    @staticmethod
+    async def _write(
+        request: Request, f: BinaryIO, upload_id: str, offset: int, size: int
+    ) -> Optional[int]:
+
+        remaining = size - offset
+        received = 0
+        buffer = bytearray()
+        try:
+            await asyncio.to_thread(f.seek, offset)
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > remaining:
+                    buffer = bytearray()
+                    await asyncio.to_thread(f.truncate, offset)
+                    return None
+                buffer += chunk
+                if len(buffer) >= WRITE_BUFFER_BYTES:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+                    buffer = bytearray()
+        except ClientDisconnect:
+            logger.info(f"Upload {upload_id} interrupted at {offset + received} bytes.")
+        finally:
+            if buffer:
+                await asyncio.to_thread(f.write, bytes(buffer))
+            await asyncio.to_thread(f.flush)
+        return received
+
+    async def complete(
+        self, upload_id: str, user_id: int, session: AsyncSession
+    ) -> dict[str, Any]:
+        """Move a fully received upload into the media store."""
+
+        try:
+            async with self._claim(upload_id, user_id) as claimed:
+                if claimed is None:
+                    return {"status_code": 404, "message": "Upload not found!"}
+                _, meta = claimed
+                if meta["offset"] != meta["size"]:
+                    return {
+                        "status_code": 409,
+                        "message": "Upload is not complete yet!",
+                        "offset": meta["offset"],
+                    }
+                digest = await asyncio.to_thread(_hash_file, _data_path(upload_id))
+                # Without its metadata no other request can claim the
+                # upload, so the file is moved once it is closed: Windows
+                # cannot rename a file that is still open.
+                await asyncio.to_thread(_meta_path(upload_id).unlink)
+        except UploadBusy:
+            return {"status_code": 409, "message": "Upload is busy, try again!"}
+        await store_file(_data_path(upload_id), digest, meta["size"], session)
+
+        thumbnails.schedule(digest, meta["extension"], meta["size"])
+        logger.info(f"Resumable upload by user {user_id}: {digest} ({meta['size']} bytes)")
+        return chat_file_info(digest, meta["extension"], meta["filename"], meta["size"])
+
+    async def abort(self, upload_id: str, user_id: int) -> dict[str, Any]:
+
+        try:
+            async with self._claim(upload_id, user_id) as claimed:
+                if claimed is None:
+                    return {"status_code": 404, "message": "Upload not found!"}
+                await asyncio.to_thread(_remove, upload_id)
+        except UploadBusy:
+            return {"status_code": 409, "message": "Upload is busy, try again!"}
+        return {"status_code": 200, "message": "Upload has been cancelled!"}
+
+    def _sweep(self) -> int:
+        """
+        Remove uploads nobody has written to within the session lifetime,
+        along with staging files left behind by interrupted streamed
+        uploads or completions.
+        """
+
+        expired_before = time.time() - settings.UPLOAD_SESSION_TTL_SECONDS
+        swept = 0
+        try:
+            entries = list(os.scandir(STAGING_DIR))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime >= expired_before:
+                    continue
+                if entry.name.endswith(META_SUFFIX):
+                    upload_id = entry.name[: -len(META_SUFFIX)]
+                    data = _data_path(upload_id)
+                    if data.exists() and data.stat().st_mtime >= expired_before:
+                        continue
+                    _remove(upload_id)
+                    swept += 1
+                elif entry.name.endswith(".part"):
+                    os.unlink(entry.path)
+                elif entry.name.endswith(DATA_SUFFIX):
+                    upload_id = entry.name[: -len(DATA_SUFFIX)]
+                    if not _meta_path(upload_id).exists():
+                        os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+        return swept
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                swept = await asyncio.to_thread(self._sweep)
+                if swept:
+                    UPLOADS_SWEPT.inc(swept)
+                    logger.info(f"Removed {swept} expired uploads.")
+            except Exception as e:
+                logger.warning(f"Sweeping expired uploads failed: {e}")
+            await asyncio.sleep(settings.UPLOAD_SWEEP_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None and settings.UPLOAD_SWEEP_INTERVAL_SECONDS > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+resumable_uploads = ResumableUploads()
@@ -1,12 +1,14 @@
 import mimetypes
-import os
 from fastapi import (
     APIRouter,
     Depends,
+    Header,
     HTTPException,
+    Query,
+    Request,
 )
 from fastapi.responses import (
-    FileResponse,
+    StreamingResponse,
 )
 from pathlib import Path
 from pydantic import (
@@ -16,6 +18,7 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
 from typing import (
+    Optional,
     Union,
 )
 
@@ -24,33 +27,59 @@ from app.auth.schemas import (
 )
 from app.chats.crud import (
     delete_chat_messages,
+    export_sender_receiver_messages,
     get_chats_user,
     get_sender_receiver_messages,
+    get_unread_counts,
+    mark_conversation_read,
     send_new_message,
 )
+from app.chats.media import (
+    media_key,
+    parse_media_name,
+)
+from app.chats.resumable import (
+    resumable_uploads,
+)
 from app.chats.schemas import (
     DeleteChatMessages,
     GetAllMessageResults,
+    MarkConversationRead,
     MessageCreate,
+    UploadCreate,
+)
+from app.chats.thumbnails import (
+    THUMBNAIL_MIME_TYPE,
+    THUMBNAIL_PATTERN,
+    thumbnails,
+)
+from app.chats.uploads import (
+    receive_chat_file,
 )
 from app.users.schemas import (
     UserObjectSchema,
 )
 from app.utils.dependencies import (
-    get_db_autocommit_session,
+    get_db_session,
+)
+from app.utils.file_responses import (
+    is_uuid_name,
+    send_file,
 )
 from app.utils.jwt_util import (
     get_current_active_user,
 )
+from app.utils.read_replica import (
+    get_db_read_session,
+)
+from app.utils.responses import (
+    ROW_FORMATS,
+    rows_response,
+)
 
 
-UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
-SENT_FILES_DIR = UPLOAD_DIR / "sent-files"
-SENT_IMAGES_DIR = UPLOAD_DIR / "sent-images"  
-
-
-SENT_FILES_DIR.mkdir(parents=True, exist_ok=True)
-SENT_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+SENT_FILES_PREFIX = "sent-files"
+SENT_IMAGES_PREFIX = "sent-images"
 
 
 MIME_TYPES = {
@@ -133,7 +162,7 @@ router = APIRouter(prefix="/api/v1")
 async def send_message(
     request: MessageCreate,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
     results = await send_new_message(
         currentUser.id, request, None, None, session
@@ -155,16 +184,100 @@ async def send_message(
 )
 async def get_conversation(
     receiver: EmailStr,
+    before: Optional[int] = Query(None, gt=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_read_session),
 ):
 
     results = await get_sender_receiver_messages(
-        currentUser, receiver, session
+        currentUser, receiver, session, before, limit
+    )
+    return rows_response(results, format)
+
+
+@router.get(
+    "/conversation/export",
+    status_code=200,
+    name="chats:export-conversation",
+    responses={
+        200: {
+            "description": "Stream the whole conversation as NDJSON, oldest first.",
+            "content": {"application/x-ndjson": {}},
+        },
+        400: {
+            "model": ResponseSchema,
+            "description": "The other party was not found!",
+        },
+    },
+)
+async def export_conversation(
+    receiver: EmailStr,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+
+    results = await export_sender_receiver_messages(currentUser, receiver, session)
+    if results["status_code"] != 200:
+        return results
+    return StreamingResponse(
+        results["stream"],
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="{results["filename"]}"'
+        },
+    )
+
+
+@router.post(
+    "/conversation/read",
+    response_model=ResponseSchema,
+    status_code=200,
+    name="chats:mark-conversation-read",
+    responses={
+        200: {
+            "model": ResponseSchema,
+            "description": "The read marker of the conversation has been advanced.",
+        },
+        400: {
+            "model": ResponseSchema,
+            "description": "The other party was not found!",
+        },
+    },
+)
+async def mark_read(
+    request: MarkConversationRead,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+
+    results = await mark_conversation_read(
+        currentUser.id, request.receiver, request.message_id, session
     )
     return results
 
 
+@router.get(
+    "/conversations/unread",
+    status_code=200,
+    name="chats:get-unread-counts",
+    responses={
+        200: {
+            "description": "Return unread message counts per contact and per room.",
+        },
+    },
+)
+async def get_unread(
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+
+    results = await get_unread_counts(currentUser.id, session)
+    return rows_response(results, format)
+
+
 @router.get(
     "/contacts/chat/search",
     status_code=200,
@@ -172,12 +285,13 @@ async def get_conversation(
 )
 async def get_chats_user_list(
     search: str,
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_read_session),
 ):
 
     results = await get_chats_user(currentUser.id, search, session)
-    return results
+    return rows_response(results, format)
 
 
 @router.get(
@@ -187,12 +301,13 @@ async def get_chats_user_list(
 )
 async def get_chats_user_search_list(
     search: str,
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_read_session),
 ):
 
     results = await get_chats_user(currentUser.id, search, session)
-    return results
+    return rows_response(results, format)
 
 
 @router.delete(
@@ -215,7 +330,7 @@ async def get_chats_user_search_list(
 async def delete_user_chat(
     contact: DeleteChatMessages,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
     """
     The delete_user_chat endpoint.
@@ -226,21 +341,125 @@ async def delete_user_chat(
     return results
 
 
+@router.post("/chat/files", name="chats:upload-file")
+async def upload_chat_file(
+    request: Request,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+
+    results = await receive_chat_file(request, currentUser.id, session)
+    return results
+
+
+@router.post("/chat/uploads", name="chats:create-upload")
+async def create_upload(
+    upload: UploadCreate,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+):
+
+    results = await resumable_uploads.create(
+        currentUser.id, upload.filename, upload.size
+    )
+    return results
+
+
+@router.get("/chat/uploads/{upload_id}", name="chats:upload-status")
+async def get_upload_status(
+    upload_id: str,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+):
+
+    results = await resumable_uploads.status(upload_id, currentUser.id)
+    return results
+
+
+@router.patch("/chat/uploads/{upload_id}", name="chats:upload-chunk")
+async def upload_chunk(
+    request: Request,
+    upload_id: str,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+):
+
+    results = await resumable_uploads.append(
+        request, upload_id, currentUser.id, upload_offset
+    )
+    return results
+
+
+@router.post("/chat/uploads/{upload_id}/complete", name="chats:complete-upload")
+async def complete_upload(
+    upload_id: str,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+
+    results = await resumable_uploads.complete(upload_id, currentUser.id, session)
+    return results
+
+
+@router.delete("/chat/uploads/{upload_id}", name="chats:abort-upload")
+async def abort_upload(
+    upload_id: str,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+):
+
+    results = await resumable_uploads.abort(upload_id, currentUser.id)
+    return results
+
+
+@router.get("/chat/media/{name}", name="chats:media")
+async def get_chat_media(
+    request: Request,
+    name: str,
+    size: Optional[str] = Query(None, pattern=THUMBNAIL_PATTERN),
+):
+
+    parsed = parse_media_name(name)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    digest, extension = parsed
+    if size is not None:
+        thumbnail_key = await thumbnails.key(digest, extension, size)
+        if thumbnail_key is not None:
+            response = await send_file(
+                request,
+                thumbnail_key,
+                THUMBNAIL_MIME_TYPE,
+                etag=f"{digest}-{size}",
+                immutable=True,
+            )
+            if response is not None:
+                return response
+    response = await send_file(
+        request,
+        media_key(digest),
+        get_mime_type(name),
+        filename=name,
+        etag=digest,
+        immutable=True,
+    )
+    if response is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return response
+
+
 @router.get("/chat/files/user/{user_id}/{filename}")
-async def get_sent_user_chat_file(user_id: int, filename: str):
+async def get_sent_user_chat_file(request: Request, user_id: int, filename: str):
 
     try:
-        file_path = SENT_FILES_DIR / "chat" / "files" / "user" / str(user_id) / filename
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        mime_type = get_mime_type(filename)
-        
-        return FileResponse(
-            path=str(file_path),
-            media_type=mime_type,
-            filename=filename
+        key = f"{SENT_FILES_PREFIX}/chat/files/user/{user_id}/{filename}"
+        response = await send_file(
+            request,
+            key,
+            get_mime_type(filename),
+            filename=filename,
+            immutable=is_uuid_name(filename),
         )
+        if response is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return response
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
@@ -248,26 +467,26 @@ async def get_sent_user_chat_file(user_id: int, filename: str):
 
 
 @router.get("/chat/images/user/{user_id}/{uuid_val}")
-async def get_sent_user_chat_images(user_id: int, uuid_val: str):
+async def get_sent_user_chat_images(request: Request, user_id: int, uuid_val: str):
 
     try:
-
-        file_path = SENT_FILES_DIR / "chat" / "files" / "user" / str(user_id) / uuid_val
-        if not file_path.exists():
-
-            file_path = SENT_IMAGES_DIR / "chat" / "images" / "user" / str(user_id) / uuid_val
-        
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="Image not found")
-        
         mime_type = get_mime_type(uuid_val)
-        
-        return FileResponse(
-            path=str(file_path),
-            media_type=mime_type,
-            filename=uuid_val
-        )
+        immutable = is_uuid_name(uuid_val)
+        for key in (
+            f"{SENT_FILES_PREFIX}/chat/files/user/{user_id}/{uuid_val}",
+            f"{SENT_IMAGES_PREFIX}/chat/images/user/{user_id}/{uuid_val}",
+        ):
+            response = await send_file(
+                request,
+                key,
+                mime_type,
+                filename=uuid_val,
+                immutable=immutable,
+            )
+            if response is not None:
+                return response
+        raise HTTPException(status_code=404, detail="Image not found")
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
-        return {"status_code": 400, "message": "Something went wrong!"}
\ No newline at end of file
+        return {"status_code": 400, "message": "Something went wrong!"}
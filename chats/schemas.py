@@ -43,10 +43,27 @@ class GetAllMessageResults(BaseModel):
 
     status_code: int = Field(..., example=200)
     result: list[dict[str, Any]]
+    next_cursor: Optional[int] = Field(
+        None, example=1024, description="Pass as `before` to load older messages."
+    )
 
 
 class DeleteChatMessages(BaseModel):
     contact: EmailStr = Field(
         ...,
         example="The recipient email for the sent messages to be deleted.",
-    )
\ No newline at end of file
+    )
+
+
+class MarkConversationRead(BaseModel):
+    receiver: EmailStr = Field(
+        ..., example="The email of the other party in the conversation."
+    )
+    message_id: int = Field(
+        ..., example=1024, gt=0, description="The newest message id that has been read."
+    )
+
+
+class UploadCreate(BaseModel):
+    filename: str = Field(..., example="holiday.mp4", max_length=255)
+    size: int = Field(..., example=524288000, gt=0, description="Total bytes.")
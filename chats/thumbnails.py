@@ -0,0 +1,177 @@
+import asyncio
+import io
+import logging
+import time
+from collections import (
+    OrderedDict,
+)
+from concurrent.futures import (
+    ProcessPoolExecutor,
+)
+from prometheus_client import (
+    Counter,
+    Histogram,
+)
+from typing import (
+    Optional,
+)
+
+from app.chats.media import (
+    media_key,
+)
+from app.config import (
+    settings,
+)
+from app.utils.storage import (
+    storage,
+)
+
+try:
+    from PIL import (
+        Image,
+        ImageOps,
+    )
+except ImportError:  # pragma: no cover
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_PREFIX = "thumbs"
+THUMBNAIL_SIZES = {"small": 160, "medium": 640}
+THUMBNAIL_PATTERN = "^(small|medium)$"
+THUMBNAIL_EXTENSION = ".webp"
+THUMBNAIL_MIME_TYPE = "image/webp"
+# Formats Pillow can decode; vector images are served as they are.
+THUMBNAIL_SOURCES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
+# Matches the image upload limit; anything larger is not decoded.
+THUMBNAIL_MAX_SOURCE_BYTES = 20 * 1024 * 1024
+# Digests whose thumbnails failed, remembered so they are not retried.
+THUMBNAIL_FAILURE_MEMORY = 10000
+
+THUMBNAILS_RENDERED = Counter(
+    "cychat_thumbnails_total",
+    "Image attachments thumbnailed, by outcome.",
+    ["result"],
+)
+THUMBNAIL_TIME = Histogram(
+    "cychat_thumbnail_duration_seconds",
+    "Time from queueing an image to all its thumbnails being written.",
+)
+
+
+def thumbnail_key(digest: str, size: str) -> str:
+    return f"{THUMBNAIL_PREFIX}/{size}/{digest[:2]}/{digest[2:4]}/{digest}{THUMBNAIL_EXTENSION}"
+
+
+def _render(content: bytes, sizes: list[str]) -> dict[str, bytes]:
+    """
+    Runs in a worker process: decode the image once and encode each
+    requested size, so only bytes cross the process boundary and the
+    parent can put them into whichever storage backend is configured.
+    """
+
+    rendered = {}
+    with Image.open(io.BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for size in sizes:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((THUMBNAIL_SIZES[size],) * 2)
+            output = io.BytesIO()
+            thumbnail.save(output, format="WEBP", quality=80)
+            rendered[size] = output.getvalue()
+    return rendered
+
+
+class ThumbnailWorker:
+    """
+    Renders thumbnails for image attachments in a process pool, so
+    decoding and resizing never holds the event loop or the GIL. Work is
+    queued only when an image is uploaded and is fire-and-forget: until
+    a thumbnail exists the original is served.
+    """
+
+    def __init__(self) -> None:
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: dict[str, asyncio.Task] = {}
+        self._failed: OrderedDict[str, None] = OrderedDict()
+
+    @staticmethod
+    def supports(extension: str) -> bool:
+        return Image is not None and extension.lower() in THUMBNAIL_SOURCES
+
+    def schedule(self, digest: str, extension: str, size: int) -> None:
+
+        if (
+            self._executor is None
+            or digest in self._pending
+            or digest in self._failed
+            or size > THUMBNAIL_MAX_SOURCE_BYTES
+            or not self.supports(extension)
+        ):
+            return
+        self._pending[digest] = asyncio.create_task(self._generate(digest))
+
+    async def _generate(self, digest: str) -> None:
+
+        queued = time.perf_counter()
+        try:
+            sizes = [
+                size
+                for size in THUMBNAIL_SIZES
+                if not await storage.exists(thumbnail_key(digest, size))
+            ]
+            if not sizes:
+                THUMBNAILS_RENDERED.labels("cached").inc()
+                return
+            content = await storage.get(media_key(digest))
+            if content is None:
+                return
+            loop = asyncio.get_running_loop()
+            rendered = await loop.run_in_executor(
+                self._executor, _render, content, sizes
+            )
+            for size, thumbnail in rendered.items():
+                await storage.put(thumbnail_key(digest, size), thumbnail)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._failed[digest] = None
+            if len(self._failed) > THUMBNAIL_FAILURE_MEMORY:
+                self._failed.popitem(last=False)
+            THUMBNAILS_RENDERED.labels("failed").inc()
+            logger.warning(f"Thumbnail for {digest} failed: {e!r}")
+            return
+        finally:
+            self._pending.pop(digest, None)
+        THUMBNAILS_RENDERED.labels("rendered").inc()
+        THUMBNAIL_TIME.observe(time.perf_counter() - queued)
+
+    async def key(self, digest: str, extension: str, size: str) -> Optional[str]:
+        """
+        The thumbnail to serve for a blob, or None to serve the original.
+        Nothing is rendered here: the extension comes from the URL, not
+        from the upload, so only thumbnails queued at upload are served.
+        """
+
+        if not self.supports(extension):
+            return None
+        key = thumbnail_key(digest, size)
+        if await storage.exists(key):
+            return key
+        return None
+
+    def start(self) -> None:
+        if self._executor is None and Image is not None and settings.THUMBNAIL_WORKERS > 0:
+            self._executor = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+
+    async def stop(self) -> None:
+        if self._executor is not None:
+            for task in list(self._pending.values()):
+                task.cancel()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+thumbnails = ThumbnailWorker()
@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from starlette.requests import (
+    ClientDisconnect,
+    Request,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Any,
+    BinaryIO,
+    Optional,
+)
+
+from app.chats.crud import (
+    chat_file_info,
+    get_file_category,
+)
+from app.chats.media import (
+    parse_media_url,
+    store_file,
+)
+from app.chats.thumbnails import (
+    thumbnails,
+)
+from app.utils.storage import (
+    staging_path,
+)
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import (
+        MultipartParser,
+        parse_options_header,
+    )
+except ModuleNotFoundError:  # pragma: no cover
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import (
+        MultipartParser,
+        parse_options_header,
+    )
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+MAX_UPLOAD_BYTES = {
+    "image": 20 * MB,
+    "document": 50 * MB,
+    "video": 500 * MB,
+    "audio": 100 * MB,
+    "archive": 200 * MB,
+    "code": 5 * MB,
+    "file": 50 * MB,
+}
+FILE_FIELD = "file"
+WRITE_BUFFER_BYTES = 256 * 1024
+
+
+class UploadRejected(Exception):
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class _PartialFile:
+    """
+    A file being received into the staging directory. Writes are buffered
+    and handed to a worker thread, which also hashes them, so the event
+    loop never waits on the disk; the size limit is checked as bytes
+    arrive.
+    """
+
+    def __init__(self, filename: str, limit: int) -> None:
+        self.filename = filename
+        self.extension = Path(filename).suffix.lower() or ".bin"
+        self.limit = limit
+        self.size = 0
+        self.path = staging_path()
+        self._hasher = hashlib.sha256()
+        self._buffer = bytearray()
+        self._file: Optional[BinaryIO] = None
+
+    async def open(self) -> None:
+        self._file = await asyncio.to_thread(open, self.path, "wb")
+
+    async def write(self, data: bytes) -> None:
+
+        self.size += len(data)
+        if self.size > self.limit:
+            raise UploadRejected(
+                413, f"File is larger than {self.limit // MB} MB!"
+            )
+        self._buffer += data
+        if len(self._buffer) >= WRITE_BUFFER_BYTES:
+            await self.flush()
+
+    def _write(self, chunk: bytes) -> None:
+        self._hasher.update(chunk)
+        self._file.write(chunk)
+
+    async def flush(self) -> None:
+        if self._buffer:
+            chunk, self._buffer = bytes(self._buffer), bytearray()
+            await asyncio.to_thread(self._write, chunk)
+
+    async def close(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+    async def commit(self, session: AsyncSession) -> str:
+
+        await self.flush()
+        await self.close()
+        digest = self._hasher.hexdigest()
+        await store_file(self.path, digest, self.size, session)
+        return digest
+
+    async def discard(self) -> None:
+
+        await self.close()
+        await asyncio.to_thread(self.path.unlink, missing_ok=True)
+
+
+class _MultipartEvents:
+    """Collects python-multipart callbacks so they can be awaited in order."""
+
+    def __init__(self) -> None:
+        self.events: list[tuple[str, Any]] = []
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_part_begin(self) -> None:
+        self.events.append(("begin", None))
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.events.append(
+            ("header", (self._header_field.lower(), self._header_value))
+        )
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        self.events.append(("headers", None))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self.events.append(("data", data[start:end]))
+
+    def on_part_end(self) -> None:
+        self.events.append(("end", None))
+
+    def callbacks(self) -> dict[str, Any]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def drain(self) -> list[tuple[str, Any]]:
+        events, self.events = self.events, []
+        return events
+
+
+def _file_part(headers: dict[bytes, bytes]) -> Optional[str]:
+
+    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+    if options.get(b"name", b"").decode("latin-1") != FILE_FIELD:
+        return None
+    filename = options.get(b"filename")
+    if filename is None:
+        return None
+    return Path(filename.decode("utf-8", errors="replace")).name or "upload"
+
+
+async def _receive_file_part(request: Request, boundary: bytes) -> _PartialFile:
+
+    events = _MultipartEvents()
+    parser = MultipartParser(boundary, events.callbacks())
+    headers: dict[bytes, bytes] = {}
+    current: Optional[_PartialFile] = None
+    received: Optional[_PartialFile] = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, value in events.drain():
+                if kind == "begin":
+                    headers = {}
+                elif kind == "header":
+                    headers[value[0]] = value[1]
+                elif kind == "headers" and received is None:
+                    filename = _file_part(headers)
+                    if filename is not None:
+                        category = get_file_category(Path(filename).suffix)
+                        current = _PartialFile(filename, MAX_UPLOAD_BYTES[category])
+                        await current.open()
+                elif kind == "data" and current is not None:
+                    await current.write(value)
+                elif kind == "end" and current is not None:
+                    received, current = current, None
+        parser.finalize()
+    except BaseException:
+        for partial in (current, received):
+            if partial is not None:
+                await partial.discard()
+        raise
+
+    if received is None:
+        raise UploadRejected(400, f"No `{FILE_FIELD}` field in the upload!")
+    return received
+
+
+async def receive_chat_file(
+    request: Request, user_id: int, session: AsyncSession
+) -> dict[str, Any]:
+    """
+    Stream the `file` field of a multipart upload to disk and move it into
+    the media store once complete. Returns the same dict as
+    save_chat_file, or a status_code/message dict when the upload is
+    refused.
+    """
+
+    content_type, options = parse_options_header(
+        request.headers.get("content-type", "")
+    )
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        return {"status_code": 400, "message": "Expected a multipart/form-data upload!"}
+    try:
+        content_length = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        return {"status_code": 400, "message": "Invalid Content-Length header!"}
+    if content_length > max(MAX_UPLOAD_BYTES.values()):
+        return {"status_code": 413, "message": "File is too large!"}
+
+    try:
+        received = await _receive_file_part(request, boundary)
+    except UploadRejected as e:
+        return {"status_code": e.status_code, "message": e.message}
+    except (ClientDisconnect, MultipartParseError) as e:
+        logger.warning(f"Chat file upload from user {user_id} failed: {e!r}")
+        return {"status_code": 400, "message": "The upload was interrupted!"}
+
+    try:
+        digest = await received.commit(session)
+    except BaseException:
+        await received.discard()
+        raise
+    thumbnails.schedule(digest, received.extension, received.size)
+
+    logger.info(f"File uploaded by user {user_id}: {digest} ({received.size} bytes)")
+    return chat_file_info(digest, received.extension, received.filename, received.size)
+
+
+def is_uploaded_media(url: str) -> bool:
+    return parse_media_url(url) is not None
@@ -10,6 +10,9 @@ from pydantic_settings import (
 from tempfile import (
     gettempdir,
 )
+from typing import (
+    Optional,
+)
 from urllib.parse import quote_plus
 
 TEMP_DIR = Path(gettempdir())
@@ -36,6 +39,12 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = ""
     DB_NAME: str = "ChatDB"
     DB_DRIVER: str = "ODBC Driver 17 for SQL Server"
+    DB_READ_HOST: str = ""
+    DB_READ_PORT: str = ""
+    DB_READ_USERNAME: str = ""
+    DB_READ_PASSWORD: str = ""
+    DB_READ_NAME: str = ""
+    DB_READ_YOUR_WRITES_SECONDS: int = 5
     
 
     SINGLESTORE_HOST: str = ""
@@ -49,6 +58,46 @@ class Settings(BaseSettings):
     DEBUG: str = "info"
     CORS_ORIGINS: str = ""
     PROMETHEUS_DIR: Path = TEMP_DIR / "prom"
+    SEARCH_REFRESH_SECONDS: int = 30
+    SEARCH_REFRESH_LAG_SECONDS: int = 30
+    SEARCH_REBUILD_SECONDS: int = 3600
+    PASSWORD_HASH_WORKERS: int = 2
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_REDIS_TTL_SECONDS: int = 300
+    PUBLIC_KEY_CACHE_TTL_SECONDS: int = 3600
+    PUBLIC_KEY_CHANGES_LIMIT: int = 1000
+    PUBLIC_KEY_CHANGES_LAG_SECONDS: int = 30
+    WS_RESUME_TICKET_SECONDS: int = 60
+    MESSAGES_HOT_MONTHS: int = 6
+    MESSAGES_ARCHIVE_INTERVAL_SECONDS: int = 3600
+    MESSAGES_ARCHIVE_BATCH_SIZE: int = 2000
+    MESSAGES_PURGE_BATCH_SIZE: int = 500
+    MESSAGES_PURGE_PAUSE_SECONDS: float = 0.05
+    MESSAGES_PURGE_INTERVAL_SECONDS: int = 30
+    THUMBNAIL_WORKERS: int = 2
+    AVATAR_WORKERS: int = 1
+    AVATAR_CACHE_BYTES: int = 32 * 1024 * 1024
+    AVATAR_CACHE_TTL_SECONDS: int = 300
+    ARCHIVE_DIR: Path = Path("./archive")
+    UPLOAD_DIR: Path = Path("./uploads")
+    UPLOAD_CHUNK_BYTES: int = 5 * 1024 * 1024
+    UPLOAD_SESSION_TTL_SECONDS: int = 86400
+    UPLOAD_SWEEP_INTERVAL_SECONDS: int = 600
+    MEDIA_GC_INTERVAL_SECONDS: int = 3600
+    MEDIA_GC_BATCH_SIZE: int = 500
+    MEDIA_GC_PAUSE_SECONDS: float = 1.0
+    MEDIA_GC_GRACE_SECONDS: int = 86400
+    STORAGE_BACKEND: str = "local"
+    STORAGE_IO_WORKERS: int = 4
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""
+    S3_ENDPOINT_URL: str = ""
+    S3_REGION: str = ""
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
 
     @property
     def db_url(self) -> str:
@@ -70,31 +119,67 @@ class Settings(BaseSettings):
                 + (self.SINGLESTORE_DATABASE if self.DEBUG != "test" else "test")
             )
 
+        return self._server_url(
+            self.DB_HOST,
+            self.DB_PORT,
+            self.DB_USERNAME,
+            self.DB_PASSWORD,
+            db_name,
+        )
+
+    @property
+    def db_read_url(self) -> Optional[str]:
+
+        if not self.DB_READ_HOST:
+            return None
+
+        db_name = "test" if self.DEBUG == "test" else (
+            self.DB_READ_NAME or self.DB_NAME
+        )
+        return self._server_url(
+            self.DB_READ_HOST,
+            self.DB_READ_PORT or self.DB_PORT,
+            self.DB_READ_USERNAME or self.DB_USERNAME,
+            self.DB_READ_PASSWORD or self.DB_PASSWORD,
+            db_name,
+            read_only=True,
+        )
+
+    def _server_url(
+        self,
+        host: str,
+        port: str,
+        username: str,
+        password: str,
+        db_name: str,
+        read_only: bool = False,
+    ) -> str:
+
         if self.DB_TYPE == "sqlserver":
 
             driver = quote_plus(self.DB_DRIVER)
-            
+            intent = "&ApplicationIntent=ReadOnly" if read_only else ""
 
-            if self.DB_USERNAME and self.DB_PASSWORD:
+            if username and password:
 
                 connection_string = (
-                    f"mssql+aioodbc://{self.DB_USERNAME}:{quote_plus(self.DB_PASSWORD)}"
-                    f"@{self.DB_HOST}/{db_name}"
-                    f"?driver={driver}&TrustServerCertificate=yes"
+                    f"mssql+aioodbc://{username}:{quote_plus(password)}"
+                    f"@{host}/{db_name}"
+                    f"?driver={driver}&TrustServerCertificate=yes{intent}"
                 )
             else:
 
                 connection_string = (
-                    f"mssql+aioodbc://@{self.DB_HOST}/{db_name}"
-                    f"?driver={driver}&TrustServerCertificate=yes&Trusted_Connection=yes"
+                    f"mssql+aioodbc://@{host}/{db_name}"
+                    f"?driver={driver}&TrustServerCertificate=yes&Trusted_Connection=yes{intent}"
                 )
             
             return connection_string
         else:
 
             return (
-                f"mysql+aiomysql://{self.DB_USERNAME}:{self.DB_PASSWORD}"
-                f"@{self.DB_HOST}:{self.DB_PORT}/{db_name}"
+                f"mysql+aiomysql://{username}:{password}"
+                f"@{host}:{port}/{db_name}"
             )
 
     @property
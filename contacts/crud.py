@@ -3,9 +3,6 @@ import logging
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
-from sqlalchemy.sql import (
-    text,
-)
 from typing import (
     Any,
 )
@@ -13,14 +10,27 @@ from typing import (
 from app.auth.crud import (
     find_existed_user,
 )
+from app.contacts import (
+    queries,
+)
+from app.search.crud import (
+    rank_rows,
+)
+from app.search.index import (
+    search_index,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.read_replica import (
+    primary_pins,
+)
 
 
 async def find_user_by_nickname(nickname: str, session: AsyncSession):
 
-    query = "SELECT * FROM chat.users WHERE nickname = :nickname"
     values = {"nickname": nickname}
-    result = await session.execute(text(query), values)
-    user = result.fetchone()
+    user = await db.fetch_one(queries.FIND_USER_BY_NICKNAME, values, session)
     if user:
         return user._asdict()
     return None
@@ -45,19 +55,8 @@ async def create_new_contact_by_nickname(
         }
 
 
-    query = """
-        SELECT
-          *
-        FROM
-          chat.contacts
-        WHERE
-          [user] = :user_id
-        AND
-          contact = :contact_id
-    """
     values = {"user_id": user_id, "contact_id": contact["id"]}
-    result = await session.execute(text(query), values)
-    found_contact = result.fetchone()
+    found_contact = await db.fetch_one(queries.FIND_CONTACT, values, session)
 
     if found_contact:
         return {
@@ -66,20 +65,6 @@ async def create_new_contact_by_nickname(
         }
 
 
-    query = """
-        INSERT INTO chat.contacts (
-          [user],
-          contact,
-          creation_date,
-          modified_date
-        )
-        VALUES (
-          :user_id,
-          :contact_id,
-          :creation_date,
-          :modified_date
-        )
-    """
     now = datetime.datetime.utcnow()
     values = {
         "user_id": user_id,
@@ -88,7 +73,8 @@ async def create_new_contact_by_nickname(
         "modified_date": now,
     }
 
-    await session.execute(text(query), values)
+    await db.execute(queries.CREATE_CONTACT, values, session)
+    await primary_pins.mark(user_id)
     results = {
         "status_code": 201,
         "message": f"{contact['nickname']} has been added to your contact list!",
@@ -112,19 +98,8 @@ async def create_new_contact(
             "message": "You can't add yourself!",
         }
 
-    query = """
-        SELECT
-          *
-        FROM
-          chat.contacts
-        WHERE
-          [user] = :user_id
-        AND
-          contact = :contact_id
-    """
     values = {"user_id": user_id, "contact_id": contact["id"]}
-    result = await session.execute(text(query), values)
-    found_contact = result.fetchone()
+    found_contact = await db.fetch_one(queries.FIND_CONTACT, values, session)
 
     if found_contact:
         return {
@@ -133,20 +108,6 @@ async def create_new_contact(
         }
 
 
-    query = """
-        INSERT INTO chat.contacts (
-          [user],
-          contact,
-          creation_date,
-          modified_date
-        )
-        VALUES (
-          :user_id,
-          :contact_id,
-          :creation_date,
-          :modified_date
-        )
-    """
     now = datetime.datetime.utcnow()
     values = {
         "user_id": user_id,
@@ -155,7 +116,8 @@ async def create_new_contact(
         "modified_date": now,
     }
 
-    await session.execute(text(query), values)
+    await db.execute(queries.CREATE_CONTACT, values, session)
+    await primary_pins.mark(user_id)
     results = {
         "status_code": 201,
         "message": f"{contact['nickname']} has been added to your contact list!",
@@ -179,19 +141,8 @@ async def delete_contact_user(
             "message": "You can't delete yourself!",
         }
 
-    query = """
-        SELECT
-          *
-        FROM
-          chat.contacts
-        WHERE
-          [user] = :user_id
-        AND
-          contact = :contact_id
-    """
     values = {"user_id": user_id, "contact_id": contact["id"]}
-    result = await session.execute(text(query), values)
-    contacts = result.fetchall()
+    contacts = await db.fetch_all(queries.FIND_CONTACT, values, session)
 
     if not contacts:
         return {
@@ -199,17 +150,9 @@ async def delete_contact_user(
             "message": "There is no contact to delete!",
         }
     else:
-        query = """
-            DELETE
-            FROM
-              chat.contacts
-            WHERE
-              [user] = :user_id
-            AND
-              contact = :contact_id
-        """
         values = {"user_id": user_id, "contact_id": contact["id"]}
-        await session.execute(text(query), values)
+        await db.execute(queries.DELETE_CONTACT, values, session)
+        await primary_pins.mark(user_id)
 
         results = {
             "status_code": 200,
@@ -220,22 +163,7 @@ async def delete_contact_user(
 
 async def get_contacts(session: AsyncSession) -> dict[str, Any]:
 
-    query = """
-        SELECT
-          c.*,
-          u.*
-        FROM
-          chat.contacts c
-        LEFT JOIN
-          chat.users u
-        ON
-          c.[user] = u.id
-        GROUP BY
-          c.id, c.[user], c.contact, c.creation_date, c.modified_date,
-          u.id, u.nickname, u.email, u.password, u.phone_number, u.user_role, u.creation_date, u.modified_date
-    """
-    result = await session.execute(text(query))
-    contacts = result.fetchall()
+    contacts = await db.fetch_all(queries.GET_CONTACTS, None, session)
     results = {
         "status_code": 200,
         "result": [dict(row._mapping) for row in contacts],
@@ -245,38 +173,17 @@ async def get_contacts(session: AsyncSession) -> dict[str, Any]:
 
 async def find_existed_user_contact(user_id: int, session: AsyncSession):
 
-    query = "SELECT * FROM chat.contacts WHERE [user] = :user_id"
     values = {"user_id": user_id}
-    result = await session.execute(text(query), values)
-    return result.fetchone()
+    return await db.fetch_one(queries.FIND_USER_CONTACT, values, session)
 
 
 async def get_user_contacts(user_id: int, session: AsyncSession) -> dict[str, Any]:
 
     user = await find_existed_user_contact(user_id, session)
     if user:
-        query = """
-            SELECT
-              c.id AS contact_record_id,
-              c.creation_date AS contact_added_date,
-              u.id,
-              u.nickname,
-              u.email,
-              u.phone_number,
-              u.user_role
-            FROM
-              chat.contacts c
-            LEFT JOIN
-              chat.users u
-            ON
-              c.contact = u.id
-            WHERE
-              c.[user] = :user_id
-        """
         values = {"user_id": user_id}
 
-        result = await session.execute(text(query), values)
-        contacts = result.fetchall()
+        contacts = await db.fetch_all(queries.GET_USER_CONTACTS, values, session)
         results = {
             "status_code": 200,
             "result": [dict(row._mapping) for row in contacts],
@@ -289,109 +196,22 @@ async def search_user_contacts(
     search: str, user_id: int, session: AsyncSession
 ) -> dict[str, Any]:
 
-    user = await find_existed_user_contact(user_id, session)
-    
-    if not search or len(search) == 0:
-        query = """
-            SELECT
-              c.id AS contact_record_id,
-              c.creation_date AS contact_added_date,
-              u.id,
-              u.nickname,
-              u.email,
-              u.phone_number,
-              u.user_role
-            FROM
-              chat.contacts c
-            LEFT JOIN
-              chat.users u
-            ON
-              c.contact = u.id
-            WHERE
-              c.[user] = :user_id
-        """
-        values = {"user_id": user_id}
-        result = await session.execute(text(query), values)
-        return_results = result.fetchall()
-        results = {
-            "status_code": 200,
-            "result": [dict(row._mapping) for row in return_results],
-        }
-        return results
-
-    elif user and search:
-
-        query = """
-            SELECT
-              c.id AS contact_record_id,
-              c.creation_date AS contact_added_date,
-              u.id,
-              u.nickname,
-              u.email,
-              u.phone_number,
-              u.user_role
-            FROM
-              chat.contacts c
-            LEFT JOIN
-              chat.users u
-            ON
-              c.contact = u.id
-            WHERE
-              c.[user] = :user_id
-            AND
-              (
-                u.nickname LIKE :search
-                OR u.email LIKE :search
-              )
-        """
-        values = {"user_id": user_id, "search": f"%{search}%"}
-        result = await session.execute(text(query), values)
-        return_results = result.fetchall()
-        results = {
-            "status_code": 200,
-            "result": [dict(row._mapping) for row in return_results],
-        }
-        return results
-    
-    return {"status_code": 200, "result": []}
+    values = {"user_id": user_id}
+    contacts = await db.fetch_all(queries.GET_USER_CONTACTS, values, session)
+    if search:
+        contacts = await rank_rows(
+            search_index.users, search, contacts, "id", session
+        )
+    return {
+        "status_code": 200,
+        "result": [dict(row._mapping) for row in contacts],
+    }
 
 
 async def get_message_requests(user_id: int, session: AsyncSession) -> dict[str, Any]:
 
-    query = """
-        SELECT DISTINCT
-            u.id,
-            u.nickname,
-            u.email,
-            u.phone_number,
-            u.user_role,
-            (
-                SELECT COUNT(*) 
-                FROM chat.messages m2 
-                WHERE m2.sender = u.id AND m2.receiver = :user_id
-            ) AS unread_count,
-            (
-                SELECT TOP 1 m3.creation_date 
-                FROM chat.messages m3 
-                WHERE m3.sender = u.id AND m3.receiver = :user_id
-                ORDER BY m3.creation_date DESC
-            ) AS last_message_date
-        FROM
-            chat.messages m
-        INNER JOIN
-            chat.users u ON m.sender = u.id
-        WHERE
-            m.receiver = :user_id
-            AND m.sender != :user_id
-            AND m.sender NOT IN (
-                SELECT contact FROM chat.contacts WHERE [user] = :user_id
-            )
-        ORDER BY
-            last_message_date DESC
-    """
     values = {"user_id": user_id}
-    result = await session.execute(text(query), values)
-    requests = result.fetchall()
+    requests = await db.fetch_all(queries.GET_MESSAGE_REQUESTS, values, session)
     
     return {
         "status_code": 200,
@@ -0,0 +1,154 @@
+from app.utils.query_registry import (
+    DATETIME,
+    ID,
+    STRING,
+    register,
+)
+
+
+FIND_USER_BY_NICKNAME = register(
+    "contacts.find_user_by_nickname",
+    "SELECT * FROM chat.users WHERE nickname = :nickname",
+    nickname=STRING,
+)
+
+FIND_CONTACT = register(
+    "contacts.find_contact",
+    """
+        SELECT
+          *
+        FROM
+          chat.contacts
+        WHERE
+          [user] = :user_id
+        AND
+          contact = :contact_id
+    """,
+    user_id=ID,
+    contact_id=ID,
+)
+
+CREATE_CONTACT = register(
+    "contacts.create_contact",
+    """
+        INSERT INTO chat.contacts (
+          [user],
+          contact,
+          creation_date,
+          modified_date
+        )
+        VALUES (
+          :user_id,
+          :contact_id,
+          :creation_date,
+          :modified_date
+        )
+    """,
+    user_id=ID,
+    contact_id=ID,
+    creation_date=DATETIME,
+    modified_date=DATETIME,
+)
+
+DELETE_CONTACT = register(
+    "contacts.delete_contact",
+    """
+        DELETE
+        FROM
+          chat.contacts
+        WHERE
+          [user] = :user_id
+        AND
+          contact = :contact_id
+    """,
+    user_id=ID,
+    contact_id=ID,
+)
+
+GET_CONTACTS = register(
+    "contacts.get_contacts",
+    """
+        SELECT
+          c.*,
+          u.*
+        FROM
+          chat.contacts c
+        LEFT JOIN
+          chat.users u
+        ON
+          c.[user] = u.id
+        GROUP BY
+          c.id, c.[user], c.contact, c.creation_date, c.modified_date,
+          u.id, u.nickname, u.email, u.password, u.phone_number, u.user_role, u.creation_date, u.modified_date
+    """,
+)
+
+FIND_USER_CONTACT = register(
+    "contacts.find_user_contact",
+    "SELECT * FROM chat.contacts WHERE [user] = :user_id",
+    user_id=ID,
+)
+
+GET_USER_CONTACTS = register(
+    "contacts.get_user_contacts",
+    """
+        SELECT
+          c.id AS contact_record_id,
+          c.creation_date AS contact_added_date,
+          u.id,
+          u.nickname,
+          u.email,
+          u.phone_number,
+          u.user_role
+        FROM
+          chat.contacts c
+        LEFT JOIN
+          chat.users u
+        ON
+          c.contact = u.id
+        WHERE
+          c.[user] = :user_id
+    """,
+    user_id=ID,
+)
+
+GET_MESSAGE_REQUESTS = register(
+    "contacts.get_message_requests",
+    """
+        SELECT DISTINCT
+            u.id,
+            u.nickname,
+            u.email,
+            u.phone_number,
+            u.user_role,
+            (
+                SELECT COUNT(*)
+                FROM chat.messages m2
+                WHERE m2.sender = u.id AND m2.receiver = :user_id
+                AND m2.id > ISNULL((
+                    SELECT rm.last_read_message
+                    FROM chat.read_markers rm
+                    WHERE rm.[user] = :user_id AND rm.peer = u.id AND rm.room IS NULL
+                ), 0)
+            ) AS unread_count,
+            (
+                SELECT TOP 1 m3.creation_date 
+                FROM chat.messages m3 
+                WHERE m3.sender = u.id AND m3.receiver = :user_id
+                ORDER BY m3.creation_date DESC
+            ) AS last_message_date
+        FROM
+            chat.messages m
+        INNER JOIN
+            chat.users u ON m.sender = u.id
+        WHERE
+            m.receiver = :user_id
+            AND m.sender != :user_id
+            AND m.sender NOT IN (
+                SELECT contact FROM chat.contacts WHERE [user] = :user_id
+            )
+        ORDER BY
+            last_message_date DESC
+    """,
+    user_id=ID,
+)
@@ -1,6 +1,7 @@
 from fastapi import (
     APIRouter,
     Depends,
+    Query,
 )
 from pydantic import (
     BaseModel,
@@ -10,6 +11,7 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
 from typing import (
+    Optional,
     Union,
 )
 
@@ -28,11 +30,18 @@ from app.users.schemas import (
     UserObjectSchema,
 )
 from app.utils.dependencies import (
-    get_db_autocommit_session,
+    get_db_session,
 )
 from app.utils.jwt_util import (
     get_current_active_user,
 )
+from app.utils.read_replica import (
+    get_db_read_session,
+)
+from app.utils.responses import (
+    ROW_FORMATS,
+    rows_response,
+)
 
 router = APIRouter(prefix="/api/v1")
 
@@ -68,7 +77,7 @@ class ContactDelete(BaseModel):
 async def add_contact(
     request: ContactCreate,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     if request.nickname:
@@ -102,15 +111,16 @@ async def add_contact(
     },
 )
 async def get_contacts(
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await get_user_contacts(
         user_id=currentUser.id,
         session=session,
     )
-    return results
+    return rows_response(results, format)
 
 
 @router.get(
@@ -125,8 +135,9 @@ async def get_contacts(
 )
 async def search_contacts(
     search: str = "",
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await search_user_contacts(
@@ -134,7 +145,7 @@ async def search_contacts(
         user_id=currentUser.id,
         session=session,
     )
-    return results
+    return rows_response(results, format)
 
 
 @router.delete(
@@ -156,7 +167,7 @@ async def search_contacts(
 async def delete_contact(
     request: ContactDelete,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await delete_contact_user(
@@ -178,12 +189,13 @@ async def delete_contact(
     },
 )
 async def get_message_requests_endpoint(
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_read_session),
 ):
 
     results = await get_message_requests(
         user_id=currentUser.id,
         session=session,
     )
-    return results
+    return rows_response(results, format)
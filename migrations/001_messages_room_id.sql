@@ -0,0 +1,130 @@
+-- Unify chat.messages.room on the integer room id.
+--
+-- Databases created through the ORM stored the room *name* in a VARCHAR(50)
+-- `room` column. This script adds an integer column, backfills it from
+-- chat.rooms in small batches, swaps it in place of the old column and puts
+-- the foreign key and IX_messages_room back on it. It is a no-op on databases
+-- created from queries.sql, where `room` is already BIGINT. If any room
+-- message cannot be matched to exactly one room the script stops before
+-- dropping the old column; fix those rows and run it again.
+
+USE ChatDB;
+GO
+
+IF EXISTS (
+    SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = 'chat' AND TABLE_NAME = 'messages'
+    AND COLUMN_NAME = 'room' AND DATA_TYPE IN ('varchar', 'nvarchar')
+)
+AND COL_LENGTH('chat.messages', 'room_id') IS NULL
+BEGIN
+    ALTER TABLE chat.messages ADD room_id BIGINT NULL;
+END
+GO
+
+IF COL_LENGTH('chat.messages', 'room_id') IS NOT NULL
+BEGIN
+    EXEC('
+        DECLARE @batch INT = 5000;
+        DECLARE @rows INT = 1;
+
+        -- Names first, and only names that belong to exactly one room.
+        WHILE @rows > 0
+        BEGIN
+            UPDATE TOP (@batch) m
+            SET m.room_id = r.id
+            FROM chat.messages m
+            INNER JOIN chat.rooms r ON r.room_name = m.room
+            WHERE m.room IS NOT NULL AND m.room_id IS NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM chat.rooms other
+                WHERE other.room_name = r.room_name AND other.id <> r.id
+            );
+
+            SET @rows = @@ROWCOUNT;
+        END
+
+        -- Then rows that already stored an id, unless it is also a room name.
+        SET @rows = 1;
+        WHILE @rows > 0
+        BEGIN
+            UPDATE TOP (@batch) m
+            SET m.room_id = r.id
+            FROM chat.messages m
+            INNER JOIN chat.rooms r ON CAST(r.id AS VARCHAR(50)) = m.room
+            WHERE m.room IS NOT NULL AND m.room_id IS NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM chat.rooms named WHERE named.room_name = m.room
+            );
+
+            SET @rows = @@ROWCOUNT;
+        END
+    ');
+END
+GO
+
+-- Room messages that match no room, or a name shared by several rooms,
+-- would become direct messages once the old column is dropped. Stop here
+-- and keep it until they are fixed by hand.
+IF COL_LENGTH('chat.messages', 'room_id') IS NOT NULL
+AND EXISTS (SELECT 1 FROM chat.messages WHERE room IS NOT NULL AND room_id IS NULL)
+BEGIN
+    DECLARE @unresolved INT = (
+        SELECT COUNT(*) FROM chat.messages WHERE room IS NOT NULL AND room_id IS NULL
+    );
+    RAISERROR(
+        '%d room messages could not be matched to a room; resolve chat.messages.room_id for them and run this script again.',
+        16, 1, @unresolved
+    );
+    SET NOEXEC ON;
+END
+GO
+
+IF COL_LENGTH('chat.messages', 'room_id') IS NOT NULL
+BEGIN
+    DECLARE @index SYSNAME;
+    DECLARE @sql NVARCHAR(400);
+
+    DECLARE room_indexes CURSOR LOCAL FAST_FORWARD FOR
+        SELECT DISTINCT i.name
+        FROM sys.indexes i
+        INNER JOIN sys.index_columns ic
+            ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+        INNER JOIN sys.columns c
+            ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE i.object_id = OBJECT_ID('chat.messages') AND c.name = 'room';
+
+    OPEN room_indexes;
+    FETCH NEXT FROM room_indexes INTO @index;
+    WHILE @@FETCH_STATUS = 0
+    BEGIN
+        SET @sql = N'DROP INDEX ' + QUOTENAME(@index) + N' ON chat.messages';
+        EXEC sp_executesql @sql;
+        FETCH NEXT FROM room_indexes INTO @index;
+    END
+    CLOSE room_indexes;
+    DEALLOCATE room_indexes;
+
+    ALTER TABLE chat.messages DROP COLUMN room;
+    EXEC sp_rename 'chat.messages.room_id', 'room', 'COLUMN';
+END
+GO
+
+IF OBJECT_ID('chat.FK_messages_room', 'F') IS NULL
+BEGIN
+    ALTER TABLE chat.messages
+        ADD CONSTRAINT FK_messages_room FOREIGN KEY (room) REFERENCES chat.rooms(id);
+END
+GO
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE object_id = OBJECT_ID('chat.messages') AND name = 'IX_messages_room'
+)
+BEGIN
+    CREATE INDEX IX_messages_room ON chat.messages(room);
+END
+GO
+
+SET NOEXEC OFF;
+GO
@@ -0,0 +1,40 @@
+-- Cold tier for chat.messages.
+--
+-- Rows older than MESSAGES_HOT_MONTHS are moved here a calendar month at a
+-- time by app.chats.archive. The clustered key leads with creation_date so
+-- each month is one contiguous range that can be exported and purged
+-- cheaply. There are no foreign keys because the archive is filled through
+-- DELETE ... OUTPUT INTO.
+
+USE ChatDB;
+GO
+
+IF OBJECT_ID('chat.messages_archive', 'U') IS NULL
+BEGIN
+    CREATE TABLE chat.messages_archive (
+        id              BIGINT          NOT NULL,
+        sender          BIGINT          NOT NULL,
+        receiver        BIGINT          NOT NULL,
+        [content]       VARCHAR(1024)   NOT NULL,
+        message_type    VARCHAR(10)     NOT NULL DEFAULT 'text',
+        status          INT             NOT NULL DEFAULT 0,
+        room            BIGINT          NULL,
+        media           VARCHAR(120)    NULL,
+        creation_date   DATETIME        NOT NULL,
+        modified_date   DATETIME        NOT NULL,
+        CONSTRAINT PK_messages_archive PRIMARY KEY CLUSTERED (creation_date, id)
+    );
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_messages_archive_id')
+    CREATE UNIQUE INDEX UX_messages_archive_id ON chat.messages_archive(id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_messages_archive_sender')
+    CREATE INDEX IX_messages_archive_sender ON chat.messages_archive(sender, receiver, id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_messages_archive_receiver')
+    CREATE INDEX IX_messages_archive_receiver ON chat.messages_archive(receiver);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_messages_archive_room')
+    CREATE INDEX IX_messages_archive_room ON chat.messages_archive(room, id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_messages_creation_date')
+    CREATE INDEX IX_messages_creation_date ON chat.messages(creation_date);
+GO
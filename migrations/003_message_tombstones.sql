@@ -0,0 +1,33 @@
+-- Soft deletes for chat history.
+--
+-- Deleting a conversation or a user's room messages records a tombstone
+-- covering every message up to the newest id at that moment. History
+-- queries hide tombstoned rows straight away and app.chats.purge removes
+-- them from chat.messages and chat.messages_archive in small batches.
+
+USE ChatDB;
+GO
+
+IF OBJECT_ID('chat.message_tombstones', 'U') IS NULL
+BEGIN
+    CREATE TABLE chat.message_tombstones (
+        id                  BIGINT          PRIMARY KEY IDENTITY(1,1),
+        sender              BIGINT          NOT NULL,
+        receiver            BIGINT          NULL,
+        room                BIGINT          NULL,
+        up_to_message       BIGINT          NOT NULL,
+        purged_count        BIGINT          NOT NULL DEFAULT 0,
+        purged_date         DATETIME        NULL,
+        creation_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+        modified_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT FK_message_tombstones_sender FOREIGN KEY (sender) REFERENCES chat.users(id),
+        CONSTRAINT FK_message_tombstones_receiver FOREIGN KEY (receiver) REFERENCES chat.users(id),
+        CONSTRAINT FK_message_tombstones_room FOREIGN KEY (room) REFERENCES chat.rooms(id)
+    );
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_message_tombstones_pending')
+    CREATE INDEX IX_message_tombstones_pending ON chat.message_tombstones(sender, receiver, room)
+        INCLUDE (up_to_message) WHERE purged_date IS NULL;
+GO
@@ -0,0 +1,13 @@
+-- Per-user token epoch.
+--
+-- Access and refresh tokens carry the epoch the user had when they were
+-- issued. Resetting the password, deactivating the account or logging
+-- out of all devices bumps it, which invalidates every outstanding token
+-- without tracking them in chat.access_tokens.
+
+USE ChatDB;
+GO
+
+IF COL_LENGTH('chat.users', 'token_epoch') IS NULL
+    ALTER TABLE chat.users ADD token_epoch INT NOT NULL DEFAULT 0;
+GO
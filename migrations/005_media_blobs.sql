@@ -0,0 +1,23 @@
+-- Content-addressed attachment storage.
+--
+-- Attachments are stored once per distinct content under
+-- uploads/media/<aa>/<bb>/<sha256>, and chat.media_blobs counts the
+-- messages that reference each one. Run `python -m app.chats.media` after
+-- this script to move existing per-user files into the store and point
+-- their messages at /api/v1/chat/media/ URLs.
+
+USE ChatDB;
+GO
+
+IF OBJECT_ID('chat.media_blobs', 'U') IS NULL
+BEGIN
+    CREATE TABLE chat.media_blobs (
+        id                  BIGINT          PRIMARY KEY IDENTITY(1,1),
+        sha256              CHAR(64)        NOT NULL UNIQUE,
+        size                BIGINT          NOT NULL,
+        ref_count           INT             NOT NULL DEFAULT 0,
+        creation_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+        modified_date       DATETIME        NOT NULL DEFAULT GETDATE()
+    );
+END
+GO
@@ -0,0 +1,16 @@
+-- Indexes for the orphaned media collector.
+--
+-- The collector asks whether any message still links to a stored file with
+-- `media LIKE '<url>%'`; these filtered indexes turn that into a seek on the
+-- few rows that carry an attachment.
+
+USE ChatDB;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_messages_media')
+    CREATE INDEX IX_messages_media ON chat.messages(media) WHERE media IS NOT NULL;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_messages_archive_media')
+    CREATE INDEX IX_messages_archive_media ON chat.messages_archive(media) WHERE media IS NOT NULL;
+GO
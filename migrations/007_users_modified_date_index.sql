@@ -0,0 +1,12 @@
+-- Index for the public key changes feed.
+--
+-- GET /users/public-keys/changes pages through chat.users in
+-- (modified_date, id) order from a client's watermark; the search index
+-- refresh reads the same range.
+
+USE ChatDB;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_users_modified_date')
+    CREATE INDEX IX_users_modified_date ON chat.users(modified_date, id);
+GO
@@ -0,0 +1,29 @@
+-- Per-conversation read state.
+--
+-- chat.read_markers keeps the highest message id each user has read per
+-- direct conversation (peer) or room, replacing the per-message read flag.
+-- Unread counts are the messages above the marker.
+
+USE ChatDB;
+GO
+
+IF OBJECT_ID('chat.read_markers', 'U') IS NULL
+BEGIN
+    CREATE TABLE chat.read_markers (
+        id                  BIGINT          PRIMARY KEY IDENTITY(1,1),
+        [user]              BIGINT          NOT NULL,
+        peer                BIGINT          NULL,
+        room                BIGINT          NULL,
+        last_read_message   BIGINT          NOT NULL DEFAULT 0,
+        creation_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+        modified_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT FK_read_markers_user FOREIGN KEY ([user]) REFERENCES chat.users(id),
+        CONSTRAINT FK_read_markers_peer FOREIGN KEY (peer) REFERENCES chat.users(id),
+        CONSTRAINT FK_read_markers_room FOREIGN KEY (room) REFERENCES chat.rooms(id)
+    );
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_read_markers_conversation')
+    CREATE UNIQUE INDEX UX_read_markers_conversation ON chat.read_markers([user], peer, room);
+GO
@@ -0,0 +1,13 @@
+-- Clear chat.access_tokens.
+--
+-- Tokens are stateless: logins stopped writing to this table and request
+-- authentication stopped reading it when the token epoch landed (004).
+-- The rows left over from the old scheme are all expired by now, so the
+-- table is emptied once here instead of by a background job.
+
+USE ChatDB;
+GO
+
+IF OBJECT_ID('chat.access_tokens', 'U') IS NOT NULL
+    TRUNCATE TABLE chat.access_tokens;
+GO
@@ -0,0 +1,38 @@
+-- Reference counts for content-addressed attachments.
+--
+-- chat.media_blobs.ref_count is the number of messages, hot or archived,
+-- that link to each blob. Sends add to it and purges take from it. Tables
+-- created by an earlier 005 get the column here, and every count is
+-- recomputed from the messages, so the script is safe to rerun.
+
+USE ChatDB;
+GO
+
+IF COL_LENGTH('chat.media_blobs', 'ref_count') IS NULL
+    ALTER TABLE chat.media_blobs
+        ADD ref_count INT NOT NULL
+        CONSTRAINT DF_media_blobs_ref_count DEFAULT 0;
+GO
+
+UPDATE b
+SET
+    ref_count = ISNULL(r.refs, 0)
+FROM
+    chat.media_blobs b
+LEFT JOIN (
+    SELECT
+        SUBSTRING(m.media, LEN('/api/v1/chat/media/') + 1, 64) AS sha256,
+        COUNT(*) AS refs
+    FROM (
+        SELECT media FROM chat.messages
+        UNION ALL
+        SELECT media FROM chat.messages_archive
+    ) m
+    WHERE
+        m.media LIKE '/api/v1/chat/media/%'
+    GROUP BY
+        SUBSTRING(m.media, LEN('/api/v1/chat/media/') + 1, 64)
+) r
+ON
+    r.sha256 = b.sha256;
+GO
@@ -15,18 +15,8 @@ CREATE TABLE chat.users (
     user_role       VARCHAR(20)     NOT NULL DEFAULT 'user',
     creation_date   DATETIME        NOT NULL DEFAULT GETDATE(),
     modified_date   DATETIME        NOT NULL DEFAULT GETDATE(),
-    public_key      VARCHAR(500)    NULL
-);
-GO
-
-CREATE TABLE chat.access_tokens (
-    id              BIGINT          PRIMARY KEY IDENTITY(1,1),
-    [user]          BIGINT          NOT NULL,
-    token           VARCHAR(500)    NOT NULL,
-    token_status    INT             NOT NULL DEFAULT 1,
-    creation_date   DATETIME        NOT NULL DEFAULT GETDATE(),
-    modified_date   DATETIME        NOT NULL DEFAULT GETDATE(),
-    CONSTRAINT FK_access_tokens_user FOREIGN KEY ([user]) REFERENCES chat.users(id)
+    public_key      VARCHAR(500)    NULL,
+    token_epoch     INT             NOT NULL DEFAULT 0
 );
 GO
 
@@ -80,8 +70,62 @@ CREATE TABLE chat.messages (
 );
 GO
 
-CREATE INDEX IX_access_tokens_user ON chat.access_tokens([user]);
-CREATE INDEX IX_access_tokens_token ON chat.access_tokens(token);
+CREATE TABLE chat.messages_archive (
+    id              BIGINT          NOT NULL,
+    sender          BIGINT          NOT NULL,
+    receiver        BIGINT          NOT NULL,
+    [content]       VARCHAR(1024)   NOT NULL,
+    message_type    VARCHAR(10)     NOT NULL DEFAULT 'text',
+    status          INT             NOT NULL DEFAULT 0,
+    room            BIGINT          NULL,
+    media           VARCHAR(120)    NULL,
+    creation_date   DATETIME        NOT NULL,
+    modified_date   DATETIME        NOT NULL,
+    CONSTRAINT PK_messages_archive PRIMARY KEY CLUSTERED (creation_date, id)
+);
+GO
+
+CREATE TABLE chat.read_markers (
+    id                  BIGINT          PRIMARY KEY IDENTITY(1,1),
+    [user]              BIGINT          NOT NULL,
+    peer                BIGINT          NULL,
+    room                BIGINT          NULL,
+    last_read_message   BIGINT          NOT NULL DEFAULT 0,
+    creation_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+    modified_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT FK_read_markers_user FOREIGN KEY ([user]) REFERENCES chat.users(id),
+    CONSTRAINT FK_read_markers_peer FOREIGN KEY (peer) REFERENCES chat.users(id),
+    CONSTRAINT FK_read_markers_room FOREIGN KEY (room) REFERENCES chat.rooms(id)
+);
+GO
+
+CREATE TABLE chat.message_tombstones (
+    id                  BIGINT          PRIMARY KEY IDENTITY(1,1),
+    sender              BIGINT          NOT NULL,
+    receiver            BIGINT          NULL,
+    room                BIGINT          NULL,
+    up_to_message       BIGINT          NOT NULL,
+    purged_count        BIGINT          NOT NULL DEFAULT 0,
+    purged_date         DATETIME        NULL,
+    creation_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+    modified_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT FK_message_tombstones_sender FOREIGN KEY (sender) REFERENCES chat.users(id),
+    CONSTRAINT FK_message_tombstones_receiver FOREIGN KEY (receiver) REFERENCES chat.users(id),
+    CONSTRAINT FK_message_tombstones_room FOREIGN KEY (room) REFERENCES chat.rooms(id)
+);
+GO
+
+CREATE TABLE chat.media_blobs (
+    id                  BIGINT          PRIMARY KEY IDENTITY(1,1),
+    sha256              CHAR(64)        NOT NULL UNIQUE,
+    size                BIGINT          NOT NULL,
+    ref_count           INT             NOT NULL DEFAULT 0,
+    creation_date       DATETIME        NOT NULL DEFAULT GETDATE(),
+    modified_date       DATETIME        NOT NULL DEFAULT GETDATE()
+);
+GO
+
+CREATE INDEX IX_users_modified_date ON chat.users(modified_date, id);
 CREATE INDEX IX_contacts_user ON chat.contacts([user]);
 CREATE INDEX IX_contacts_contact ON chat.contacts(contact);
 CREATE INDEX IX_room_members_room ON chat.room_members(room);
@@ -89,4 +133,14 @@ CREATE INDEX IX_room_members_member ON chat.room_members(member);
 CREATE INDEX IX_messages_sender ON chat.messages(sender);
 CREATE INDEX IX_messages_receiver ON chat.messages(receiver);
 CREATE INDEX IX_messages_room ON chat.messages(room);
+CREATE INDEX IX_messages_creation_date ON chat.messages(creation_date);
+CREATE UNIQUE INDEX UX_messages_archive_id ON chat.messages_archive(id);
+CREATE INDEX IX_messages_archive_sender ON chat.messages_archive(sender, receiver, id);
+CREATE INDEX IX_messages_archive_receiver ON chat.messages_archive(receiver);
+CREATE INDEX IX_messages_archive_room ON chat.messages_archive(room, id);
+CREATE UNIQUE INDEX UX_read_markers_conversation ON chat.read_markers([user], peer, room);
+CREATE INDEX IX_message_tombstones_pending ON chat.message_tombstones(sender, receiver, room)
+    INCLUDE (up_to_message) WHERE purged_date IS NULL;
+CREATE INDEX IX_messages_media ON chat.messages(media) WHERE media IS NOT NULL;
+CREATE INDEX IX_messages_archive_media ON chat.messages_archive(media) WHERE media IS NOT NULL;
 GO
\ No newline at end of file
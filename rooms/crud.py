@@ -1,16 +1,17 @@
 import datetime
 import logging
+from functools import (
+    partial,
+)
 from pydantic import (
     EmailStr,
 )
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
-from sqlalchemy.sql import (
-    text,
-)
 from typing import (
     Any,
+    Optional,
 )
 
 from app.auth.crud import (
@@ -22,29 +23,44 @@ from app.chats import (
 from app.chats.schemas import (
     MessageCreateRoom,
 )
+from app.rooms import (
+    queries,
+)
+from app.search.crud import (
+    rank_rows,
+)
+from app.search.index import (
+    search_index,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.dependencies import (
+    after_commit,
+)
+from app.utils.read_replica import (
+    primary_pins,
+)
+from app.utils.read_receipts import (
+    publish_read_receipt,
+    read_markers,
+)
 
 logger = logging.getLogger(__name__)
 
 
 async def find_existed_room(room_name: str, session: AsyncSession):
 
-    query = "SELECT * FROM chat.rooms WHERE room_name = :room_name"
     values = {"room_name": room_name}
-    result = await session.execute(text(query), values)
-    return result.fetchone()
+    return await db.fetch_one(queries.FIND_ROOM_BY_NAME, values, session)
 
 
 async def find_existed_user_in_room(
     user_id: int, room_id: int, session: AsyncSession
 ):
 
-    query = """
-        SELECT * FROM chat.room_members
-        WHERE room = :room_id AND member = :user_id
-    """
     values = {"room_id": room_id, "user_id": user_id}
-    result = await session.execute(text(query), values)
-    return result.fetchone()
+    return await db.fetch_one(queries.FIND_ROOM_MEMBER, values, session)
 
 
 async def find_admin_in_room(
@@ -56,10 +72,6 @@ async def find_admin_in_room(
 
 async def create_room(room_name: str, description: str, session: AsyncSession):
 
-    query = """
-        INSERT INTO chat.rooms (room_name, description, creation_date, modified_date)
-        VALUES (:room_name, :description, :creation_date, :modified_date)
-    """
     now = datetime.datetime.utcnow()
     values = {
         "room_name": room_name,
@@ -67,17 +79,13 @@ async def create_room(room_name: str, description: str, session: AsyncSession):
         "creation_date": now,
         "modified_date": now,
     }
-    return await session.execute(text(query), values)
+    return await db.execute(queries.CREATE_ROOM, values, session)
 
 
 async def join_room(
     user_id: int, room_id: int, session: AsyncSession, is_admin: bool = False
 ):
 
-    query = """
-        INSERT INTO chat.room_members (room, member, creation_date, modified_date)
-        VALUES (:room, :member, :creation_date, :modified_date)
-    """
     now = datetime.datetime.utcnow()
     values = {
         "room": room_id,
@@ -85,14 +93,26 @@ async def join_room(
         "creation_date": now,
         "modified_date": now,
     }
-    return await session.execute(text(query), values)
+    result = await db.execute(queries.JOIN_ROOM, values, session)
+    await touch_room(room_id, now, session)
+    await primary_pins.mark(user_id)
+    return result
+
+
+async def touch_room(
+    room_id: int, modified_date: datetime.datetime, session: AsyncSession
+) -> None:
+
+    values = {"room_id": room_id, "modified_date": modified_date}
+    await db.execute(queries.TOUCH_ROOM, values, session)
 
 
 async def delete_room_user(user_id: int, room_id: int, session: AsyncSession):
 
-    query = "DELETE FROM chat.room_members WHERE room = :room AND member = :member"
     values = {"room": room_id, "member": user_id}
-    return await session.execute(text(query), values)
+    result = await db.execute(queries.DELETE_ROOM_MEMBER, values, session)
+    await touch_room(room_id, datetime.datetime.utcnow(), session)
+    return result
 
 
 async def ban_room_user(user_id: int, room_id: int, session: AsyncSession):
@@ -127,6 +147,9 @@ async def create_assign_new_room(
             await create_room(room_obj.room_name, room_obj.description, session)
             logger.info(f"Creating room `{room_obj.room_name}`.")
             room = await find_existed_room(room_obj.room_name, session)
+            await after_commit(
+                session, partial(search_index.index_room, room.id, room.room_name)
+            )
             await join_room(user_id, room.id, session, True)
             return {"status_code": 200, "message": f"You have joined room {room_obj.room_name}!"}
         else:
@@ -143,6 +166,27 @@ async def create_assign_new_room(
 
 
 async def get_room_conversations(
+    room_name: str,
+    sender_id: int,
+    session: AsyncSession,
+    before: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> dict[str, Any]:
+    room = await find_existed_room(room_name, session)
+    if not room:
+        return {"status_code": 400, "message": "Room not found!"}
+
+    user = await find_existed_user_in_room(sender_id, room.id, session)
+    if not user:
+        return {"status_code": 400, "message": "You are not a member of this room!"}
+
+    values = {"room_id": room.id, "sender_id": sender_id}
+    return await chats_crud.get_history_page(
+        "room", values, before, limit, session
+    )
+
+
+async def export_room_conversations(
     room_name: str, sender_id: int, session: AsyncSession
 ) -> dict[str, Any]:
     room = await find_existed_room(room_name, session)
@@ -153,28 +197,31 @@ async def get_room_conversations(
     if not user:
         return {"status_code": 400, "message": "You are not a member of this room!"}
 
-    # Added message_type to support E2E decryption on frontend
-    query = """
-        SELECT
-            m.id AS msg_id,
-            m.content,
-            IIF(m.sender = :sender_id, 'sent', 'received') AS type,
-            m.message_type,
-            m.media,
-            m.creation_date,
-            u.id,
-            u.nickname,
-            u.email,
-            u.phone_number
-        FROM chat.messages m
-        LEFT JOIN chat.users u ON m.sender = u.id
-        WHERE m.room = :room_name
-        ORDER BY m.creation_date ASC
-    """
-    values = {"room_name": room.room_name, "sender_id": sender_id}
-    result = await session.execute(text(query), values)
-    messages = result.fetchall()
-    return {"status_code": 200, "result": [dict(row._mapping) for row in messages]}
+    values = {"room_id": room.id, "sender_id": sender_id}
+    return {
+        "status_code": 200,
+        "filename": f"room-{room.id}.ndjson",
+        "stream": chats_crud.stream_history("room", values),
+    }
+
+
+async def mark_room_read(
+    user_id: int, room_name: str, message_id: int, session: AsyncSession
+) -> dict[str, Any]:
+    room = await find_existed_room(room_name, session)
+    if not room:
+        return {"status_code": 400, "message": "Room not found!"}
+
+    user = await find_existed_user_in_room(user_id, room.id, session)
+    if not user:
+        return {"status_code": 400, "message": "You are not a member of this room!"}
+
+    message_id = await chats_crud.clamp_read_marker(
+        user_id, None, room.id, message_id, session
+    )
+    if message_id > 0 and read_markers.advance(user_id, None, room.id, message_id):
+        await publish_read_receipt(room.room_name, user_id, message_id)
+    return {"status_code": 200, "message": "Room has been marked as read!"}
 
 
 async def send_new_room_message(
@@ -183,7 +230,7 @@ async def send_new_room_message(
     bin_photo: bytes,
     session: AsyncSession,
 ) -> dict[str, Any]:
-    if not request.content and not bin_photo:
+    if not request.content and not bin_photo and not getattr(request, "media", None):
         return {"status_code": 400, "message": "You can't send an empty message!"}
 
     room = await find_existed_room(request.room, session)
@@ -236,38 +283,17 @@ async def delete_room_user_chat(
 
 
 async def search_rooms(search: str, user_id: int, session: AsyncSession) -> dict[str, Any]:
-    if not search:
-        query = """
-            SELECT rm.*, r.*
-            FROM chat.room_members rm
-            LEFT JOIN chat.rooms r ON rm.room = r.id
-            WHERE rm.member = :user_id
-        """
-        values = {"user_id": user_id}
-    else:
-        query = """
-            SELECT rm.*, r.*
-            FROM chat.room_members rm
-            LEFT JOIN chat.rooms r ON rm.room = r.id
-            WHERE rm.member = :user_id AND r.room_name LIKE :search
-        """
-        values = {"user_id": user_id, "search": f"%{search.lower()}%"}
-
-    result = await session.execute(text(query), values)
-    rooms = result.fetchall()
+    values = {"user_id": user_id}
+    rooms = await db.fetch_all(queries.GET_USER_ROOMS, values, session)
+    if search:
+        rooms = await rank_rows(search_index.rooms, search, rooms, "room", session)
+
     return {"status_code": 200, "result": [dict(row._mapping) for row in rooms]}
 
 
 async def get_rooms_user(user_id: int, session: AsyncSession) -> dict[str, Any]:
-    query = """
-        SELECT rm.*, r.*
-        FROM chat.room_members rm
-        LEFT JOIN chat.rooms r ON rm.room = r.id
-        WHERE rm.member = :user_id
-    """
     values = {"user_id": user_id}
-    result = await session.execute(text(query), values)
-    rooms = result.fetchall()
+    rooms = await db.fetch_all(queries.GET_USER_ROOMS, values, session)
     return {"status_code": 200, "result": [dict(row._mapping) for row in rooms]}
 
 
@@ -341,15 +367,8 @@ async def get_room_encrypted_key(
     if not membership:
         return {"status_code": 400, "message": "You are not a member of this room!"}
 
-    query = """
-        SELECT rm.encrypted_room_key, rm.key_provider, u.public_key as provider_public_key
-        FROM chat.room_members rm
-        LEFT JOIN chat.users u ON rm.key_provider = u.id
-        WHERE rm.room = :room_id AND rm.member = :user_id
-    """
     values = {"room_id": room.id, "user_id": user_id}
-    result = await session.execute(text(query), values)
-    row = result.fetchone()
+    row = await db.fetch_one(queries.GET_ROOM_ENCRYPTED_KEY, values, session)
     
     if row and row.encrypted_room_key:
         return {
@@ -377,13 +396,6 @@ async def set_room_encrypted_key(
     if not membership:
         return {"status_code": 400, "message": "User is not a member of this room!"}
 
-    query = """
-        UPDATE chat.room_members
-        SET encrypted_room_key = :encrypted_key, 
-            key_provider = :key_provider_id,
-            modified_date = :modified_date
-        WHERE room = :room_id AND member = :user_id
-    """
     now = datetime.datetime.utcnow()
     values = {
         "encrypted_key": encrypted_key,
@@ -392,7 +404,7 @@ async def set_room_encrypted_key(
         "user_id": user_id,
         "modified_date": now
     }
-    await session.execute(text(query), values)
+    await db.execute(queries.SET_ROOM_ENCRYPTED_KEY, values, session)
     return {"status_code": 200, "message": "Room key updated successfully"}
 
 
@@ -404,15 +416,8 @@ async def get_room_members_for_key_distribution(
     if not room:
         return {"status_code": 400, "message": "Room not found!"}
 
-    query = """
-        SELECT rm.member, u.nickname, u.email, u.public_key, rm.encrypted_room_key
-        FROM chat.room_members rm
-        LEFT JOIN chat.users u ON rm.member = u.id
-        WHERE rm.room = :room_id
-    """
     values = {"room_id": room.id}
-    result = await session.execute(text(query), values)
-    members = result.fetchall()
+    members = await db.fetch_all(queries.GET_ROOM_MEMBERS, values, session)
     
     return {
         "status_code": 200,
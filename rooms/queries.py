@@ -0,0 +1,113 @@
+from app.utils.query_registry import (
+    DATETIME,
+    ID,
+    STRING,
+    register,
+)
+
+
+FIND_ROOM_BY_NAME = register(
+    "rooms.find_room_by_name",
+    "SELECT * FROM chat.rooms WHERE room_name = :room_name",
+    room_name=STRING,
+)
+
+FIND_ROOM_MEMBER = register(
+    "rooms.find_room_member",
+    """
+        SELECT * FROM chat.room_members
+        WHERE room = :room_id AND member = :user_id
+    """,
+    room_id=ID,
+    user_id=ID,
+)
+
+CREATE_ROOM = register(
+    "rooms.create_room",
+    """
+        INSERT INTO chat.rooms (room_name, description, creation_date, modified_date)
+        VALUES (:room_name, :description, :creation_date, :modified_date)
+    """,
+    room_name=STRING,
+    description=STRING,
+    creation_date=DATETIME,
+    modified_date=DATETIME,
+)
+
+JOIN_ROOM = register(
+    "rooms.join_room",
+    """
+        INSERT INTO chat.room_members (room, member, creation_date, modified_date)
+        VALUES (:room, :member, :creation_date, :modified_date)
+    """,
+    room=ID,
+    member=ID,
+    creation_date=DATETIME,
+    modified_date=DATETIME,
+)
+
+# Membership changes bump the room, so the search index feed sees rooms
+# gaining their first member or losing their last.
+TOUCH_ROOM = register(
+    "rooms.touch_room",
+    "UPDATE chat.rooms SET modified_date = :modified_date WHERE id = :room_id",
+    room_id=ID,
+    modified_date=DATETIME,
+)
+
+DELETE_ROOM_MEMBER = register(
+    "rooms.delete_room_member",
+    "DELETE FROM chat.room_members WHERE room = :room AND member = :member",
+    room=ID,
+    member=ID,
+)
+
+GET_USER_ROOMS = register(
+    "rooms.get_user_rooms",
+    """
+        SELECT rm.*, r.*
+        FROM chat.room_members rm
+        LEFT JOIN chat.rooms r ON rm.room = r.id
+        WHERE rm.member = :user_id
+    """,
+    user_id=ID,
+)
+
+GET_ROOM_ENCRYPTED_KEY = register(
+    "rooms.get_room_encrypted_key",
+    """
+        SELECT rm.encrypted_room_key, rm.key_provider, u.public_key as provider_public_key
+        FROM chat.room_members rm
+        LEFT JOIN chat.users u ON rm.key_provider = u.id
+        WHERE rm.room = :room_id AND rm.member = :user_id
+    """,
+    room_id=ID,
+    user_id=ID,
+)
+
+SET_ROOM_ENCRYPTED_KEY = register(
+    "rooms.set_room_encrypted_key",
+    """
+        UPDATE chat.room_members
+        SET encrypted_room_key = :encrypted_key, 
+            key_provider = :key_provider_id,
+            modified_date = :modified_date
+        WHERE room = :room_id AND member = :user_id
+    """,
+    encrypted_key=STRING,
+    key_provider_id=ID,
+    modified_date=DATETIME,
+    room_id=ID,
+    user_id=ID,
+)
+
+GET_ROOM_MEMBERS = register(
+    "rooms.get_room_members",
+    """
+        SELECT rm.member, u.nickname, u.email, u.public_key, rm.encrypted_room_key
+        FROM chat.room_members rm
+        LEFT JOIN chat.users u ON rm.member = u.id
+        WHERE rm.room = :room_id
+    """,
+    room_id=ID,
+)
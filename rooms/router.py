@@ -1,16 +1,19 @@
-import os
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Request,
 )
 from fastapi.responses import (
-    FileResponse,
+    StreamingResponse,
 )
-from pathlib import Path
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
+from typing import (
+    Optional,
+)
 
 from app.auth.schemas import (
     ResponseSchema,
@@ -23,10 +26,12 @@ from app.rooms.crud import (
     create_assign_new_room,
     create_invite_link,
     delete_room_user_chat,
+    export_room_conversations,
     get_room_conversations,
     get_rooms_user,
     invite_user_to_room,
     leave_room_user,
+    mark_room_read,
     search_rooms,
     send_new_room_message,
     get_room_encrypted_key,
@@ -39,6 +44,7 @@ from app.rooms.schemas import (
     DeleteRoomConversation,
     InviteRoomLink,
     LeaveRoom,
+    MarkRoomRead,
     RoomCreate,
     RoomKeyRequest,
     RoomKeyUpdate,
@@ -48,19 +54,29 @@ from app.users.schemas import (
     UserObjectSchema,
 )
 from app.utils.dependencies import (
-    get_db_autocommit_session,
-    get_db_transactional_session,
+    get_db_session,
+)
+from app.utils.file_responses import (
+    is_uuid_name,
+    send_file,
 )
 from app.utils.jwt_util import (
     get_current_active_user,
 )
+from app.utils.read_replica import (
+    get_db_read_session,
+)
+from app.utils.responses import (
+    ROW_FORMATS,
+    rows_response,
+)
+from app.utils.storage import (
+    storage,
+)
 
 
-UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
-SENT_IMAGES_DIR = UPLOAD_DIR / "sent-images"
-
+SENT_IMAGES_PREFIX = "sent-images"
 
-SENT_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
 router = APIRouter(prefix="/api/v1")
 
@@ -83,7 +99,7 @@ router = APIRouter(prefix="/api/v1")
 async def create_room(
     room: RoomCreate,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await create_assign_new_room(currentUser.id, room, session)
@@ -92,12 +108,77 @@ async def create_room(
 
 @router.get("/room/conversation", name="room:get-conversations")
 async def get_room_users_conversation(
+    room: str,
+    before: Optional[int] = Query(None, gt=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+
+    results = await get_room_conversations(
+        room, currentUser.id, session, before, limit
+    )
+    return rows_response(results, format)
+
+
+@router.get(
+    "/room/conversation/export",
+    status_code=200,
+    name="room:export-conversations",
+    responses={
+        200: {
+            "description": "Stream the whole room history as NDJSON, oldest first.",
+            "content": {"application/x-ndjson": {}},
+        },
+        400: {
+            "model": ResponseSchema,
+            "description": "Return a message that indicates if the room doesn't exist or the user is not a member.",
+        },
+    },
+)
+async def export_room_conversation(
     room: str,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_read_session),
 ):
 
-    results = await get_room_conversations(room, currentUser.id, session)
+    results = await export_room_conversations(room, currentUser.id, session)
+    if results["status_code"] != 200:
+        return results
+    return StreamingResponse(
+        results["stream"],
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="{results["filename"]}"'
+        },
+    )
+
+
+@router.post(
+    "/room/conversation/read",
+    status_code=200,
+    name="room:mark-conversation-read",
+    responses={
+        200: {
+            "model": ResponseSchema,
+            "description": "Return a message that indicates the room read marker has been advanced.",
+        },
+        400: {
+            "model": ResponseSchema,
+            "description": "Return a message that indicates if the room doesn't exist or the user is not a member.",
+        },
+    },
+)
+async def mark_room_conversation_read(
+    request: MarkRoomRead,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+
+    results = await mark_room_read(
+        currentUser.id, request.room_name, request.message_id, session
+    )
     return results
 
 
@@ -105,7 +186,7 @@ async def get_room_users_conversation(
 async def send_room_message(
     request: MessageCreateRoom,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await send_new_room_message(
@@ -132,7 +213,7 @@ async def send_room_message(
 async def leave_room(
     room: LeaveRoom,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
     """
     Leave a room.
@@ -159,7 +240,7 @@ async def leave_room(
 async def delete_room_chat(
     room_name: DeleteRoomConversation,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await delete_room_user_chat(
@@ -171,36 +252,41 @@ async def delete_room_chat(
 @router.get("/rooms/search", status_code=200, name="rooms:search-for-room")
 async def search_for_room(
     search: str,
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await search_rooms(search, currentUser.id, session)
-    return results
+    return rows_response(results, format)
 
 
 @router.get("/rooms", status_code=200, name="rooms:get-rooms-for-user")
 async def get_rooms_for_user(
+    format: Optional[str] = Query(None, pattern=ROW_FORMATS),
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await get_rooms_user(currentUser.id, session)
-    return results
+    return rows_response(results, format)
 
 
 @router.get("/chat/images/room/{room_id}/{uuid_val}")
-async def get_sent_room_chat_images(room_id: int, uuid_val: str):
+async def get_sent_room_chat_images(request: Request, room_id: int, uuid_val: str):
 
     try:
-        file_path = SENT_IMAGES_DIR / "chat" / "images" / "room" / str(room_id) / uuid_val
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="Image not found")
-        return FileResponse(
-            path=str(file_path),
-            media_type="image/png",
-            filename=uuid_val
+        key = f"{SENT_IMAGES_PREFIX}/chat/images/room/{room_id}/{uuid_val}"
+        response = await send_file(
+            request,
+            key,
+            "image/png",
+            filename=uuid_val,
+            immutable=is_uuid_name(uuid_val),
         )
+        if response is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        return response
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
@@ -225,7 +311,7 @@ async def get_sent_room_chat_images(room_id: int, uuid_val: str):
 async def ban_a_user_from_a_room(
     room: BanUserRoom,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await ban_user_from_room(
@@ -252,7 +338,7 @@ async def ban_a_user_from_a_room(
 async def invite_a_user_to_a_room(
     room: InviteRoomLink,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await invite_user_to_room(
@@ -279,7 +365,7 @@ async def invite_a_user_to_a_room(
 async def create_an_invite_link(
     room: InviteRoomLink,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
 
@@ -289,15 +375,10 @@ async def create_an_invite_link(
     return results
 
 
-def save_room_chat_image(room_id: int, uuid_val: str, file_content: bytes) -> str:
+async def save_room_chat_image(room_id: int, uuid_val: str, file_content: bytes) -> str:
 
-    room_dir = SENT_IMAGES_DIR / "chat" / "images" / "room" / str(room_id)
-    room_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_path = room_dir / uuid_val
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    
+    key = f"{SENT_IMAGES_PREFIX}/chat/images/room/{room_id}/{uuid_val}"
+    await storage.put(key, file_content)
     return f"/chat/images/room/{room_id}/{uuid_val}"
 
 
@@ -320,7 +401,7 @@ def save_room_chat_image(room_id: int, uuid_val: str, file_content: bytes) -> st
 async def get_room_key(
     room_name: str,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await get_room_encrypted_key(currentUser.id, room_name, session)
@@ -345,7 +426,7 @@ async def get_room_key(
 async def update_room_key(
     request: RoomKeyUpdate,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await set_room_encrypted_key(
@@ -375,7 +456,7 @@ async def update_room_key(
 async def get_members_for_key_distribution(
     room_name: str,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await get_room_members_for_key_distribution(room_name, session)
@@ -400,7 +481,7 @@ async def get_members_for_key_distribution(
 async def distribute_key_to_member(
     request: RoomKeyDistribute,
     currentUser: UserObjectSchema = Depends(get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     results = await distribute_room_key_to_member(
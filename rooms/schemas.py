@@ -34,6 +34,14 @@ class RoomGetALL(BaseModel):
     creation_date: datetime.datetime
 
 
+class MarkRoomRead(BaseModel):
+
+    room_name: str = Field(..., example="A room name.")
+    message_id: int = Field(
+        ..., example=1024, gt=0, description="The newest message id that has been read."
+    )
+
+
 class LeaveRoom(BaseModel):
 
     room_name: str = Field(..., example="A room name to leave.")
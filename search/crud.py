@@ -0,0 +1,113 @@
+from sqlalchemy.engine import (
+    Row,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Any,
+)
+
+from app.search import (
+    queries,
+)
+from app.search.index import (
+    NgramIndex,
+    search_index,
+)
+from app.utils import (
+    query_registry as db,
+)
+
+RECENT_CHATS_LIMIT = 200
+
+
+async def get_user_contact_ids(user_id: int, session: AsyncSession) -> list[int]:
+
+    values = {"user_id": user_id}
+    rows = await db.fetch_all(queries.GET_USER_CONTACT_IDS, values, session)
+    return [row.contact for row in rows]
+
+
+async def get_user_recent_chat_ids(
+    user_id: int, session: AsyncSession
+) -> list[int]:
+
+    values = {"user_id": user_id, "limit": RECENT_CHATS_LIMIT}
+    rows = await db.fetch_all(queries.GET_USER_RECENT_CHAT_IDS, values, session)
+    return [row.peer for row in rows]
+
+
+async def get_user_room_ids(user_id: int, session: AsyncSession) -> list[int]:
+
+    values = {"user_id": user_id}
+    rows = await db.fetch_all(queries.GET_USER_ROOM_IDS, values, session)
+    return [row.room for row in rows]
+
+
+async def rank_rows(
+    index: NgramIndex, query: str, rows: list[Row], key: str, session: AsyncSession
+) -> list[Row]:
+    """
+    The rows whose document in index matches query, best match first. The
+    caller's own list query supplies the scope, so nothing is scanned with
+    LIKE.
+    """
+
+    if not search_index.loaded:
+        await search_index.refresh(session)
+    by_id = {getattr(row, key): row for row in rows}
+    hits = index.search(query, scope=by_id, limit=len(by_id))
+    return [by_id[doc_id] for doc_id, _ in hits]
+
+
+def _user_hits(hits: list[tuple[int, int]]) -> list[dict[str, Any]]:
+    results = []
+    for user_id, score in hits:
+        fields = search_index.users.get(user_id)
+        if fields:
+            results.append({
+                "id": user_id,
+                "nickname": fields[0],
+                "email": fields[1],
+                "score": score,
+            })
+    return results
+
+
+async def search_everything(
+    query: str, user_id: int, limit: int, session: AsyncSession
+) -> dict[str, Any]:
+
+    if not search_index.loaded:
+        await search_index.refresh(session)
+
+    contact_ids = await get_user_contact_ids(user_id, session)
+    chat_ids = await get_user_recent_chat_ids(user_id, session)
+    room_ids = await get_user_room_ids(user_id, session)
+
+    contacts = _user_hits(
+        search_index.users.search(query, scope=contact_ids, limit=limit)
+    )
+
+    recency = {peer: position for position, peer in enumerate(chat_ids)}
+    chats = _user_hits(
+        search_index.users.search(query, scope=chat_ids, limit=len(chat_ids))
+    )
+    chats.sort(key=lambda hit: (hit["score"], recency[hit["id"]]))
+
+    rooms = []
+    for room_id, score in search_index.rooms.search(
+        query, scope=room_ids, limit=limit
+    ):
+        fields = search_index.rooms.get(room_id)
+        if fields:
+            rooms.append({"id": room_id, "room_name": fields[0], "score": score})
+
+    return {
+        "status_code": 200,
+        "query": query,
+        "contacts": contacts,
+        "chats": chats[:limit],
+        "rooms": rooms,
+    }
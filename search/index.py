@@ -0,0 +1,284 @@
+import asyncio
+import datetime
+import logging
+import re
+import time
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Iterable,
+    Optional,
+)
+
+from app.config import (
+    settings,
+)
+from app.search import (
+    queries,
+)
+from app.utils import (
+    query_registry as db,
+)
+from app.utils.engine import (
+    get_autocommit_session_factory,
+)
+
+logger = logging.getLogger(__name__)
+
+GRAM_SIZE = 3
+EPOCH = datetime.datetime(1900, 1, 1)
+TOKEN_SPLIT = re.compile(r"[\s@._\-]+")
+
+
+def normalize(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def grams(value: str, size: int = GRAM_SIZE) -> set[str]:
+    if len(value) < size:
+        return set()
+    return {value[i:i + size] for i in range(len(value) - size + 1)}
+
+
+class NgramIndex:
+    """
+    In-memory trigram index over a few short text fields per document.
+    Queries shorter than a trigram are answered from a token prefix map.
+    """
+
+    def __init__(self, size: int = GRAM_SIZE) -> None:
+        self.size = size
+        self._docs: dict[int, tuple[str, ...]] = {}
+        self._grams: dict[str, set[int]] = {}
+        self._prefixes: dict[str, set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def get(self, doc_id: int) -> Optional[tuple[str, ...]]:
+        return self._docs.get(doc_id)
+
+    def _keys(self, fields: tuple[str, ...]) -> tuple[set[str], set[str]]:
+        doc_grams: set[str] = set()
+        doc_prefixes: set[str] = set()
+        for field in fields:
+            value = normalize(field)
+            doc_grams |= grams(value, self.size)
+            for token in [value, *TOKEN_SPLIT.split(value)]:
+                for length in range(1, min(len(token), self.size - 1) + 1):
+                    doc_prefixes.add(token[:length])
+        return doc_grams, doc_prefixes
+
+    def add(self, doc_id: int, *fields: Optional[str]) -> None:
+        fields = tuple(field or "" for field in fields)
+        if self._docs.get(doc_id) == fields:
+            return
+        self.remove(doc_id)
+        self._docs[doc_id] = fields
+        doc_grams, doc_prefixes = self._keys(fields)
+        for gram in doc_grams:
+            self._grams.setdefault(gram, set()).add(doc_id)
+        for prefix in doc_prefixes:
+            self._prefixes.setdefault(prefix, set()).add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        fields = self._docs.pop(doc_id, None)
+        if fields is None:
+            return
+        doc_grams, doc_prefixes = self._keys(fields)
+        for key, postings in (
+            *((gram, self._grams) for gram in doc_grams),
+            *((prefix, self._prefixes) for prefix in doc_prefixes),
+        ):
+            ids = postings.get(key)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del postings[key]
+
+    def _postings(self, query: str) -> set[int]:
+        if len(query) < self.size:
+            return self._prefixes.get(query, set())
+
+        query_grams = sorted(
+            grams(query, self.size),
+            key=lambda gram: len(self._grams.get(gram, ())),
+        )
+        result: Optional[set[int]] = None
+        for gram in query_grams:
+            ids = self._grams.get(gram)
+            if not ids:
+                return set()
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    @staticmethod
+    def _score(query: str, fields: tuple[str, ...]) -> Optional[int]:
+        best = None
+        for position, field in enumerate(fields):
+            value = normalize(field)
+            if value == query:
+                score = 0
+            elif value.startswith(query):
+                score = 1
+            elif any(token.startswith(query) for token in TOKEN_SPLIT.split(value)):
+                score = 2
+            elif query in value:
+                score = 3
+            else:
+                continue
+            score = score * 10 + position
+            if best is None or score < best:
+                best = score
+        return best
+
+    def search(
+        self,
+        query: str,
+        scope: Optional[Iterable[int]] = None,
+        limit: int = 10,
+    ) -> list[tuple[int, int]]:
+
+        query = normalize(query)
+        if not query:
+            return []
+
+        postings = self._postings(query)
+        if scope is not None:
+            scope = set(scope)
+            candidates = (
+                {doc_id for doc_id in scope if doc_id in self._docs}
+                if len(scope) < len(postings) or len(query) < self.size
+                else postings & scope
+            )
+        else:
+            candidates = postings
+
+        ranked = []
+        for doc_id in candidates:
+            fields = self._docs.get(doc_id)
+            if fields is None:
+                continue
+            score = self._score(query, fields)
+            if score is not None:
+                ranked.append((score, len(fields[0]), doc_id))
+        ranked.sort()
+        return [(doc_id, score) for score, _, doc_id in ranked[:limit]]
+
+
+class SearchIndex:
+    """
+    User and room indexes kept current by polling for rows changed after a
+    (modified_date, id) watermark. modified_date is stamped before the
+    write commits, so each poll stops SEARCH_REFRESH_LAG_SECONDS short of
+    now and a row that commits late is still ahead of the watermark. The
+    indexes are rebuilt every SEARCH_REBUILD_SECONDS to drop deleted rows.
+    """
+
+    def __init__(self) -> None:
+        self.users = NgramIndex()
+        self.rooms = NgramIndex()
+        self.loaded = False
+        self._watermarks: dict[str, tuple[datetime.datetime, int]] = {}
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _index_user(index: NgramIndex, user: dict) -> None:
+        if user.get("user_role") == "disabled":
+            index.remove(user["id"])
+        else:
+            index.add(user["id"], user["nickname"], user["email"])
+
+    def index_user(self, user: dict) -> None:
+        self._index_user(self.users, user)
+
+    def remove_user(self, user_id: int) -> None:
+        self.users.remove(user_id)
+
+    def index_room(self, room_id: int, room_name: str) -> None:
+        self.rooms.add(room_id, room_name)
+
+    def remove_room(self, room_id: int) -> None:
+        self.rooms.remove(room_id)
+
+    @staticmethod
+    async def _changed(
+        query: db.NamedQuery,
+        watermarks: dict[str, tuple[datetime.datetime, int]],
+        until: datetime.datetime,
+        session: AsyncSession,
+    ) -> list:
+
+        since, after_id = watermarks.get(query.name, (EPOCH, 0))
+        values = {"since": since, "after_id": after_id, "until": until}
+        rows = await db.fetch_all(query, values, session)
+        if rows:
+            watermarks[query.name] = (rows[-1].modified_date, rows[-1].id)
+        return rows
+
+    async def refresh(self, session: AsyncSession) -> None:
+
+        async with self._lock:
+            rebuild = (
+                self.loaded
+                and time.monotonic() - self._built_at >= settings.SEARCH_REBUILD_SECONDS
+            )
+            if rebuild:
+                users, rooms, watermarks = NgramIndex(), NgramIndex(), {}
+            else:
+                users, rooms, watermarks = self.users, self.rooms, self._watermarks
+            until = datetime.datetime.utcnow() - datetime.timedelta(
+                seconds=settings.SEARCH_REFRESH_LAG_SECONDS
+            )
+
+            for row in await self._changed(
+                queries.GET_CHANGED_USERS, watermarks, until, session
+            ):
+                self._index_user(users, row._asdict())
+            for row in await self._changed(
+                queries.GET_CHANGED_ROOMS, watermarks, until, session
+            ):
+                if row.has_members:
+                    rooms.add(row.id, row.room_name)
+                else:
+                    rooms.remove(row.id)
+
+            if rebuild or not self.loaded:
+                self._built_at = time.monotonic()
+            self.users, self.rooms, self._watermarks = users, rooms, watermarks
+            if not self.loaded:
+                logger.info(
+                    f"Search index loaded: {len(self.users)} users,"
+                    f" {len(self.rooms)} rooms."
+                )
+            self.loaded = True
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            session_factory = get_autocommit_session_factory()
+            if session_factory is not None:
+                session = session_factory()
+                try:
+                    await self.refresh(session)
+                except Exception as e:
+                    logger.warning(f"Search index refresh failed: {e}")
+                finally:
+                    await session_factory.remove()
+            await asyncio.sleep(settings.SEARCH_REFRESH_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+search_index = SearchIndex()
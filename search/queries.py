@@ -0,0 +1,90 @@
+from app.utils.query_registry import (
+    DATETIME,
+    ID,
+    INT,
+    register,
+)
+
+
+GET_USER_CONTACT_IDS = register(
+    "search.get_user_contact_ids",
+    "SELECT contact FROM chat.contacts WHERE [user] = :user_id",
+    user_id=ID,
+)
+
+GET_USER_RECENT_CHAT_IDS = register(
+    "search.get_user_recent_chat_ids",
+    """
+        SELECT TOP (:limit)
+            p.peer
+        FROM (
+            SELECT receiver AS peer, MAX(id) AS last_id
+            FROM chat.messages
+            WHERE sender = :user_id AND room IS NULL
+            GROUP BY receiver
+            UNION ALL
+            SELECT sender AS peer, MAX(id) AS last_id
+            FROM chat.messages
+            WHERE receiver = :user_id AND room IS NULL
+            GROUP BY sender
+        ) p
+        WHERE
+            p.peer != :user_id
+        GROUP BY
+            p.peer
+        ORDER BY
+            MAX(p.last_id) DESC
+    """,
+    limit=INT,
+    user_id=ID,
+)
+
+GET_USER_ROOM_IDS = register(
+    "search.get_user_room_ids",
+    "SELECT room FROM chat.room_members WHERE member = :user_id",
+    user_id=ID,
+)
+
+# Rows changed after a (modified_date, id) watermark and before :until,
+# oldest first, so the last row is the next watermark.
+GET_CHANGED_USERS = register(
+    "search.get_changed_users",
+    """
+        SELECT id, nickname, email, user_role, modified_date
+        FROM chat.users
+        WHERE
+          (
+            modified_date > :since
+            OR (modified_date = :since AND id > :after_id)
+          )
+          AND modified_date < :until
+        ORDER BY modified_date, id
+    """,
+    since=DATETIME,
+    after_id=ID,
+    until=DATETIME,
+)
+
+GET_CHANGED_ROOMS = register(
+    "search.get_changed_rooms",
+    """
+        SELECT
+          r.id,
+          r.room_name,
+          r.modified_date,
+          CASE WHEN EXISTS (
+            SELECT 1 FROM chat.room_members m WHERE m.room = r.id
+          ) THEN 1 ELSE 0 END AS has_members
+        FROM chat.rooms r
+        WHERE
+          (
+            r.modified_date > :since
+            OR (r.modified_date = :since AND r.id > :after_id)
+          )
+          AND r.modified_date < :until
+        ORDER BY r.modified_date, r.id
+    """,
+    since=DATETIME,
+    after_id=ID,
+    until=DATETIME,
+)
@@ -0,0 +1,45 @@
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+
+from app.search.crud import (
+    search_everything,
+)
+from app.users.schemas import (
+    UserObjectSchema,
+)
+from app.utils.jwt_util import (
+    get_current_active_user,
+)
+from app.utils.read_replica import (
+    get_db_read_session,
+)
+
+router = APIRouter(prefix="/api/v1")
+
+
+@router.get(
+    "/search",
+    status_code=200,
+    name="search:search-everything",
+    responses={
+        200: {
+            "description": "Return ranked contacts, recent chats and rooms"
+            " matching the query.",
+        },
+    },
+)
+async def search(
+    q: str = Query(..., min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=50),
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+    session: AsyncSession = Depends(get_db_read_session),
+):
+
+    results = await search_everything(q, currentUser.id, limit, session)
+    return results
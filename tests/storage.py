@@ -0,0 +1,62 @@
+import datetime
+import hashlib
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Optional,
+)
+
+from app.utils.storage import (
+    Storage,
+    StoredObject,
+    check_key,
+)
+
+
+class MemoryStorage(Storage):
+    """A Storage backend held in a dict, for tests that need no disk."""
+
+    def __init__(self) -> None:
+        self.objects: dict[str, tuple[bytes, datetime.datetime]] = {}
+
+    async def put(self, key: str, data: bytes) -> None:
+        self.objects[check_key(key)] = (data, datetime.datetime.utcnow())
+
+    async def put_file(self, key: str, path: Path) -> None:
+        await self.put(key, path.read_bytes())
+        path.unlink()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        stored = self.objects.get(check_key(key))
+        return None if stored is None else stored[0]
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+
+        data, _ = self.objects[check_key(key)]
+        yield data[start:None if end is None else end + 1]
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+
+        stored = self.objects.get(check_key(key))
+        if stored is None:
+            return None
+        data, modified = stored
+        return StoredObject(
+            key=key,
+            size=len(data),
+            modified=modified,
+            etag=hashlib.md5(data).hexdigest(),
+        )
+
+    async def delete(self, key: str) -> bool:
+        return self.objects.pop(check_key(key), None) is not None
+
+    async def list(
+        self, prefix: str, after: str = "", limit: int = 1000
+    ) -> list[StoredObject]:
+
+        prefix = prefix.strip("/") + "/"
+        keys = sorted(k for k in self.objects if k.startswith(prefix) and k > after)
+        return [await self.stat(key) for key in keys[:limit]]
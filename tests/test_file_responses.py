@@ -0,0 +1,94 @@
+import anyio
+import pytest
+from starlette.requests import (
+    Request,
+)
+
+from app.utils import (
+    file_responses,
+)
+from app.utils.storage import (
+    LocalStorage,
+)
+
+CONTENT = b"0123456789"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+
+    storage = LocalStorage(tmp_path, workers=1)
+    (tmp_path / "files").mkdir()
+    (tmp_path / "files" / "digits.txt").write_bytes(CONTENT)
+    monkeypatch.setattr(file_responses, "storage", storage)
+    yield storage
+    storage._executor.shutdown(wait=True)
+
+
+def _scope(headers: dict[str, str]) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/files/digits.txt",
+        "query_string": b"",
+        "headers": [
+            (name.lower().encode(), value.encode())
+            for name, value in headers.items()
+        ],
+    }
+
+
+async def _get(headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+
+    scope = _scope(headers)
+    response = await file_responses.send_file(
+        Request(scope), "files/digits.txt", "text/plain", etag="digits"
+    )
+    messages = []
+
+    async def receive():
+        await anyio.sleep_forever()
+
+    async def send(message):
+        messages.append(message)
+
+    await response(scope, receive, send)
+    start = messages[0]
+    response_headers = {
+        name.decode().lower(): value.decode() for name, value in start["headers"]
+    }
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], response_headers, body
+
+
+@pytest.mark.anyio
+async def test_single_range_is_partial(local_storage):
+
+    status, headers, body = await _get({"Range": "bytes=2-4"})
+    assert status == 206
+    assert headers["content-range"] == "bytes 2-4/10"
+    assert body == b"234"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("range_header", ["bytes=5-3", "bytes=0-1,3-4"])
+async def test_ignored_range_sends_whole_local_file(local_storage, range_header):
+
+    status, headers, body = await _get({"Range": range_header})
+    assert status == 200
+    assert "content-range" not in headers
+    assert headers["content-type"].startswith("text/plain")
+    assert body == CONTENT
+
+
+@pytest.mark.anyio
+async def test_stale_if_range_sends_whole_local_file(local_storage):
+
+    status, _, body = await _get({"Range": "bytes=2-4", "If-Range": '"other"'})
+    assert status == 200
+    assert body == CONTENT
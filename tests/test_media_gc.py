@@ -0,0 +1,186 @@
+import asyncio
+import datetime
+import hashlib
+import pytest
+from types import (
+    SimpleNamespace,
+)
+
+from app.chats import (
+    media,
+    media_gc,
+    queries,
+)
+from app.tests.storage import (
+    MemoryStorage,
+)
+from app.utils import (
+    query_registry,
+)
+
+CONTENT = b"attachment"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+KEY = media.media_key(DIGEST)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class FakeSession:
+    """Holds blob row locks until it commits or is closed, like a transaction."""
+
+    def __init__(self, db: "FakeBlobs") -> None:
+        self.db = db
+        self.locks: list[asyncio.Lock] = []
+
+    async def lock(self, digest: str) -> None:
+        lock = self.db.locks.setdefault(digest, asyncio.Lock())
+        if lock not in self.locks:
+            if lock.locked():
+                self.db.waiting.set()
+            await lock.acquire()
+            self.locks.append(lock)
+
+    async def commit(self) -> None:
+        while self.locks:
+            self.locks.pop().release()
+
+    close = commit
+
+
+class FakeBlobs:
+    """chat.media_blobs with the locking the collector relies on."""
+
+    def __init__(self) -> None:
+        self.rows: dict[str, dict] = {}
+        self.locks: dict[str, asyncio.Lock] = {}
+        self.waiting = asyncio.Event()
+
+    async def execute(self, query, values, session):
+
+        if query is queries.RECORD_MEDIA_BLOB:
+            await session.lock(values["sha256"])
+            row = self.rows.setdefault(
+                values["sha256"], {"ref_count": 0, "size": values["size"]}
+            )
+            row["modified_date"] = values["modified_date"]
+            return SimpleNamespace(rowcount=1)
+        if query is queries.DELETE_MEDIA_BLOB:
+            await session.lock(values["sha256"])
+            row = self.rows.get(values["sha256"])
+            if (
+                row is None
+                or row["ref_count"] > 0
+                or row["modified_date"] >= values["settled_before"]
+            ):
+                return SimpleNamespace(rowcount=0)
+            del self.rows[values["sha256"]]
+            return SimpleNamespace(rowcount=1)
+        raise AssertionError(f"Unexpected query {query!r}")
+
+    async def fetch_all(self, query, values, session):
+
+        assert query is queries.GET_MEDIA_BLOB_DATES
+        return [
+            SimpleNamespace(sha256=digest, modified_date=row["modified_date"])
+            for digest, row in self.rows.items()
+            if digest in values["digests"]
+        ]
+
+
+class GatedStorage(MemoryStorage):
+    """Pauses inside delete(KEY) until the test lets it continue."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.deleting = asyncio.Event()
+        self.proceed = asyncio.Event()
+
+    async def delete(self, key: str) -> bool:
+        if key == KEY:
+            self.deleting.set()
+            await self.proceed.wait()
+        return await super().delete(key)
+
+
+@pytest.fixture
+def blobs(monkeypatch):
+
+    blobs = FakeBlobs()
+    storage = GatedStorage()
+    long_ago = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    blobs.rows[DIGEST] = {
+        "ref_count": 0,
+        "size": len(CONTENT),
+        "modified_date": long_ago,
+    }
+    storage.objects[KEY] = (CONTENT, long_ago)
+
+    class SessionFactory:
+        def __init__(self) -> None:
+            self.sessions: list[FakeSession] = []
+
+        def __call__(self) -> FakeSession:
+            self.sessions.append(FakeSession(blobs))
+            return self.sessions[-1]
+
+        async def remove(self) -> None:
+            await self.sessions.pop().close()
+
+    async def no_mark(key):
+        pass
+
+    monkeypatch.setattr(query_registry, "execute", blobs.execute)
+    monkeypatch.setattr(query_registry, "fetch_all", blobs.fetch_all)
+    monkeypatch.setattr(media, "storage", storage)
+    monkeypatch.setattr(media, "clear_orphan_mark", no_mark)
+    monkeypatch.setattr(media_gc, "storage", storage)
+    monkeypatch.setattr(
+        media_gc, "get_transactional_session_factory", lambda: SessionFactory()
+    )
+    blobs.storage = storage
+    return blobs
+
+
+@pytest.mark.anyio
+async def test_upload_during_collection_rewrites_the_file(blobs):
+
+    storage = blobs.storage
+    settled_before = datetime.datetime.utcnow()
+    collect = asyncio.create_task(
+        media_gc.MediaCollector()._delete(media.MEDIA_PREFIX, KEY, settled_before)
+    )
+    await storage.deleting.wait()
+
+    upload_session = FakeSession(blobs)
+    upload = asyncio.create_task(media.store_bytes(CONTENT, upload_session))
+    await blobs.waiting.wait()
+
+    storage.proceed.set()
+    assert await collect
+    assert await upload == DIGEST
+    await upload_session.commit()
+
+    assert await storage.get(KEY) == CONTENT
+    assert DIGEST in blobs.rows
+
+
+@pytest.mark.anyio
+async def test_collection_during_upload_keeps_the_blob(blobs):
+
+    storage = blobs.storage
+    storage.proceed.set()
+    upload_session = FakeSession(blobs)
+    await media.store_bytes(CONTENT, upload_session)
+
+    settled_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    collect = asyncio.create_task(
+        media_gc.MediaCollector()._delete(media.MEDIA_PREFIX, KEY, settled_before)
+    )
+    await blobs.waiting.wait()
+
+    await upload_session.commit()
+    assert not await collect
+    assert await storage.get(KEY) == CONTENT
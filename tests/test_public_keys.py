@@ -0,0 +1,97 @@
+import datetime
+import pytest
+from types import (
+    SimpleNamespace,
+)
+
+from app.config import (
+    settings,
+)
+from app.users import (
+    public_keys,
+    queries,
+)
+from app.utils import (
+    query_registry,
+)
+
+NOW = datetime.datetime.utcnow().replace(microsecond=0)
+STAMP = NOW - datetime.timedelta(hours=1)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _user(user_id: int, modified_date: datetime.datetime) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=user_id,
+        nickname=f"user{user_id}",
+        public_key=f"key{user_id}",
+        modified_date=modified_date,
+    )
+
+
+@pytest.fixture
+def directory(monkeypatch):
+    """A directory over chat.users rows, five of which share a timestamp."""
+
+    users = [_user(user_id, STAMP) for user_id in (3, 1, 5, 2, 4)]
+    users.append(_user(6, STAMP + datetime.timedelta(seconds=1)))
+    users.append(_user(7, NOW))
+
+    async def fetch_all(query, values, session):
+
+        assert query is queries.GET_CHANGED_PUBLIC_KEYS
+        rows = sorted(
+            (
+                user for user in users
+                if (
+                    user.modified_date > values["since"]
+                    or (
+                        user.modified_date == values["since"]
+                        and user.id > values["after_id"]
+                    )
+                )
+                and user.modified_date < values["until"]
+            ),
+            key=lambda user: (user.modified_date, user.id),
+        )
+        return rows[:values["limit"]]
+
+    async def store(entries):
+        pass
+
+    directory = public_keys.PublicKeyDirectory()
+    monkeypatch.setattr(query_registry, "fetch_all", fetch_all)
+    monkeypatch.setattr(directory, "_store", store)
+    monkeypatch.setattr(settings, "PUBLIC_KEY_CHANGES_LIMIT", 2)
+    return directory
+
+
+@pytest.mark.anyio
+async def test_changes_page_through_identical_timestamps(directory):
+
+    since, after_id = STAMP - datetime.timedelta(days=1), 0
+    pages = []
+    while True:
+        page = await directory.changes(since, after_id, None)
+        pages.append([entry["id"] for entry in page["keys"]])
+        # Clients send the watermark back as it was serialized.
+        since = datetime.datetime.fromisoformat(page["since"])
+        after_id = page["after_id"]
+        if not page["more"]:
+            break
+
+    assert pages == [[1, 2], [3, 4], [5, 6], []]
+    assert (since, after_id) == (STAMP + datetime.timedelta(seconds=1), 6)
+
+
+@pytest.mark.anyio
+async def test_changes_without_watermark_start_at_the_lag(directory):
+
+    page = await directory.changes(None, 0, None)
+    assert page["keys"] == []
+    assert page["after_id"] == 0
+    assert datetime.datetime.fromisoformat(page["since"]) < NOW
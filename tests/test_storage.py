@@ -0,0 +1,51 @@
+import pytest
+
+from app.tests.storage import (
+    MemoryStorage,
+)
+from app.utils.storage import (
+    LocalStorage,
+    S3Storage,
+    Storage,
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_incomplete_backend_cannot_be_created():
+
+    class NoDelete(Storage):
+        put = MemoryStorage.put
+        put_file = MemoryStorage.put_file
+        get = MemoryStorage.get
+        stream = MemoryStorage.stream
+        stat = MemoryStorage.stat
+        list = MemoryStorage.list
+
+    with pytest.raises(TypeError, match="delete"):
+        NoDelete()
+
+
+@pytest.mark.parametrize("backend", [LocalStorage, S3Storage, MemoryStorage])
+def test_backends_implement_every_abstract_method(backend):
+
+    assert not backend.__abstractmethods__
+    assert Storage.__abstractmethods__ <= {
+        name for name in vars(backend) if not name.startswith("__")
+    }
+
+
+@pytest.mark.anyio
+async def test_memory_storage_round_trip():
+
+    storage = MemoryStorage()
+    await storage.put("media/ab/cd/blob", b"0123456789")
+    assert await storage.exists("media/ab/cd/blob")
+    chunks = [chunk async for chunk in storage.stream("media/ab/cd/blob", 2, 4)]
+    assert b"".join(chunks) == b"234"
+    assert [o.key for o in await storage.list("media")] == ["media/ab/cd/blob"]
+    assert await storage.delete("media/ab/cd/blob")
+    assert await storage.get("media/ab/cd/blob") is None
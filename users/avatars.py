@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import time
+from collections import (
+    OrderedDict,
+)
+from concurrent.futures import (
+    ProcessPoolExecutor,
+)
+from prometheus_client import (
+    Counter,
+)
+from typing import (
+    NamedTuple,
+    Optional,
+)
+
+from app.config import (
+    settings,
+)
+from app.utils.pubsub_listener import (
+    listen,
+)
+from app.utils.storage import (
+    storage,
+)
+
+try:
+    from PIL import (
+        Image,
+        ImageOps,
+    )
+except ImportError:  # pragma: no cover
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "avatars:invalidations"
+PROFILE_IMAGES_PREFIX = "profile-images"
+ORIGINAL = "original"
+# The original is normalized to this square PNG, which keeps the old
+# profile.png URL working; the sized variants are much smaller WebP.
+ORIGINAL_PIXELS = 512
+AVATAR_SIZES = {"small": 64, "medium": 256}
+AVATAR_PATTERN = "^(small|medium)$"
+MAX_AVATAR_BYTES = 10 * 1024 * 1024
+
+AVATAR_LOOKUPS = Counter(
+    "cychat_avatar_lookups_total",
+    "Avatar reads by where they were answered from (memory or storage).",
+    ["level"],
+)
+
+
+class AvatarEntry(NamedTuple):
+    version: str
+    content: bytes
+    media_type: str
+
+
+def avatar_key(user_id: int, size: str = ORIGINAL) -> str:
+
+    if size == ORIGINAL:
+        return f"{PROFILE_IMAGES_PREFIX}/user/{user_id}/profile.png"
+    return f"{PROFILE_IMAGES_PREFIX}/user/{user_id}/{size}.webp"
+
+
+def avatar_media_type(size: str) -> str:
+    return "image/png" if size == ORIGINAL else "image/webp"
+
+
+def _entry(content: bytes, media_type: str) -> AvatarEntry:
+    return AvatarEntry(hashlib.sha256(content).hexdigest()[:32], content, media_type)
+
+
+def _render(content: bytes, normalize: bool) -> dict[str, bytes]:
+    """
+    Runs in a worker process: crop the image to a centred square, then
+    encode the normalized original (unless it is already stored) and every
+    sized variant.
+    """
+
+    rendered = {}
+    with Image.open(io.BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        side = min(image.size)
+        image = ImageOps.fit(image, (side, side))
+        if normalize:
+            original = image.copy()
+            original.thumbnail((ORIGINAL_PIXELS, ORIGINAL_PIXELS))
+            output = io.BytesIO()
+            original.save(output, format="PNG", optimize=True)
+            rendered[ORIGINAL] = output.getvalue()
+        for size, pixels in AVATAR_SIZES.items():
+            variant = image.resize((pixels, pixels), Image.LANCZOS)
+            output = io.BytesIO()
+            variant.save(output, format="WEBP", quality=85)
+            rendered[size] = output.getvalue()
+    return rendered
+
+
+class AvatarStore:
+    """
+    Profile images, normalized and resized in a process pool when they are
+    uploaded, and served from a byte-bounded LRU of the encoded files.
+    Each entry carries its content hash as its version and ETag; uploads
+    drop the user's entries on every worker over pub/sub, and entries
+    expire after AVATAR_CACHE_TTL_SECONDS in case a message is missed.
+    """
+
+    def __init__(self) -> None:
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: OrderedDict[
+            tuple[int, str], tuple[float, AvatarEntry]
+        ] = OrderedDict()
+        self._cached_bytes = 0
+        # Bumped whenever a user's entries are dropped, so a read that
+        # started before then does not cache what it loaded.
+        self._generations: dict[int, int] = {}
+        self._epoch = 0
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _conn(self):
+        if self._redis is None:
+            self._redis = await settings.redis_conn()
+        return self._redis
+
+    def _store_local(
+        self, user_id: int, size: str, content: bytes, media_type: str
+    ) -> AvatarEntry:
+
+        self._drop_entry((user_id, size))
+        entry = _entry(content, media_type)
+        if len(content) > settings.AVATAR_CACHE_BYTES:
+            return entry
+        deadline = time.monotonic() + settings.AVATAR_CACHE_TTL_SECONDS
+        self._cache[(user_id, size)] = (deadline, entry)
+        self._cached_bytes += len(content)
+        while self._cached_bytes > settings.AVATAR_CACHE_BYTES:
+            _, (_, evicted) = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted.content)
+        return entry
+
+    def _drop_entry(self, key: tuple[int, str]) -> None:
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            self._cached_bytes -= len(cached[1].content)
+
+    def _drop(self, user_id: int) -> None:
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for size in (ORIGINAL, *AVATAR_SIZES):
+            self._drop_entry((user_id, size))
+
+    def _generation(self, user_id: int) -> tuple[int, int]:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    async def _run(self, content: bytes, normalize: bool) -> Optional[dict[str, bytes]]:
+
+        if self._executor is None:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _render, content, normalize)
+
+    async def save(self, user_id: int, content: bytes) -> bool:
+        """
+        Store a new avatar and its variants. Returns False when the upload
+        is not an image Pillow can read. Without Pillow the bytes are kept
+        as they are and every size serves them.
+        """
+
+        try:
+            rendered = await self._run(content, True)
+        except Exception as e:
+            logger.info(f"Rejected avatar upload from user {user_id}: {e!r}")
+            return False
+        if rendered is None:
+            rendered = {ORIGINAL: content}
+        for size in AVATAR_SIZES:
+            if size not in rendered:
+                await storage.delete(avatar_key(user_id, size))
+        for size, encoded in rendered.items():
+            await storage.put(avatar_key(user_id, size), encoded)
+        await self.invalidate(user_id)
+        return True
+
+    async def delete(self, user_id: int) -> bool:
+
+        deleted = await storage.delete(avatar_key(user_id))
+        for size in AVATAR_SIZES:
+            await storage.delete(avatar_key(user_id, size))
+        await self.invalidate(user_id)
+        return deleted
+
+    async def _load(self, user_id: int, size: str) -> Optional[tuple[bytes, str]]:
+
+        content = await storage.get(avatar_key(user_id, size))
+        if content is not None:
+            return content, avatar_media_type(size)
+        if size == ORIGINAL:
+            return None
+        original = await storage.get(avatar_key(user_id))
+        if original is None:
+            return None
+        # Avatars uploaded before variants existed are resized on first use.
+        try:
+            rendered = await self._run(original, False)
+        except Exception as e:
+            logger.warning(f"Avatar variants for user {user_id} failed: {e!r}")
+            rendered = None
+        if rendered is None:
+            return original, avatar_media_type(ORIGINAL)
+        for name, encoded in rendered.items():
+            await storage.put(avatar_key(user_id, name), encoded)
+        return rendered[size], avatar_media_type(size)
+
+    async def get(self, user_id: int, size: str = ORIGINAL) -> Optional[AvatarEntry]:
+
+        cached = self._cache.get((user_id, size))
+        if cached is not None:
+            deadline, entry = cached
+            if deadline > time.monotonic():
+                self._cache.move_to_end((user_id, size))
+                AVATAR_LOOKUPS.labels("memory").inc()
+                return entry
+            self._drop_entry((user_id, size))
+        generation = self._generation(user_id)
+        loaded = await self._load(user_id, size)
+        if loaded is None:
+            return None
+        AVATAR_LOOKUPS.labels("storage").inc()
+        if self._generation(user_id) != generation:
+            # Replaced while loading: serve these bytes once, keep none.
+            return _entry(*loaded)
+        return self._store_local(user_id, size, *loaded)
+
+    async def invalidate(self, user_id: int) -> None:
+
+        self._drop(user_id)
+        try:
+            conn = await self._conn()
+            await conn.publish(INVALIDATION_CHANNEL, json.dumps({"id": user_id}))
+        except Exception as e:
+            logger.warning(f"Avatar invalidation not shared through Redis: {e}")
+            self._redis = None
+
+    def _on_message(self, data: dict) -> None:
+        self._drop(data["id"])
+
+    def _on_disconnect(self) -> None:
+        self._epoch += 1
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    def start(self) -> None:
+        if self._executor is None and Image is not None and settings.AVATAR_WORKERS > 0:
+            self._executor = ProcessPoolExecutor(max_workers=settings.AVATAR_WORKERS)
+        if self._task is None:
+            self._task = asyncio.create_task(
+                listen(INVALIDATION_CHANNEL, self._on_message, self._on_disconnect)
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+avatars = AvatarStore()
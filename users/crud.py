@@ -1,87 +1,91 @@
 import datetime
-import os
-import shutil
-from pathlib import Path
+from functools import (
+    partial,
+)
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
-from sqlalchemy.sql import (
-    text,
+from typing import (
+    Optional,
 )
 
 from app.auth.crud import (
-    find_existed_user,
+    find_password_hash,
+    revoke_session,
+)
+from app.auth.user_cache import (
+    user_cache,
+)
+from app.search.index import (
+    search_index,
+)
+from app.users import (
+    queries,
+)
+from app.users.avatars import (
+    avatars,
 )
 from app.users.models import (
     Users,
 )
+from app.users.public_keys import (
+    public_keys,
+)
 from app.users.schemas import (
     ResetPassword,
 )
+from app.utils import (
+    query_registry as db,
+)
 from app.utils.crypt_util import (
     get_password_hash,
     verify_password,
 )
-
-
-UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
-PROFILE_IMAGES_DIR = UPLOAD_DIR / "profile-images"
-
-
-PROFILE_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+from app.utils.dependencies import (
+    after_commit,
+)
+from app.utils.jwt_util import (
+    ACCESS_TOKEN,
+    decode_token,
+)
 
 
 async def deactivate_user(currentUser: Users, session: AsyncSession):
 
-    query = """
-        UPDATE
-          chat.users
-        SET
-          user_role = 'disabled',
-          modified_date = :modified_date
-        WHERE
-          email = :email
-    """
     values = {
         "email": currentUser.email,
         "modified_date": datetime.datetime.utcnow(),
     }
 
-    return await session.execute(text(query), values)
-
+    result = await db.execute(queries.DEACTIVATE_USER, values, session)
+    await after_commit(
+        session, partial(user_cache.invalidate, currentUser.id, currentUser.email)
+    )
+    await after_commit(session, partial(public_keys.invalidate, currentUser.id))
+    await delete_profile_image(currentUser.id)
+    await after_commit(session, partial(search_index.remove_user, currentUser.id))
+    return result
 
-async def set_black_list(token: str, session: AsyncSession):
 
-    query = """
-        UPDATE
-          chat.access_tokens
-        SET
-          token_status = 0,
-          modified_date = :modified_date
-        WHERE
-          token_status = 1
-          AND token = :token
-    """
-    values = {
-        "token": token,
-        "modified_date": datetime.datetime.utcnow(),
-    }
+async def logout_user(
+    token: str, currentUser: Users, all_devices: bool, session: AsyncSession
+):
 
-    return await session.execute(text(query), values)
+    if all_devices:
+        values = {
+            "user_id": currentUser.id,
+            "modified_date": datetime.datetime.utcnow(),
+        }
+        await db.execute(queries.BUMP_TOKEN_EPOCH, values, session)
+        await after_commit(
+            session, partial(user_cache.invalidate, currentUser.id, currentUser.email)
+        )
+    else:
+        await revoke_session(decode_token(token, ACCESS_TOKEN))
 
 
 async def update_user_info(currentUser: Users, session: AsyncSession):
 
-    query = """
-        UPDATE
-          chat.users
-        SET
-          nickname = :nickname,
-          phone_number = :phone_number,
-          modified_date = :modified_date
-        WHERE
-          email = :email
-    """
     values = {
         "nickname": currentUser.nickname,
         "phone_number": currentUser.phone_number,
@@ -89,7 +93,15 @@ async def update_user_info(currentUser: Users, session: AsyncSession):
         "modified_date": datetime.datetime.utcnow(),
     }
 
-    return await session.execute(text(query), values)
+    result = await db.execute(queries.UPDATE_USER_INFO, values, session)
+    await after_commit(
+        session, partial(user_cache.invalidate, currentUser.id, currentUser.email)
+    )
+    await after_commit(session, partial(public_keys.invalidate, currentUser.id))
+    await after_commit(
+        session, partial(search_index.index_user, currentUser.model_dump())
+    )
+    return result
 
 
 async def update_chat_status(
@@ -103,13 +115,13 @@ async def update_user_password(
     request: ResetPassword, currentUser: Users, session: AsyncSession
 ):
 
-    user = await find_existed_user(currentUser.email, session)
-    if not verify_password(request.old_password, user["password"]):
+    password = await find_password_hash(currentUser.id, session)
+    if not await verify_password(request.old_password, password):
         results = {
             "status_code": 400,
             "message": "Your old password is not correct!",
         }
-    elif verify_password(request.new_password, user["password"]):
+    elif await verify_password(request.new_password, password):
         results = {
             "status_code": 400,
             "message": "Your new password can't be your old one!",
@@ -120,21 +132,15 @@ async def update_user_password(
             "message": "Please confirm your new password!",
         }
     else:
-        query = """
-            UPDATE
-              chat.users
-            SET
-              password = :password,
-              modified_date = :modified_date
-            WHERE
-              email = :email
-        """
         values = {
-            "password": get_password_hash(request.new_password),
+            "password": await get_password_hash(request.new_password),
             "email": currentUser.email,
             "modified_date": datetime.datetime.utcnow(),
         }
-        await session.execute(text(query), values)
+        await db.execute(queries.UPDATE_USER_PASSWORD, values, session)
+        await after_commit(
+            session, partial(user_cache.invalidate, currentUser.id, currentUser.email)
+        )
         results = {
             "status_code": 200,
             "message": "Your password has been reset successfully!",
@@ -149,93 +155,67 @@ async def update_profile_picture(
     return None
 
 
-def save_profile_image(user_id: int, file_content: bytes) -> str:
+async def save_profile_image(user_id: int, file_content: bytes) -> Optional[str]:
 
-    user_dir = PROFILE_IMAGES_DIR / f"user/{user_id}"
-    user_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_path = user_dir / "profile.png"
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    
+    if not await avatars.save(user_id, file_content):
+        return None
     return f"user/{user_id}/profile.png"
 
 
-def get_profile_image_path(user_id: int) -> Path:
-
-    return PROFILE_IMAGES_DIR / f"user/{user_id}/profile.png"
-
+async def delete_profile_image(user_id: int) -> bool:
 
-def delete_profile_image(user_id: int) -> bool:
-
-    file_path = get_profile_image_path(user_id)
-    if file_path.exists():
-        file_path.unlink()
-        return True
-    return False
+    return await avatars.delete(user_id)
 
 
 async def update_public_key(
     user_id: int, public_key: str, session: AsyncSession
 ):
 
-    query = """
-        UPDATE
-          chat.users
-        SET
-          public_key = :public_key,
-          modified_date = :modified_date
-        WHERE
-          id = :user_id
-    """
     values = {
         "public_key": public_key,
         "user_id": user_id,
         "modified_date": datetime.datetime.utcnow(),
     }
-    await session.execute(text(query), values)
+    await db.execute(queries.UPDATE_PUBLIC_KEY, values, session)
+    await after_commit(session, partial(user_cache.invalidate, user_id))
+    await after_commit(session, partial(public_keys.invalidate, user_id))
     return {"status_code": 200, "message": "Public key updated successfully!"}
 
 
 async def get_public_key(user_id: int, session: AsyncSession) -> dict:
 
-    query = "SELECT id, nickname, public_key FROM chat.users WHERE id = :user_id"
-    values = {"user_id": user_id}
-    result = await session.execute(text(query), values)
-    user = result.fetchone()
-    
-    if user:
-        user_dict = user._asdict()
-        return {
-            "status_code": 200,
-            "user_id": user_dict["id"],
-            "nickname": user_dict["nickname"],
-            "public_key": user_dict.get("public_key")
-        }
-    return {"status_code": 404, "message": "User not found"}
+    entries = await public_keys.get_many([user_id], session)
+    entry = entries.get(user_id)
+    if entry is None:
+        return {"status_code": 404, "message": "User not found"}
+    return {
+        "status_code": 200,
+        "user_id": entry["id"],
+        "nickname": entry["nickname"],
+        "public_key": entry["public_key"],
+        "version": entry["version"],
+    }
 
 
 async def get_public_keys_batch(user_ids: list, session: AsyncSession) -> dict:
 
-    if not user_ids:
-        return {"status_code": 200, "keys": {}}
-    
-    placeholders = ", ".join([f":id_{i}" for i in range(len(user_ids))])
-    query = f"""
-        SELECT id, nickname, public_key 
-        FROM chat.users 
-        WHERE id IN ({placeholders})
-    """
-    values = {f"id_{i}": uid for i, uid in enumerate(user_ids)}
-    result = await session.execute(text(query), values)
-    users = result.fetchall()
-    
-    keys = {}
-    for user in users:
-        user_dict = user._asdict()
-        keys[str(user_dict["id"])] = {
-            "nickname": user_dict["nickname"],
-            "public_key": user_dict.get("public_key")
+    entries = await public_keys.get_many(user_ids, session)
+    keys = {
+        str(user_id): {
+            "nickname": entry["nickname"],
+            "public_key": entry["public_key"],
+            "version": entry["version"],
         }
-    
-    return {"status_code": 200, "keys": keys}
\ No newline at end of file
+        for user_id, entry in entries.items()
+    }
+    return {"status_code": 200, "keys": keys}
+
+
+async def get_public_key_changes(
+    since: Optional[datetime.datetime], after_id: int, session: AsyncSession
+) -> dict:
+
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    changes = await public_keys.changes(since, after_id, session)
+    return {"status_code": 200, **changes}
@@ -1,5 +1,6 @@
 from enum import Enum
 from sqlalchemy import (
+    Integer,
     String,
 )
 from sqlalchemy.orm import (
@@ -39,4 +40,5 @@ class Users(Base, CommonMixin, TimestampMixin):
     password: Mapped[str] = mapped_column(String(120), nullable=False)
     phone_number: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
     user_role: Mapped[str] = mapped_column(String(20), nullable=False, default="user")
-    public_key: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
\ No newline at end of file
+    public_key: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    token_epoch: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
\ No newline at end of file
@@ -0,0 +1,172 @@
+import datetime
+import json
+import logging
+from prometheus_client import (
+    Counter,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+from app.config import (
+    settings,
+)
+from app.users import (
+    queries,
+)
+from app.utils import (
+    query_registry as db,
+)
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_KEY_KEY = "public_keys:id:{}"
+
+PUBLIC_KEY_LOOKUPS = Counter(
+    "cychat_public_key_lookups_total",
+    "Public key directory lookups by the layer that answered them (redis or db).",
+    ["level"],
+)
+
+
+def _entry(row) -> dict[str, Any]:
+    """A directory entry; its version is the row's last modification."""
+
+    return {
+        "id": row.id,
+        "nickname": row.nickname,
+        "public_key": row.public_key,
+        "version": row.modified_date.isoformat(),
+    }
+
+
+class PublicKeyDirectory:
+    """
+    Users' public keys, shared through Redis so opening a chat or a room
+    usually costs one MGET instead of a query. Each entry's version is
+    the user row's modified_date, which also drives the changes feed
+    clients use to refresh only the keys that moved.
+    """
+
+    def __init__(self) -> None:
+        self._redis = None
+
+    async def _conn(self):
+        if self._redis is None:
+            self._redis = await settings.redis_conn()
+        return self._redis
+
+    async def _cached(self, user_ids: list[int]) -> dict[int, dict[str, Any]]:
+
+        try:
+            conn = await self._conn()
+            raw = await conn.mget(*(PUBLIC_KEY_KEY.format(i) for i in user_ids))
+        except Exception as e:
+            logger.warning(f"Public key read from Redis failed: {e}")
+            self._redis = None
+            return {}
+        return {
+            user_id: json.loads(value)
+            for user_id, value in zip(user_ids, raw)
+            if value is not None
+        }
+
+    async def _store(self, entries: Iterable[dict[str, Any]]) -> None:
+
+        try:
+            conn = await self._conn()
+            for entry in entries:
+                await conn.set(
+                    PUBLIC_KEY_KEY.format(entry["id"]),
+                    json.dumps(entry),
+                    ex=settings.PUBLIC_KEY_CACHE_TTL_SECONDS,
+                )
+        except Exception as e:
+            logger.warning(f"Public key write to Redis failed: {e}")
+            self._redis = None
+
+    async def get_many(
+        self, user_ids: Iterable[int], session: AsyncSession
+    ) -> dict[int, dict[str, Any]]:
+        """Entries for the users that exist, keyed by id."""
+
+        user_ids = list(dict.fromkeys(int(i) for i in user_ids))
+        if not user_ids:
+            return {}
+        entries = await self._cached(user_ids)
+        PUBLIC_KEY_LOOKUPS.labels("redis").inc(len(entries))
+        missing = [i for i in user_ids if i not in entries]
+        if missing:
+            values = {"user_ids": json.dumps(missing)}
+            rows = await db.fetch_all(queries.GET_PUBLIC_KEYS_BATCH, values, session)
+            loaded = [_entry(row) for row in rows]
+            PUBLIC_KEY_LOOKUPS.labels("db").inc(len(missing))
+            await self._store(loaded)
+            entries.update((entry["id"], entry) for entry in loaded)
+        return entries
+
+    async def changes(
+        self,
+        since: Optional[datetime.datetime],
+        after_id: int,
+        session: AsyncSession,
+    ) -> dict[str, Any]:
+        """
+        Entries modified after the (since, after_id) watermark, oldest
+        first, with the watermark to pass next time. Users sharing a
+        timestamp are ordered by id, so a page never repeats or skips one.
+        modified_date is stamped before the write commits, so the feed
+        stops PUBLIC_KEY_CHANGES_LAG_SECONDS short of now and a row that
+        commits late is still ahead of the watermark. Without a watermark
+        only the current one is returned, to start syncing from.
+        """
+
+        until = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=settings.PUBLIC_KEY_CHANGES_LAG_SECONDS
+        )
+        if since is None:
+            return {
+                "keys": [],
+                "since": until.isoformat(),
+                "after_id": 0,
+                "more": False,
+            }
+        values = {
+            "since": since,
+            "after_id": after_id,
+            "until": until,
+            "limit": settings.PUBLIC_KEY_CHANGES_LIMIT,
+        }
+        rows = await db.fetch_all(queries.GET_CHANGED_PUBLIC_KEYS, values, session)
+        entries = [_entry(row) for row in rows]
+        await self._store(entries)
+        if rows:
+            since, after_id = rows[-1].modified_date, rows[-1].id
+        return {
+            "keys": entries,
+            "since": since.isoformat(),
+            "after_id": after_id,
+            "more": len(rows) == settings.PUBLIC_KEY_CHANGES_LIMIT,
+        }
+
+    async def invalidate(self, user_id: int) -> None:
+
+        try:
+            conn = await self._conn()
+            await conn.delete(PUBLIC_KEY_KEY.format(user_id))
+        except Exception as e:
+            logger.warning(f"Public key invalidation through Redis failed: {e}")
+            self._redis = None
+
+    async def stop(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+public_keys = PublicKeyDirectory()
@@ -0,0 +1,140 @@
+from app.utils.query_registry import (
+    DATETIME,
+    ID,
+    INT,
+    STRING,
+    register,
+)
+
+
+DEACTIVATE_USER = register(
+    "users.deactivate_user",
+    """
+        UPDATE
+          chat.users
+        SET
+          user_role = 'disabled',
+          token_epoch = token_epoch + 1,
+          modified_date = :modified_date
+        WHERE
+          email = :email
+    """,
+    email=STRING,
+    modified_date=DATETIME,
+)
+
+BUMP_TOKEN_EPOCH = register(
+    "users.bump_token_epoch",
+    """
+        UPDATE
+          chat.users
+        SET
+          token_epoch = token_epoch + 1,
+          modified_date = :modified_date
+        WHERE
+          id = :user_id
+    """,
+    user_id=ID,
+    modified_date=DATETIME,
+)
+
+UPDATE_USER_INFO = register(
+    "users.update_user_info",
+    """
+        UPDATE
+          chat.users
+        SET
+          nickname = :nickname,
+          phone_number = :phone_number,
+          modified_date = :modified_date
+        WHERE
+          email = :email
+    """,
+    nickname=STRING,
+    phone_number=STRING,
+    email=STRING,
+    modified_date=DATETIME,
+)
+
+UPDATE_USER_PASSWORD = register(
+    "users.update_user_password",
+    """
+        UPDATE
+          chat.users
+        SET
+          password = :password,
+          token_epoch = token_epoch + 1,
+          modified_date = :modified_date
+        WHERE
+          email = :email
+    """,
+    password=STRING,
+    email=STRING,
+    modified_date=DATETIME,
+)
+
+UPDATE_PUBLIC_KEY = register(
+    "users.update_public_key",
+    """
+        UPDATE
+          chat.users
+        SET
+          public_key = :public_key,
+          modified_date = :modified_date
+        WHERE
+          id = :user_id
+    """,
+    public_key=STRING,
+    user_id=ID,
+    modified_date=DATETIME,
+)
+
+GET_PUBLIC_KEYS_BATCH = register(
+    "users.get_public_keys_batch",
+    """
+        SELECT u.id, u.nickname, u.public_key, u.modified_date
+        FROM OPENJSON(:user_ids) WITH (id BIGINT '$') j
+        JOIN chat.users u ON u.id = j.id
+    """,
+    user_ids=STRING,
+)
+
+# Keys changed after a (modified_date, id) watermark and before :until,
+# oldest first, for clients syncing their own copy of the directory.
+GET_CHANGED_PUBLIC_KEYS = register(
+    "users.get_changed_public_keys",
+    """
+        SELECT TOP (:limit) id, nickname, public_key, modified_date
+        FROM chat.users
+        WHERE
+          (
+            modified_date > :since
+            OR (modified_date = :since AND id > :after_id)
+          )
+          AND modified_date < :until
+        ORDER BY modified_date, id
+    """,
+    since=DATETIME,
+    after_id=ID,
+    until=DATETIME,
+    limit=INT,
+)
+
+# Which of a JSON array of user ids no longer belong to an active account.
+FIND_INACTIVE_USER_IDS = register(
+    "users.find_inactive_user_ids",
+    """
+        SELECT
+          j.id
+        FROM
+          OPENJSON(:user_ids) WITH (id BIGINT '$') j
+        LEFT JOIN
+          chat.users u
+        ON
+          u.id = j.id
+        WHERE
+          u.id IS NULL
+          OR u.user_role = 'disabled'
+    """,
+    user_ids=STRING,
+)
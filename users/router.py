@@ -1,21 +1,25 @@
-import os
+import datetime
 from fastapi import (
     APIRouter,
     Depends,
     File,
     HTTPException,
+    Query,
+    Request,
     UploadFile,
 )
 from fastapi.encoders import (
     jsonable_encoder,
 )
 from fastapi.responses import (
-    FileResponse,
+    Response,
 )
-from pathlib import Path
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
+from typing import (
+    Optional,
+)
 
 from app.auth.schemas import (
     UserSchema,
@@ -23,6 +27,12 @@ from app.auth.schemas import (
 from app.users import (
     crud as user_crud,
 )
+from app.users.avatars import (
+    AVATAR_PATTERN,
+    MAX_AVATAR_BYTES,
+    ORIGINAL,
+    avatars,
+)
 from app.users.models import (
     Users,
 )
@@ -37,14 +47,13 @@ from app.utils import (
     jwt_util,
 )
 from app.utils.dependencies import (
-    get_db_autocommit_session,
-    get_db_transactional_session,
+    get_db_session,
+)
+from app.utils.file_responses import (
+    send_bytes,
 )
 
 
-UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads"))
-PROFILE_IMAGES_DIR = UPLOAD_DIR / "profile-images"
-
 router = APIRouter(prefix="/api/v1")
 
 
@@ -71,7 +80,7 @@ async def get_user_profile(
 async def update_personal_information(
     personal_info: PersonalInfo,
     currentUser: UserObjectSchema = Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
     currentUser = UserObjectSchema(**jsonable_encoder(currentUser))
     currentUser.nickname = personal_info.nickname
@@ -85,12 +94,13 @@ async def update_personal_information(
 
 @router.get("/user/logout")
 async def logout(
+    all_devices: bool = Query(False),
     token: str = Depends(jwt_util.get_token_user),
     currentUser: Users = Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
-    await user_crud.set_black_list(token, session)
+    await user_crud.logout_user(token, currentUser, all_devices, session)
     return {"status": 200, "message": "Good Bye!"}
 
 
@@ -98,7 +108,7 @@ async def logout(
 async def update_user_status(
     request: UpdateStatus,
     currentUser=Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     await user_crud.update_chat_status(
@@ -114,7 +124,7 @@ async def update_user_status(
 async def reset_user_password(
     request: ResetPassword,
     currentUser=Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     result = await user_crud.update_user_password(
@@ -123,18 +133,27 @@ async def reset_user_password(
     return result
 
 
+async def avatar_response(
+    request: Request, user_id: int, size: Optional[str]
+) -> Response:
+
+    avatar = await avatars.get(user_id, size or ORIGINAL)
+    if avatar is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return send_bytes(request, avatar.content, avatar.media_type, avatar.version)
+
+
 @router.get("/user/profile-image/{name}")
-async def get_profile_image(name: str):
+async def get_profile_image(
+    request: Request,
+    name: str,
+    size: Optional[str] = Query(None, pattern=AVATAR_PATTERN),
+):
 
     try:
-        file_path = PROFILE_IMAGES_DIR / f"user/{name}/profile.png"
-        if not file_path.exists():
+        if not name.isdigit():
             raise HTTPException(status_code=404, detail="Image not found")
-        return FileResponse(
-            path=str(file_path),
-            media_type="image/png",
-            filename="profile.png"
-        )
+        return await avatar_response(request, int(name), size)
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
@@ -145,16 +164,18 @@ async def get_profile_image(name: str):
 async def upload_profile_image(
     file: UploadFile = File(...),
     currentUser: UserObjectSchema = Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     try:
 
-        file_content = await file.read()
-        
-  
-        file_name = user_crud.save_profile_image(currentUser.id, file_content)
-        
+        file_content = await file.read(MAX_AVATAR_BYTES + 1)
+        if len(file_content) > MAX_AVATAR_BYTES:
+            return {"status_code": 413, "message": "Image is too large!"}
+
+        file_name = await user_crud.save_profile_image(currentUser.id, file_content)
+        if file_name is None:
+            return {"status_code": 400, "message": "The file is not a supported image!"}
 
         await user_crud.update_profile_picture(
             email=currentUser.email, file_name=file_name, session=session
@@ -169,17 +190,14 @@ async def upload_profile_image(
 
 
 @router.get("/profile/user/{user_id}/profile.png")
-async def get_profile_user_image(user_id: int):
+async def get_profile_user_image(
+    request: Request,
+    user_id: int,
+    size: Optional[str] = Query(None, pattern=AVATAR_PATTERN),
+):
 
     try:
-        file_path = user_crud.get_profile_image_path(user_id)
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="Image not found")
-        return FileResponse(
-            path=str(file_path),
-            media_type="image/png",
-            filename="profile.png"
-        )
+        return await avatar_response(request, user_id, size)
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
@@ -192,7 +210,7 @@ async def get_profile_user_image(user_id: int):
 async def update_public_key(
     request: UpdatePublicKey,
     currentUser: UserObjectSchema = Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     result = await user_crud.update_public_key(
@@ -204,7 +222,7 @@ async def update_public_key(
 @router.get("/user/public-key")
 async def get_my_public_key(
     currentUser: UserObjectSchema = Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     result = await user_crud.get_public_key(currentUser.id, session)
@@ -215,7 +233,7 @@ async def get_my_public_key(
 async def get_user_public_key(
     user_id: int,
     currentUser: UserObjectSchema = Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     result = await user_crud.get_public_key(user_id, session)
@@ -226,8 +244,20 @@ async def get_user_public_key(
 async def get_users_public_keys(
     user_ids: list[int],
     currentUser: UserObjectSchema = Depends(jwt_util.get_current_active_user),
-    session: AsyncSession = Depends(get_db_autocommit_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
 
     result = await user_crud.get_public_keys_batch(user_ids, session)
-    return result
\ No newline at end of file
+    return result
+
+
+@router.get("/users/public-keys/changes")
+async def get_public_key_changes(
+    since: Optional[datetime.datetime] = None,
+    after_id: int = Query(0, ge=0),
+    currentUser: UserObjectSchema = Depends(jwt_util.get_current_active_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+
+    result = await user_crud.get_public_key_changes(since, after_id, session)
+    return result
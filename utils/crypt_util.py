@@ -1,13 +1,68 @@
+import asyncio
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
 from passlib.context import (
     CryptContext,
 )
+from prometheus_client import (
+    Gauge,
+    Histogram,
+)
+
+from app.config import (
+    settings,
+)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so a few threads are enough to keep password
+# work off the event loop while capping how many cores a login storm uses.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+
+PASSWORD_QUEUE_TIME = Histogram(
+    "cychat_password_hash_queue_seconds",
+    "Time password work waited for a free hashing thread.",
+    ["operation"],
+)
+PASSWORD_WORK_TIME = Histogram(
+    "cychat_password_hash_duration_seconds",
+    "Time spent hashing or verifying a password.",
+    ["operation"],
+)
+PASSWORD_IN_FLIGHT = Gauge(
+    "cychat_password_hash_in_flight",
+    "Password operations queued or running.",
+)
+
+
+def _timed(operation: str, submitted: float, fn, *args):
+    started = time.perf_counter()
+    PASSWORD_QUEUE_TIME.labels(operation).observe(started - submitted)
+    try:
+        return fn(*args)
+    finally:
+        PASSWORD_WORK_TIME.labels(operation).observe(time.perf_counter() - started)
+
+
+async def _run(operation: str, fn, *args):
+    loop = asyncio.get_running_loop()
+    PASSWORD_IN_FLIGHT.inc()
+    try:
+        return await loop.run_in_executor(
+            _executor, _timed, operation, time.perf_counter(), fn, *args
+        )
+    finally:
+        PASSWORD_IN_FLIGHT.dec()
+
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await _run("verify", pwd_context.verify, plain_password, hashed_password)
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await _run("hash", pwd_context.hash, password)
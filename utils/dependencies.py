@@ -1,45 +1,110 @@
+import inspect
+import logging
+from prometheus_client import (
+    Histogram,
+)
 from sqlalchemy import (
+    event,
     exc,
 )
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
+from sqlalchemy.orm import (
+    Session,
+)
 from starlette.requests import (
     Request,
 )
 from typing import (
     AsyncGenerator,
+    Awaitable,
+    Callable,
+    Optional,
 )
 
+logger = logging.getLogger(__name__)
 
-async def get_db_transactional_session(
-    request: Request,
-) -> AsyncGenerator[AsyncSession, None]:
-    session: AsyncSession = (
-        request.app.state.db_transactional_session_factory()
-    )
+AFTER_COMMIT = "after_commit"
 
-    try: 
-        yield session
-    except exc.DBAPIError:
-        await session.rollback()
+SESSION_CONNECTIONS = Histogram(
+    "cychat_db_connections_per_request",
+    "Pooled connections a request's session checked out.",
+    ["session"],
+    buckets=(0, 1, 2, 3, 5),
+)
+
+
+@event.listens_for(Session, "after_begin")
+def _count_connection(session, transaction, connection) -> None:
+    session.info["connections"] = session.info.get("connections", 0) + 1
+
+
+async def _call(callback: Callable[[], Optional[Awaitable[None]]]) -> None:
+
+    result = callback()
+    if inspect.isawaitable(result):
+        await result
+
+
+async def after_commit(
+    session: AsyncSession, callback: Callable[[], Optional[Awaitable[None]]]
+) -> None:
+    """
+    Run callback once the session's writes are committed, so a cache is
+    never cleared while the old row is still the committed one (a reader
+    in between would cache it again). Sessions outside a request commit
+    every statement, so the callback runs straight away. Plain functions
+    and coroutine functions are both accepted.
+    """
+
+    callbacks = session.info.get(AFTER_COMMIT)
+    if callbacks is None:
+        await _call(callback)
+    else:
+        callbacks.append(callback)
+
+
+async def close_request_session(session: AsyncSession, kind: str) -> None:
+
+    callbacks = session.info.pop(AFTER_COMMIT, None) or ()
+    try:
+        if session.info.get("writes"):
+            await session.commit()
     finally:
-        await session.commit()
+        SESSION_CONNECTIONS.labels(kind).observe(
+            session.info.get("connections", 0)
+        )
         await session.close()
+    for callback in callbacks:
+        try:
+            await _call(callback)
+        except Exception as e:
+            logger.warning(f"After-commit callback failed: {e}")
 
 
-async def get_db_autocommit_session(
+async def get_db_session(
     request: Request,
 ) -> AsyncGenerator[AsyncSession, None]:
+    """
+    The request's unit of work, shared by authentication and the handler
+    (FastAPI resolves a dependency once per request). A connection is only
+    checked out on the first query, and the transaction is committed only
+    if a write statement ran; read-only requests just release it.
+    """
 
-    session: AsyncSession = request.app.state.db_autocommit_session_factory()
+    session: AsyncSession = (
+        request.app.state.db_transactional_session_factory.session_factory()
+    )
+    session.info[AFTER_COMMIT] = []
 
-    try:  
+    try:
         yield session
-    except exc.DBAPIError:
+    except Exception:
         await session.rollback()
-    finally:
         await session.close()
+        raise
+    await close_request_session(session, "primary")
 
 
 async def get_db_autocommit_session_socket() -> AsyncGenerator[
@@ -23,6 +23,7 @@ logger = logging.getLogger(__name__)
 
 _db_autocommit_session_factory = None
 _db_transactional_session_factory = None
+_db_read_session_factory = None
 
 
 def get_autocommit_session_factory():
@@ -34,6 +35,11 @@ def get_transactional_session_factory():
     return _db_transactional_session_factory
 
 
+def get_read_session_factory():
+
+    return _db_read_session_factory or _db_autocommit_session_factory
+
+
 async def init_engine_app(app: FastAPI) -> None:  # pragma: no cover
 
     from sqlalchemy import (
@@ -41,11 +47,12 @@ async def init_engine_app(app: FastAPI) -> None:  # pragma: no cover
     )
 
 
-    from app.auth.models import (  
-        AccessTokens,
-    )
     from app.chats.models import ( 
+        MediaBlobs,
+        MessageTombstones,
         Messages,
+        MessagesArchive,
+        ReadMarkers,
     )
     from app.contacts.models import (  
         Contacts,
@@ -100,7 +107,7 @@ async def init_engine_app(app: FastAPI) -> None:  # pragma: no cover
             logger.warning(f"Schema check failed: {e}")
 
 
-        tables_to_check = ['users', 'access_tokens', 'contacts', 'rooms', 'room_members', 'messages']
+        tables_to_check = ['users', 'contacts', 'rooms', 'room_members', 'messages', 'messages_archive', 'read_markers', 'message_tombstones', 'media_blobs']
         for table in tables_to_check:
             try:
                 result = await conn.execute(
@@ -136,12 +143,38 @@ async def init_engine_app(app: FastAPI) -> None:  # pragma: no cover
         scopefunc=current_task,
     )
 
+    read_session_factory = autocommit_session_factory
+    read_engine = None
+    if settings.db_read_url:
+        logger.info(f"Read replica: {settings.db_read_url.split('@')[0]}@***")
+        read_engine = create_async_engine(
+            settings.db_read_url,
+            pool_pre_ping=True,
+            pool_size=30,
+            max_overflow=30,
+            future=True,
+            pool_recycle=3600,
+            isolation_level="AUTOCOMMIT",
+        )
+        read_session_factory = async_scoped_session(
+            sessionmaker(
+                read_engine,
+                expire_on_commit=False,
+                class_=AsyncSession,
+            ),
+            scopefunc=current_task,
+        )
+
     app.state.db_engine = engine
+    app.state.db_read_engine = read_engine
     app.state.db_transactional_session_factory = transactional_session_factory
     app.state.db_autocommit_session_factory = autocommit_session_factory
+    app.state.db_read_session_factory = read_session_factory
     
     global _db_autocommit_session_factory, _db_transactional_session_factory
+    global _db_read_session_factory
     _db_autocommit_session_factory = autocommit_session_factory
     _db_transactional_session_factory = transactional_session_factory
+    _db_read_session_factory = read_session_factory
     
     logger.info("Database engine initialized successfully")
\ No newline at end of file
@@ -0,0 +1,215 @@
+import re
+import uuid
+from fastapi.responses import (
+    FileResponse,
+    Response,
+    StreamingResponse,
+)
+from pathlib import Path
+from prometheus_client import (
+    Counter,
+)
+from starlette.requests import (
+    Request,
+)
+from starlette.types import (
+    Receive,
+    Scope,
+    Send,
+)
+from typing import (
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+from app.utils.storage import (
+    StorageKeyError,
+    storage,
+)
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+FILE_RESPONSES = Counter(
+    "cychat_file_responses_total",
+    "Files served by response status (200 full, 206 range, 304 not modified).",
+    ["status"],
+)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class _WholeFileResponse(FileResponse):
+    """
+    A FileResponse that never answers a range itself: send_file has already
+    decided the whole file is sent, even for ranges it ignores.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        scope = dict(scope)
+        scope["headers"] = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"range", b"if-range")
+        ]
+        await super().__call__(scope, receive, send)
+
+
+def is_uuid_name(name: str) -> bool:
+
+    try:
+        uuid.UUID(Path(name).stem)
+    except ValueError:
+        return False
+    return True
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def byte_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    The inclusive (start, end) of a single `bytes=` range, or None when the
+    whole file should be sent (no range, an invalid one, or several ranges,
+    which are answered with the full body rather than multipart).
+    """
+
+    match = BYTE_RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            # An invalid range is ignored rather than refused.
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+class _Plan(NamedTuple):
+    status_code: int
+    start: int
+    end: int
+    headers: dict[str, str]
+
+
+def _plan(
+    request: Request, etag: str, size: int, immutable: bool
+) -> Union[Response, _Plan]:
+    """
+    Apply the cache headers and conditional/range request headers shared by
+    every file route. Returns a finished 304 or 416 response, or the status
+    and byte span the body should be sent with.
+    """
+
+    etag = f'"{etag}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        FILE_RESPONSES.labels("304").inc()
+        return Response(status_code=304, headers=headers)
+
+    start, end = 0, size - 1
+    status_code = 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            requested = byte_range(range_header, size)
+        except RangeNotSatisfiable:
+            FILE_RESPONSES.labels("416").inc()
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if requested is not None:
+            start, end = requested
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    FILE_RESPONSES.labels(str(status_code)).inc()
+    return _Plan(status_code, start, end, headers)
+
+
+async def send_file(
+    request: Request,
+    key: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    etag: Optional[str] = None,
+    immutable: bool = False,
+) -> Optional[Response]:
+    """
+    Serve a stored file with an ETag, a Cache-Control policy, 304s for
+    matching If-None-Match and single byte ranges so media can seek.
+    Content that never changes under its name (hashes, UUIDs) is cached
+    for a year; anything else is revalidated. Returns None if the file
+    does not exist.
+    """
+
+    try:
+        stored = await storage.stat(key)
+    except StorageKeyError:
+        return None
+    if stored is None:
+        return None
+    plan = _plan(request, etag or stored.etag, stored.size, immutable)
+    if isinstance(plan, Response):
+        return plan
+    status_code, start, end, headers = plan
+
+    path = storage.local_path(key)
+    if status_code == 200 and path is not None:
+        return _WholeFileResponse(
+            path=str(path),
+            media_type=media_type,
+            filename=filename,
+            headers=headers,
+        )
+    headers["Content-Length"] = str(end - start + 1)
+    if filename is not None and status_code == 200:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(
+        storage.stream(key, start, end) if stored.size else iter(()),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+def send_bytes(
+    request: Request,
+    content: bytes,
+    media_type: str,
+    etag: str,
+    immutable: bool = False,
+) -> Response:
+    """send_file for content already held in memory."""
+
+    plan = _plan(request, etag, len(content), immutable)
+    if isinstance(plan, Response):
+        return plan
+    return Response(
+        content[plan.start:plan.end + 1],
+        status_code=plan.status_code,
+        media_type=media_type,
+        headers=plan.headers,
+    )
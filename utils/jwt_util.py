@@ -1,3 +1,4 @@
+import uuid
 from datetime import (
     datetime,
     timedelta,
@@ -12,65 +13,102 @@ from fastapi.security import (
 )
 from jose import jwt
 from jose.exceptions import JWTError
-from pydantic import (
-    ValidationError,
-)
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
 )
+from typing import (
+    Any,
+    Optional,
+)
 
 from app.auth import (
     crud,
-)
-from app.auth.schemas import (
-    TokenData,
+    revocation,
 )
 from app.users.schemas import (
     UserObjectSchema,
 )
 from app.utils.constants import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
     JWT_ALGORITHM,
     JWT_SECRET_KEY,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
 )
 from app.utils.dependencies import (
-    get_db_transactional_session,
+    get_db_session,
 )
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/v1/auth/login", scheme_name="JWT"
 )
 
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+TOKEN_CLAIMS = ("sub", "uid", "ep", "sid", "jti", "exp")
+
 
 def get_token_user(token: str = Depends(oauth2_scheme)) -> str:
     return token
 
 
-async def create_access_token(
-    *, data: dict, expires_delta: timedelta = None
-) -> dict[str, str]:
-    try:
-        payload = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=60)
-        payload.update({"exp": expire})
-        encoded_jwt_token = jwt.encode(
-            payload,
-            JWT_SECRET_KEY,
-            algorithm=JWT_ALGORITHM,
-        )
-        return {"access_token": encoded_jwt_token, "token_type": "bearer"}
-    except Exception:
-        return {
-            "message": "An error has occurred while generating an access"
-            " token!"
+def _encode_token(
+    claims: dict[str, Any], token_type: str, expires_delta: timedelta
+) -> str:
+    payload = claims.copy()
+    payload.update(
+        {
+            "typ": token_type,
+            "jti": uuid.uuid4().hex,
+            "exp": datetime.utcnow() + expires_delta,
         }
+    )
+    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def issue_tokens(
+    user: dict[str, Any], session_id: Optional[str] = None
+) -> dict[str, Any]:
+    """
+    Sign a short-lived access token and a refresh token for one login
+    session. Both carry the session id and the user's token epoch, so
+    either can be revoked without a database lookup.
+    """
+
+    claims = {
+        "sub": user["email"],
+        "uid": user["id"],
+        "ep": user.get("token_epoch") or 0,
+        "sid": session_id or uuid.uuid4().hex,
+    }
+    return {
+        "access_token": _encode_token(
+            claims, ACCESS_TOKEN, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "refresh_token": _encode_token(
+            claims, REFRESH_TOKEN, timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
+        ),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def decode_token(token: str, token_type: str) -> dict[str, Any]:
+
+    payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    if payload.get("typ") != token_type:
+        raise JWTError("Unexpected token type")
+    if any(payload.get(claim) is None for claim in TOKEN_CLAIMS):
+        raise JWTError("Missing token claims")
+    return payload
+
+
+def epoch_matches(payload: dict[str, Any], user: dict[str, Any]) -> bool:
+    return payload["ep"] == (user.get("token_epoch") or 0)
 
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    session: AsyncSession = Depends(get_db_transactional_session),
+    session: AsyncSession = Depends(get_db_session),
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -78,23 +116,14 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    black_list = await crud.get_users_with_black_listed_token(token, session)
-    if black_list:
-        raise credentials_exception
     try:
-        payload = jwt.decode(
-            token,
-            JWT_SECRET_KEY,
-            algorithms=[JWT_ALGORITHM],
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(email=username)
-    except (JWTError, ValidationError):
+        payload = decode_token(token, ACCESS_TOKEN)
+    except JWTError:
+        raise credentials_exception
+    if await revocation.revoked_tokens.is_revoked(payload["sid"]):
         raise credentials_exception
-    user_dict = await crud.find_existed_user(token_data.email, session)
-    if user_dict is None:
+    user_dict = await crud.find_existed_user_id(payload["uid"], session)
+    if user_dict is None or not epoch_matches(payload, user_dict):
         raise credentials_exception
 
     return UserObjectSchema(**user_dict)
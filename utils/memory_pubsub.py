@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Optional,
+)
+
+# Shared by every InMemoryRedis in the process, like a single Redis server.
+_channels: dict[str, set["InMemoryPubSub"]] = {}
+_values: dict[str, tuple[Any, Optional[float]]] = {}
+
+
+class InMemoryPubSub:
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._topics: set[str] = set()
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            _channels.setdefault(channel, set()).add(self)
+            self._topics.add(channel)
+            self._queue.put_nowait(
+                {"type": "subscribe", "channel": channel, "data": len(self._topics)}
+            )
+
+    async def unsubscribe(self, *channels: str) -> None:
+        for channel in channels or tuple(self._topics):
+            _channels.get(channel, set()).discard(self)
+            self._topics.discard(channel)
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: float = 0.0
+    ) -> Optional[dict[str, Any]]:
+
+        try:
+            message = await asyncio.wait_for(self._queue.get(), max(timeout, 0.01))
+        except asyncio.TimeoutError:
+            return None
+        if ignore_subscribe_messages and message["type"] != "message":
+            return None
+        return message
+
+    async def listen(self) -> AsyncIterator[dict[str, Any]]:
+        while self._topics:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        await self.unsubscribe()
+
+    aclose = close
+
+
+class InMemoryRedis:
+    """
+    Process-local stand-in for the parts of redis.asyncio the app uses,
+    for development without a Redis server. Nothing crosses processes.
+    """
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self) -> None:
+        return None
+
+    aclose = close
+
+    def pubsub(self) -> InMemoryPubSub:
+        return InMemoryPubSub()
+
+    async def publish(self, channel: str, message: Any) -> int:
+        subscribers = _channels.get(channel, set())
+        for subscriber in subscribers:
+            subscriber._queue.put_nowait(
+                {"type": "message", "channel": channel, "data": message}
+            )
+        return len(subscribers)
+
+    def _get(self, key: str) -> Any:
+        item = _values.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            _values.pop(key, None)
+            return None
+        return value
+
+    async def get(self, key: str) -> Any:
+        return self._get(key)
+
+    async def mget(self, *keys: str) -> list[Any]:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        expires = time.monotonic() + ex if ex else None
+        _values[key] = (str(value), expires)
+        return True
+
+    async def exists(self, *keys: str) -> int:
+        return sum(self._get(key) is not None for key in keys)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(_values.pop(key, None) is not None for key in keys)
+
+    async def ttl(self, key: str) -> int:
+
+        if self._get(key) is None:
+            return -2
+        expires = _values[key][1]
+        if expires is None:
+            return -1
+        return max(int(expires - time.monotonic()), 1)
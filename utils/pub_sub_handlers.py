@@ -20,22 +20,28 @@ from typing import (
     Optional,
 )
 
-from app.auth.crud import (
-    find_existed_user_id,
-)
 from app.chats.crud import (
+    clamp_read_marker,
     send_new_message,
 )
+from app.chats.uploads import (
+    is_uploaded_media,
+)
 from app.rooms.crud import (
     ban_user_from_room,
-    find_admin_in_room,
-    find_existed_room,
     send_new_room_message,
     unban_user_from_room,
 )
 from app.users.crud import (
     update_chat_status,
 )
+from app.utils.read_receipts import (
+    read_markers,
+    read_receipt_event,
+)
+from app.utils.socket_auth import (
+    SocketContext,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -83,18 +89,15 @@ def user_to_dict(user) -> dict:
 
 async def consumer_handler(
     connection,  
-    topic: str,
     web_socket: WebSocket,
-    sender_id: int,
-    receiver_id: Optional[int],
+    context: SocketContext,
     session: AsyncSession,
 ) -> None:
+    topic = context.topic
+    sender_id = context.user["id"]
+    receiver_id = context.receiver_id
     try:
-        user = await find_existed_user_id(sender_id, session)
-        room = None
-        admin = None
-        
-
+        user = context.user
         display_name = get_user_display_name(user)
         user_dict = user_to_dict(user)
         
@@ -105,8 +108,6 @@ async def consumer_handler(
                 "user": user_dict,
             }
         else:
-            room = await find_existed_room(topic, session)
-            admin = await find_admin_in_room(sender_id, room.id, session)
             data = {
                 "content": f"{display_name} is online!",
                 "room_name": topic,
@@ -121,8 +122,6 @@ async def consumer_handler(
                 data = await web_socket.receive_text()
                 message_data = json.loads(data)
                 message_data["user"] = user_dict
-                if room and not admin:
-                    message_data["user"]["admin"] = 1
                 if message_data.get("type", None) == "leave":
                     logger.warning(message_data)
                     logger.info("Disconnecting from Websocket")
@@ -137,6 +136,45 @@ async def consumer_handler(
                     )
                     await web_socket.close()
                     break
+                elif (
+                    message_data.get("type", None) in ("media", "file")
+                    and message_data.get("media")
+                ):
+                    # Uploaded through POST /chat/files already; only the
+                    # URL travels over the socket.
+                    if not is_uploaded_media(message_data["media"]):
+                        continue
+                    message_data.pop("content", None)
+                    if receiver_id:
+                        request = RequestContactObject(
+                            context.receiver_email,
+                            "",
+                            message_data["type"],
+                            message_data["media"],
+                            message_data.get("filename", ""),
+                        )
+                        result = await send_new_message(
+                            sender_id, request, None, None, session
+                        )
+                    else:
+                        request = RequestRoomObject(
+                            topic,
+                            "",
+                            message_data["type"],
+                            message_data["media"],
+                            message_data.get("filename", ""),
+                        )
+                        result = await send_new_room_message(
+                            sender_id, request, None, session
+                        )
+                    if result.get("status_code", 201) >= 400:
+                        logger.error(f"Failed to send file message: {result}")
+                        continue
+                    message_data["content"] = ""
+                    await connection.publish(
+                        topic, json.dumps(message_data, default=str)
+                    )
+                    del request
                 elif message_data.get("type", None) in ("media", "file"):
                     data = message_data.pop("content")
                     original_filename = message_data.get("filename", "")
@@ -148,11 +186,8 @@ async def consumer_handler(
                         continue
                     
                     if receiver_id:
-                        receiver = await find_existed_user_id(
-                            receiver_id, session
-                        )
                         request = RequestContactObject(
-                            receiver["email"],
+                            context.receiver_email,
                             "",
                             message_data["type"],
                             "",
@@ -210,6 +245,30 @@ async def consumer_handler(
                         topic, json.dumps(message_data, default=str)
                     )
                     del request
+                elif message_data.get("type", None) == "read":
+                    try:
+                        message_id = int(message_data.get("message_id") or 0)
+                    except (TypeError, ValueError):
+                        continue
+                    message_id = await clamp_read_marker(
+                        sender_id,
+                        receiver_id,
+                        context.room_id,
+                        message_id,
+                        session,
+                    )
+                    if message_id <= 0:
+                        continue
+                    advanced = read_markers.advance(
+                        sender_id,
+                        receiver_id,
+                        context.room_id,
+                        message_id,
+                    )
+                    if advanced:
+                        await connection.publish(
+                            topic, read_receipt_event(sender_id, message_id)
+                        )
                 elif message_data.get("type", None) == "ban":
                     ensure_future(
                         ban_user_from_room(
@@ -242,11 +301,8 @@ async def consumer_handler(
                         topic, json.dumps(message_data, default=str)
                     )
                     if receiver_id:
-                        receiver = await find_existed_user_id(
-                            receiver_id, session
-                        )
                         request = RequestContactObject(
-                            receiver["email"],
+                            context.receiver_email,
                             message_data["content"],
                             message_data["type"],
                             "",
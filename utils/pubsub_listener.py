@@ -0,0 +1,49 @@
+import asyncio
+import json
+import logging
+from typing import (
+    Any,
+    Callable,
+)
+
+from app.config import (
+    settings,
+)
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 5
+
+
+async def listen(
+    channel: str,
+    on_message: Callable[[dict[str, Any]], None],
+    on_disconnect: Callable[[], None],
+) -> None:
+    """
+    Feed every JSON message published on a Redis channel to on_message,
+    reconnecting forever. on_disconnect runs whenever the subscription is
+    lost, since anything published in the meantime is never delivered.
+    """
+
+    while True:
+        conn = None
+        pubsub = None
+        try:
+            conn = await settings.redis_conn()
+            pubsub = conn.pubsub()
+            await pubsub.subscribe(channel)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    on_message(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Listener on {channel} failed: {e}")
+        finally:
+            on_disconnect()
+            if pubsub is not None:
+                await pubsub.close()
+            if conn is not None:
+                await conn.close()
+        await asyncio.sleep(RETRY_SECONDS)
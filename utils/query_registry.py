@@ -0,0 +1,183 @@
+import re
+import time
+from prometheus_client import (
+    Counter,
+    Histogram,
+)
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Integer,
+    String,
+    bindparam,
+)
+from sqlalchemy.engine import (
+    Result,
+    Row,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from sqlalchemy.sql import (
+    text,
+)
+from sqlalchemy.sql.elements import (
+    TextClause,
+)
+from typing import (
+    Any,
+    AsyncIterator,
+    Optional,
+)
+
+ID = BigInteger()
+INT = Integer()
+STRING = String()
+DATETIME = DateTime()
+
+WRITE_STATEMENT = re.compile(
+    r"^\s*(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE | re.MULTILINE
+)
+
+QUERY_LATENCY = Histogram(
+    "cychat_db_query_duration_seconds",
+    "Time spent executing a named database query.",
+    ["query"],
+    buckets=(
+        0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    ),
+)
+QUERY_ROWS = Counter(
+    "cychat_db_query_rows_total",
+    "Rows returned or affected by a named database query.",
+    ["query"],
+)
+QUERY_ERRORS = Counter(
+    "cychat_db_query_errors_total",
+    "Named database queries that raised an error.",
+    ["query"],
+)
+
+
+class NamedQuery:
+
+    __slots__ = ("name", "statement", "writes")
+
+    def __init__(self, name: str, statement: TextClause, writes: bool) -> None:
+        self.name = name
+        self.statement = statement
+        self.writes = writes
+
+    def __repr__(self) -> str:
+        return f"NamedQuery({self.name!r})"
+
+
+QUERIES: dict[str, NamedQuery] = {}
+
+
+def register(name: str, sql: str, **types: Any) -> NamedQuery:
+    """
+    Declare a statement once under a unique name. Every bind parameter
+    must be given a type so the driver sends it with the column's type.
+    """
+
+    if name in QUERIES:
+        raise ValueError(f"Query {name!r} is already registered.")
+    statement = text(sql).bindparams(
+        *(bindparam(key, type_=type_) for key, type_ in types.items())
+    )
+    query = NamedQuery(name, statement, WRITE_STATEMENT.search(sql) is not None)
+    QUERIES[name] = query
+    return query
+
+
+async def execute(
+    query: NamedQuery,
+    values: Optional[dict[str, Any]],
+    session: AsyncSession,
+) -> Result:
+
+    if query.writes:
+        # Lets the request session commit only when something changed.
+        session.info["writes"] = session.info.get("writes", 0) + 1
+    start = time.perf_counter()
+    try:
+        result = await session.execute(query.statement, values or {})
+    except Exception:
+        QUERY_ERRORS.labels(query.name).inc()
+        raise
+    finally:
+        QUERY_LATENCY.labels(query.name).observe(time.perf_counter() - start)
+
+    if not result.returns_rows and result.rowcount > 0:
+        QUERY_ROWS.labels(query.name).inc(result.rowcount)
+    return result
+
+
+async def fetch_all(
+    query: NamedQuery,
+    values: Optional[dict[str, Any]],
+    session: AsyncSession,
+) -> list[Row]:
+
+    result = await execute(query, values, session)
+    rows = result.fetchall()
+    QUERY_ROWS.labels(query.name).inc(len(rows))
+    return rows
+
+
+async def fetch_one(
+    query: NamedQuery,
+    values: Optional[dict[str, Any]],
+    session: AsyncSession,
+) -> Optional[Row]:
+
+    result = await execute(query, values, session)
+    row = result.fetchone()
+    if row is not None:
+        QUERY_ROWS.labels(query.name).inc()
+    return row
+
+
+async def scalar(
+    query: NamedQuery,
+    values: Optional[dict[str, Any]],
+    session: AsyncSession,
+) -> Any:
+
+    result = await execute(query, values, session)
+    value = result.scalar()
+    if value is not None:
+        QUERY_ROWS.labels(query.name).inc()
+    return value
+
+
+async def stream(
+    query: NamedQuery,
+    values: Optional[dict[str, Any]],
+    session: AsyncSession,
+    yield_per: int = 500,
+) -> AsyncIterator[Row]:
+    """
+    Yield rows from a server-side cursor, buffering at most yield_per rows,
+    so large results never have to fit in memory.
+    """
+
+    start = time.perf_counter()
+    rows = 0
+    try:
+        result = await session.stream(
+            query.statement,
+            values or {},
+            execution_options={"yield_per": yield_per},
+        )
+        async for row in result:
+            rows += 1
+            yield row
+    except Exception:
+        QUERY_ERRORS.labels(query.name).inc()
+        raise
+    finally:
+        QUERY_LATENCY.labels(query.name).observe(time.perf_counter() - start)
+        QUERY_ROWS.labels(query.name).inc(rows)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+from collections import (
+    OrderedDict,
+)
+from typing import (
+    Optional,
+)
+
+from app.config import (
+    settings,
+)
+from app.utils.engine import (
+    get_autocommit_session_factory,
+)
+
+logger = logging.getLogger(__name__)
+
+READ_MARKER_FLUSH_SECONDS = 2.0
+# Conversations whose last flushed marker is remembered, so a lower id
+# arriving after a flush is still recognised as going backwards.
+READ_MARKER_MEMORY = 10000
+
+
+class ReadMarkerCoalescer:
+    """
+    Keeps the highest message id a user has read per conversation and
+    writes it once per flush window, so scrolling through a long history
+    costs a single upsert instead of one write per message.
+    """
+
+    def __init__(self, delay: float = READ_MARKER_FLUSH_SECONDS) -> None:
+        self.delay = delay
+        self._pending: dict[tuple[int, Optional[int], Optional[int]], int] = {}
+        self._flushed: OrderedDict[
+            tuple[int, Optional[int], Optional[int]], int
+        ] = OrderedDict()
+        self._flushing: dict[tuple[int, Optional[int], Optional[int]], int] = {}
+        self._tasks: dict[tuple[int, Optional[int], Optional[int]], asyncio.Task] = {}
+
+    def advance(
+        self,
+        user_id: int,
+        peer_id: Optional[int],
+        room_id: Optional[int],
+        message_id: int,
+    ) -> bool:
+
+        key = (user_id, peer_id, room_id)
+        known = max(
+            self._pending.get(key, 0),
+            self._flushing.get(key, 0),
+            self._flushed.get(key, 0),
+        )
+        if known >= message_id:
+            return False
+        self._pending[key] = message_id
+        self._schedule(key)
+        return True
+
+    def _schedule(self, key: tuple[int, Optional[int], Optional[int]]) -> None:
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._flush_later(key))
+
+    async def _flush_later(
+        self, key: tuple[int, Optional[int], Optional[int]]
+    ) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self._tasks.pop(key, None)
+        await self._flush(key)
+
+    async def _flush(self, key: tuple[int, Optional[int], Optional[int]]) -> None:
+        from app.chats.crud import (
+            update_read_marker,
+        )
+
+        message_id = self._pending.pop(key, None)
+        if message_id is None:
+            return
+
+        session_factory = get_autocommit_session_factory()
+        if session_factory is None:
+            logger.warning("Read marker dropped: database not initialized.")
+            return
+
+        self._flushing[key] = message_id
+        session = session_factory()
+        try:
+            await update_read_marker(*key, message_id, session)
+        except Exception as e:
+            logger.error(f"Failed to store read marker {key}: {e}")
+            # Keep it pending so the next window writes it again.
+            if self._pending.get(key, 0) < message_id:
+                self._pending[key] = message_id
+            self._schedule(key)
+            return
+        finally:
+            self._flushing.pop(key, None)
+            await session_factory.remove()
+
+        self._flushed[key] = max(self._flushed.get(key, 0), message_id)
+        self._flushed.move_to_end(key)
+        while len(self._flushed) > READ_MARKER_MEMORY:
+            self._flushed.popitem(last=False)
+
+    async def flush_all(self) -> None:
+
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+        for key in list(self._pending):
+            await self._flush(key)
+        # Markers that failed just now are not retried during shutdown.
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+
+
+read_markers = ReadMarkerCoalescer()
+
+
+def read_receipt_event(user_id: int, message_id: int) -> str:
+
+    return json.dumps(
+        {"type": "read", "user_id": user_id, "message_id": message_id}
+    )
+
+
+async def publish_read_receipt(topic: str, user_id: int, message_id: int) -> None:
+
+    conn = await settings.redis_conn()
+    try:
+        await conn.publish(topic, read_receipt_event(user_id, message_id))
+    except Exception as e:
+        logger.warning(f"Read receipt for {topic} not published: {e}")
+    finally:
+        await conn.close()
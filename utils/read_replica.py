@@ -0,0 +1,117 @@
+import logging
+import time
+from fastapi import (
+    Depends,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from starlette.requests import (
+    Request,
+)
+from typing import (
+    AsyncGenerator,
+)
+
+from app.config import (
+    settings,
+)
+from app.users.schemas import (
+    UserObjectSchema,
+)
+from app.utils.dependencies import (
+    close_request_session,
+)
+from app.utils.jwt_util import (
+    get_current_active_user,
+)
+
+logger = logging.getLogger(__name__)
+
+READ_PRIMARY_HEADER = "X-Read-Primary"
+PIN_KEY = "db:read_primary:{}"
+
+
+class PrimaryPins:
+    """
+    Users whose reads stay on the primary for DB_READ_YOUR_WRITES_SECONDS
+    after a write, so a history fetched right after a send sees the message
+    even if the replica lags. Pins are Redis keys with that TTL, so the
+    next request may land on any worker; this worker's own pins are also
+    kept locally and answer without a round trip.
+    """
+
+    def __init__(self) -> None:
+        self._local: dict[int, float] = {}
+        self._redis = None
+
+    async def _conn(self):
+        if self._redis is None:
+            self._redis = await settings.redis_conn()
+        return self._redis
+
+    async def mark(self, user_id: int) -> None:
+
+        if not settings.DB_READ_HOST:
+            return
+        now = time.monotonic()
+        self._local[user_id] = now + settings.DB_READ_YOUR_WRITES_SECONDS
+        if len(self._local) > 10000:
+            for key, until in list(self._local.items()):
+                if until <= now:
+                    del self._local[key]
+        try:
+            conn = await self._conn()
+            await conn.set(
+                PIN_KEY.format(user_id), 1, ex=settings.DB_READ_YOUR_WRITES_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Primary read pin for user {user_id} not shared: {e}")
+            self._redis = None
+
+    async def is_pinned(self, user_id: int) -> bool:
+
+        if not settings.DB_READ_HOST:
+            return False
+        until = self._local.get(user_id)
+        if until is not None:
+            if until > time.monotonic():
+                return True
+            del self._local[user_id]
+        try:
+            conn = await self._conn()
+            return bool(await conn.exists(PIN_KEY.format(user_id)))
+        except Exception as e:
+            # Fall back to the replica: only this worker's pins are honoured.
+            logger.warning(f"Primary read pin lookup failed: {e}")
+            self._redis = None
+            return False
+
+    async def stop(self) -> None:
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+primary_pins = PrimaryPins()
+
+
+async def get_db_read_session(
+    request: Request,
+    currentUser: UserObjectSchema = Depends(get_current_active_user),
+) -> AsyncGenerator[AsyncSession, None]:
+
+    if request.headers.get(READ_PRIMARY_HEADER) or await primary_pins.is_pinned(
+        currentUser.id
+    ):
+        session_factory = request.app.state.db_autocommit_session_factory
+    else:
+        session_factory = request.app.state.db_read_session_factory
+    session: AsyncSession = session_factory.session_factory()
+
+    try:
+        yield session
+    except Exception:
+        await session.close()
+        raise
+    await close_request_session(session, "read")
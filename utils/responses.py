@@ -0,0 +1,81 @@
+import datetime
+import decimal
+import json
+from starlette.responses import (
+    JSONResponse,
+)
+from typing import (
+    Any,
+    Optional,
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ROW_FORMATS = "^(rows|columns)$"
+
+
+def _default(value: Any) -> Any:
+
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Serializes with orjson when it is installed and the standard library
+    otherwise. Content is trusted crud output, so no pydantic pass is made.
+    """
+
+    def render(self, content: Any) -> bytes:
+
+        if orjson is not None:
+            return orjson.dumps(
+                content, default=_default, option=orjson.OPT_NON_STR_KEYS
+            )
+        return json.dumps(
+            content,
+            default=_default,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+def to_columns(rows: list[dict[str, Any]]) -> dict[str, Any]:
+
+    if not rows:
+        return {"columns": [], "rows": []}
+    columns = list(rows[0])
+    return {
+        "columns": columns,
+        "rows": [[row.get(column) for column in columns] for row in rows],
+    }
+
+
+def rows_response(
+    results: dict[str, Any], format: Optional[str] = None
+) -> FastJSONResponse:
+    """
+    Send a crud result dict as-is. With format="columns", every list of
+    row dicts in it is sent as column names once plus one array per row.
+    """
+
+    if format == "columns":
+        results = {
+            key: (
+                to_columns(value)
+                if isinstance(value, list)
+                and all(isinstance(row, dict) for row in value[:1])
+                else value
+            )
+            for key, value in results.items()
+        }
+    return FastJSONResponse(results)
+
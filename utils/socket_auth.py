@@ -0,0 +1,210 @@
+import time
+from fastapi import (
+    status,
+)
+from fastapi.websockets import (
+    WebSocket,
+)
+from jose import jwt
+from jose.exceptions import JWTError
+from prometheus_client import (
+    Counter,
+)
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+)
+from typing import (
+    Any,
+    NamedTuple,
+    Optional,
+)
+
+from app.auth import (
+    crud,
+    revocation,
+)
+from app.config import (
+    settings,
+)
+from app.rooms.crud import (
+    find_existed_room,
+    find_existed_user_in_room,
+)
+from app.users.schemas import (
+    UserObjectSchema,
+)
+from app.utils.constants import (
+    JWT_ALGORITHM,
+    JWT_SECRET_KEY,
+)
+from app.utils.jwt_util import (
+    ACCESS_TOKEN,
+    decode_token,
+    epoch_matches,
+)
+
+RESUME_TICKET = "ws"
+
+SOCKET_HANDSHAKES = Counter(
+    "cychat_socket_handshakes_total",
+    "WebSocket handshakes by how the user was authenticated.",
+    ["method", "result"],
+)
+
+
+class SocketAuthError(Exception):
+    pass
+
+
+class SocketContext(NamedTuple):
+    user: dict[str, Any]
+    sid: str
+    topic: str
+    receiver_id: Optional[int] = None
+    receiver_email: Optional[str] = None
+    room_id: Optional[int] = None
+    ep: int = 0
+    token_exp: int = 0
+
+
+def issue_resume_ticket(context: SocketContext) -> Optional[dict[str, Any]]:
+    """
+    Sign a ticket for reconnecting to the same chat. It never outlives
+    the access token the socket was opened with, so a ticket cannot be
+    traded for a longer session than the token itself allowed.
+    """
+
+    expires_at = min(
+        int(time.time()) + settings.WS_RESUME_TICKET_SECONDS,
+        context.token_exp,
+    )
+    expires_in = expires_at - int(time.time())
+    if expires_in <= 0:
+        return None
+    payload = context._asdict()
+    payload.update({"typ": RESUME_TICKET, "exp": expires_at})
+    ticket = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return {"type": "ticket", "ticket": ticket, "expires_in": expires_in}
+
+
+async def _resume(
+    ticket: str, topic: str, sender_id: int, session: AsyncSession
+) -> SocketContext:
+
+    try:
+        payload = jwt.decode(ticket, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        raise SocketAuthError("Invalid resume ticket")
+    if payload.get("typ") != RESUME_TICKET:
+        raise SocketAuthError("Invalid resume ticket")
+    payload.pop("typ")
+    payload.pop("exp")
+    context = SocketContext(**payload)
+    if context.topic != topic or context.user["id"] != sender_id:
+        raise SocketAuthError("Resume ticket is for another chat")
+    if await revocation.revoked_tokens.is_revoked(context.sid):
+        raise SocketAuthError("Session has been revoked")
+    user = await crud.find_existed_user_id(sender_id, session)
+    if (
+        user is None
+        or user["user_role"] == "disabled"
+        or not epoch_matches(payload, user)
+    ):
+        raise SocketAuthError("Could not validate credentials")
+    return context._replace(user=UserObjectSchema(**user).model_dump())
+
+
+async def _login(
+    token: str,
+    topic: str,
+    sender_id: int,
+    receiver_id: Optional[int],
+    session: AsyncSession,
+) -> SocketContext:
+
+    try:
+        payload = decode_token(token, ACCESS_TOKEN)
+    except JWTError:
+        raise SocketAuthError("Could not validate credentials")
+    if payload["uid"] != sender_id:
+        raise SocketAuthError("Token belongs to another user")
+    if await revocation.revoked_tokens.is_revoked(payload["sid"]):
+        raise SocketAuthError("Session has been revoked")
+    user = await crud.find_existed_user_id(sender_id, session)
+    if (
+        user is None
+        or user["user_role"] == "disabled"
+        or not epoch_matches(payload, user)
+    ):
+        raise SocketAuthError("Could not validate credentials")
+    user = UserObjectSchema(**user).model_dump()
+
+    if receiver_id is not None:
+        receiver = await crud.find_existed_user_id(receiver_id, session)
+        if receiver is None:
+            raise SocketAuthError("Receiver not found")
+        return SocketContext(
+            user=user,
+            sid=payload["sid"],
+            topic=topic,
+            receiver_id=receiver_id,
+            receiver_email=receiver["email"],
+            ep=payload["ep"],
+            token_exp=payload["exp"],
+        )
+
+    room = await find_existed_room(topic, session)
+    if room is None:
+        raise SocketAuthError("Room not found")
+    member = await find_existed_user_in_room(sender_id, room.id, session)
+    if member is None:
+        raise SocketAuthError("Not a member of this room")
+    return SocketContext(
+        user=user,
+        sid=payload["sid"],
+        topic=topic,
+        room_id=room.id,
+        ep=payload["ep"],
+        token_exp=payload["exp"],
+    )
+
+
+async def authenticate_socket(
+    websocket: WebSocket,
+    topic: str,
+    sender_id: int,
+    receiver_id: Optional[int],
+    session: AsyncSession,
+) -> Optional[SocketContext]:
+    """
+    Authenticate a socket once, before it is accepted. A resume ticket
+    from an earlier connection to the same chat skips the receiver and
+    membership lookups, though the user's epoch and role are still
+    checked; otherwise the access token is verified in full.
+    Returns None after refusing the connection.
+    """
+
+    ticket = websocket.query_params.get("ticket")
+    token = websocket.query_params.get("token")
+    method = "ticket" if ticket else "token"
+    try:
+        if ticket:
+            try:
+                context = await _resume(ticket, topic, sender_id, session)
+            except SocketAuthError:
+                if not token:
+                    raise
+                method = "token"
+                context = await _login(
+                    token, topic, sender_id, receiver_id, session
+                )
+        elif token:
+            context = await _login(token, topic, sender_id, receiver_id, session)
+        else:
+            raise SocketAuthError("Missing token")
+    except SocketAuthError as e:
+        SOCKET_HANDSHAKES.labels(method, "rejected").inc()
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+        return None
+    SOCKET_HANDSHAKES.labels(method, "accepted").inc()
+    return context
@@ -0,0 +1,439 @@
+import asyncio
+import datetime
+import logging
+import os
+import shutil
+import uuid
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from concurrent.futures import (
+    ThreadPoolExecutor,
+)
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Iterator,
+    NamedTuple,
+    Optional,
+)
+
+from app.config import (
+    settings,
+)
+
+try:
+    from aiobotocore.session import get_session as get_s3_session
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover
+    get_s3_session = None
+    ClientError = Exception
+
+logger = logging.getLogger(__name__)
+
+# Uploads are received here before they are put into the store, so a
+# partial file is never visible under its final key.
+STAGING_DIR = settings.UPLOAD_DIR / "partial"
+STREAM_CHUNK_BYTES = 256 * 1024
+S3_PART_BYTES = 8 * 1024 * 1024
+
+
+class StorageKeyError(ValueError):
+    pass
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified: datetime.datetime
+    etag: str
+
+
+def check_key(key: str) -> str:
+    """Keys are relative, slash separated and may not climb out of the store."""
+
+    parts = key.split("/")
+    if not key or key.startswith("/") or any(part in ("", ".", "..") for part in parts):
+        raise StorageKeyError(f"Invalid storage key: {key!r}")
+    return key
+
+
+def staging_path() -> Path:
+    return STAGING_DIR / f"{uuid.uuid4()}.part"
+
+
+class Storage(ABC):
+    """
+    Where uploads live. Keys mirror the old directory layout under
+    UPLOAD_DIR (`media/ab/cd/<sha256>`, `profile-images/user/1/profile.png`)
+    so either backend can serve files written by the other.
+    """
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def put_file(self, key: str, path: Path) -> None:
+        """Move a finished local file (usually a staging file) into the store."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield the bytes from start to end inclusive."""
+
+    @abstractmethod
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        ...
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def list(
+        self, prefix: str, after: str = "", limit: int = 1000
+    ) -> list[StoredObject]:
+        """Objects under prefix in key order, starting after the given key."""
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """A path the file can be sent from directly, if the backend has one."""
+
+        return None
+
+    async def start(self) -> None:
+        await asyncio.to_thread(STAGING_DIR.mkdir, parents=True, exist_ok=True)
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalStorage(Storage):
+    """Files under a directory, with all disk I/O on a small thread pool."""
+
+    def __init__(self, root: Path, workers: int) -> None:
+        self.root = root
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="storage-io"
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.root / check_key(key)
+
+    async def _run(self, fn, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _put(self, key: str, data: bytes) -> None:
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self._run(self._put, key, data)
+
+    def _put_file(self, key: str, path: Path) -> None:
+
+        destination = self._path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(path, destination)
+        except OSError:
+            shutil.move(path, destination)
+
+    async def put_file(self, key: str, path: Path) -> None:
+        await self._run(self._put_file, key, path)
+
+    def _get(self, key: str) -> Optional[bytes]:
+
+        try:
+            return self._path(key).read_bytes()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._run(self._get, key)
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+
+        f = await self._run(open, self._path(key), "rb")
+        try:
+            await self._run(f.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = STREAM_CHUNK_BYTES if remaining is None else min(STREAM_CHUNK_BYTES, remaining)
+                chunk = await self._run(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await self._run(f.close)
+
+    def _stat(self, key: str) -> Optional[StoredObject]:
+
+        try:
+            stat = os.stat(self._path(key))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return StoredObject(
+            key=key,
+            size=stat.st_size,
+            modified=datetime.datetime.utcfromtimestamp(stat.st_mtime),
+            etag=f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+        )
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        return await self._run(self._stat, key)
+
+    def _delete(self, key: str) -> bool:
+
+        try:
+            self._path(key).unlink()
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        return True
+
+    async def delete(self, key: str) -> bool:
+        return await self._run(self._delete, key)
+
+    def _walk(self, directory: Path, prefix: str, after: str) -> Iterator[str]:
+        """
+        Yield keys in the same order S3 lists them. Entries are sorted as
+        they appear inside a key (directories with their trailing slash),
+        and directories that sort entirely before `after` are skipped.
+        """
+
+        try:
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        named = sorted(
+            (entry.name + "/" if entry.is_dir() else entry.name, entry)
+            for entry in entries
+            if not entry.name.startswith(".")
+        )
+        for name, entry in named:
+            key = prefix + name
+            if entry.is_dir():
+                if after > key and not after.startswith(key):
+                    continue
+                yield from self._walk(Path(entry.path), key, after)
+            elif key > after:
+                yield key
+
+    def _list(self, prefix: str, after: str, limit: int) -> list[StoredObject]:
+
+        prefix = prefix.strip("/")
+        directory = self._path(prefix) if prefix else self.root
+        objects = []
+        for key in self._walk(directory, f"{prefix}/" if prefix else "", after):
+            stored = self._stat(key)
+            if stored is not None:
+                objects.append(stored)
+            if len(objects) >= limit:
+                break
+        return objects
+
+    async def list(
+        self, prefix: str, after: str = "", limit: int = 1000
+    ) -> list[StoredObject]:
+        return await self._run(self._list, prefix, after, limit)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self._path(key)
+
+    async def stop(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class S3Storage(Storage):
+    """
+    An S3-compatible bucket, shared by every app node. Point
+    S3_ENDPOINT_URL at MinIO or `moto_server` to run against a local
+    stand-in.
+    """
+
+    def __init__(self) -> None:
+        self.bucket = settings.S3_BUCKET
+        self.prefix = settings.S3_PREFIX.strip("/")
+        self._client_context = None
+        self._client = None
+
+    def _key(self, key: str) -> str:
+
+        check_key(key)
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _unprefix(self, key: str) -> str:
+        return key[len(self.prefix) + 1:] if self.prefix else key
+
+    @staticmethod
+    def _missing(error: Exception) -> bool:
+
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self._client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    async def put_file(self, key: str, path: Path) -> None:
+
+        size = (await asyncio.to_thread(os.stat, path)).st_size
+        if size <= S3_PART_BYTES:
+            await self.put(key, await asyncio.to_thread(path.read_bytes))
+            await asyncio.to_thread(path.unlink, missing_ok=True)
+            return
+
+        s3_key = self._key(key)
+        upload = await self._client.create_multipart_upload(
+            Bucket=self.bucket, Key=s3_key
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, S3_PART_BYTES):
+                part = await self._client.upload_part(
+                    Bucket=self.bucket,
+                    Key=s3_key,
+                    UploadId=upload_id,
+                    PartNumber=len(parts) + 1,
+                    Body=chunk,
+                )
+                parts.append({"PartNumber": len(parts) + 1, "ETag": part["ETag"]})
+            await self._client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await self._client.abort_multipart_upload(
+                Bucket=self.bucket, Key=s3_key, UploadId=upload_id
+            )
+            raise
+        finally:
+            await asyncio.to_thread(f.close)
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+
+    async def get(self, key: str) -> Optional[bytes]:
+
+        try:
+            response = await self._client.get_object(
+                Bucket=self.bucket, Key=self._key(key)
+            )
+        except ClientError as e:
+            if self._missing(e):
+                return None
+            raise
+        async with response["Body"] as body:
+            return await body.read()
+
+    async def stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+
+        extra = {}
+        if start or end is not None:
+            extra["Range"] = f"bytes={start}-{'' if end is None else end}"
+        response = await self._client.get_object(
+            Bucket=self.bucket, Key=self._key(key), **extra
+        )
+        async with response["Body"] as body:
+            async for chunk in body.iter_chunks(STREAM_CHUNK_BYTES):
+                yield chunk
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+
+        try:
+            response = await self._client.head_object(
+                Bucket=self.bucket, Key=self._key(key)
+            )
+        except ClientError as e:
+            if self._missing(e):
+                return None
+            raise
+        return StoredObject(
+            key=key,
+            size=response["ContentLength"],
+            modified=response["LastModified"].replace(tzinfo=None),
+            etag=response["ETag"].strip('"'),
+        )
+
+    async def delete(self, key: str) -> bool:
+
+        await self._client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return True
+
+    async def list(
+        self, prefix: str, after: str = "", limit: int = 1000
+    ) -> list[StoredObject]:
+
+        prefix = prefix.strip("/")
+        if prefix:
+            s3_prefix = f"{self._key(prefix)}/"
+        else:
+            s3_prefix = f"{self.prefix}/" if self.prefix else ""
+        values = {"Bucket": self.bucket, "Prefix": s3_prefix, "MaxKeys": limit}
+        if after:
+            values["StartAfter"] = self._key(after)
+        response = await self._client.list_objects_v2(**values)
+        return [
+            StoredObject(
+                key=self._unprefix(item["Key"]),
+                size=item["Size"],
+                modified=item["LastModified"].replace(tzinfo=None),
+                etag=item["ETag"].strip('"'),
+            )
+            for item in response.get("Contents", [])
+        ]
+
+    async def start(self) -> None:
+
+        await super().start()
+        if self._client is not None:
+            return
+        if get_s3_session is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs aiobotocore installed.")
+        self._client_context = get_s3_session().create_client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL or None,
+            region_name=settings.S3_REGION or None,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+        )
+        self._client = await self._client_context.__aenter__()
+
+    async def stop(self) -> None:
+        if self._client_context is not None:
+            await self._client_context.__aexit__(None, None, None)
+            self._client_context = None
+            self._client = None
+
+
+def create_storage() -> Storage:
+
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage()
+    return LocalStorage(settings.UPLOAD_DIR, settings.STORAGE_IO_WORKERS)
+
+
+storage = create_storage()
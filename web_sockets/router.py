@@ -1,4 +1,5 @@
 import asyncio
+import json
 from fastapi import (
     APIRouter,
     Depends,
@@ -21,6 +22,10 @@ from app.utils.pub_sub_handlers import (
     consumer_handler,
     producer_handler,
 )
+from app.utils.socket_auth import (
+    authenticate_socket,
+    issue_resume_ticket,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,20 +40,26 @@ async def websocket_room_endpoint(
     room_name: str,
     session: AsyncSession = Depends(get_db_autocommit_session_socket),
 ):
+    context = await authenticate_socket(
+        websocket, room_name, sender_id, None, session
+    )
+    if context is None:
+        return
     conn = None
     pubsub = None
     try:
 
         await websocket.accept()
+        ticket = issue_resume_ticket(context)
+        if ticket is not None:
+            await websocket.send_text(json.dumps(ticket))
         conn = await settings.redis_conn()
         pubsub = conn.pubsub()
 
         consumer_task = asyncio.create_task(consumer_handler(
             connection=conn,
-            topic=room_name,
             web_socket=websocket,
-            sender_id=sender_id,
-            receiver_id=None,
+            context=context,
             session=session,
         ))
         producer_task = asyncio.create_task(producer_handler(
@@ -92,20 +103,26 @@ async def websocket_contact_chat_endpoint(
     receiver_id: int,
     session: AsyncSession = Depends(get_db_autocommit_session_socket),
 ):
+    sorted_chat = sorted([sender_id, receiver_id])
+    topic = "_".join(map(str, sorted_chat))
+    context = await authenticate_socket(
+        websocket, topic, sender_id, receiver_id, session
+    )
+    if context is None:
+        return
     conn = None
     pubsub = None
     try:
-        sorted_chat = sorted([sender_id, receiver_id])
         await websocket.accept()
+        ticket = issue_resume_ticket(context)
+        if ticket is not None:
+            await websocket.send_text(json.dumps(ticket))
         conn = await settings.redis_conn()
         pubsub = conn.pubsub()
-        topic = "_".join(map(str, sorted_chat))
         consumer_task = asyncio.create_task(consumer_handler(
             connection=conn,
-            topic=topic,
             web_socket=websocket,
-            sender_id=sender_id,
-            receiver_id=receiver_id,
+            context=context,
             session=session,
         ))
         producer_task = asyncio.create_task(producer_handler(